@@ -1,7 +1,5 @@
 import ee
 
-from datetime import datetime
-
 from rsgee.processors.generic.classifier import BaseClassifier
 from rsgee.processors.generic.generator import BaseGenerator
 from rsgee.processors.generic.sampler import BaseSampler
@@ -121,7 +119,7 @@ class DefaultSimpleSampler(BaseSampler):
                                region=roi,
                                numPixels=self._settings.SAMPLING_POINTS,
                                scale=self._settings.EXPORT_SCALE,
-                               seed=datetime.now().microsecond,
+                               seed=self._get_seed(year, region_id),
                                tileScale=4,
                                geometries=True)
                            .filterBounds(bounds))
@@ -153,7 +151,7 @@ class DefaultClassifier(BaseClassifier):
                 classifier = (ee.Classifier
                               .smileRandomForest(
                                   numberOfTrees=self._settings.CLASSIFICATION_TREES,
-                                  seed=datetime.now().microsecond)
+                                  seed=self._get_seed(year, region_id))
                               .train(
                                   features=training_samples,
                                   classProperty='class',
@@ -1,5 +1,3 @@
-from datetime import datetime
-
 import ee
 
 from rsgee.processors.generic import BaseSampler, BaseClassifier
@@ -44,7 +42,7 @@ class ForestPlantationSampler(BaseSampler):
                                classBand='class',
                                region=roi,
                                scale=self._settings.EXPORT_SCALE,
-                               seed=datetime.now().microsecond,
+                               seed=self._get_seed(year, region_id),
                                classValues=[0, 1],
                                classPoints=[other_samples_num, coi_samples_num],
                                tileScale=2,
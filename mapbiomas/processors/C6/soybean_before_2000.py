@@ -1,5 +1,3 @@
-from datetime import datetime
-
 import ee
 
 from rsgee.processors.generic import BaseGenerator, BaseSampler
@@ -100,7 +98,7 @@ class SoybeanSampler(BaseSampler):
                                region=roi,
                                numPixels=self._settings.SAMPLING_POINTS,
                                scale=self._settings.EXPORT_SCALE,
-                               seed=datetime.now().microsecond,
+                               seed=self._get_seed(year, region_id),
                                tileScale=4,
                                geometries=True))
 
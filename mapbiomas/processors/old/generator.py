@@ -19,16 +19,22 @@ class MapbiomasGenerator(GeneratorProcessor):
                                     apply_mask)
 
     def get_neighbors(self, images, path, row):
+        # index the features by path/row once instead of scanning all of them
+        # for each of the 9 neighbors
+        if getattr(self, '_pathrow_index_source', None) is not images:
+            self._pathrow_index_source = images
+            self._pathrow_index = {}
+            for image in images:
+                key = (int(image.get('PATH')), int(image.get('ROW')))
+                self._pathrow_index.setdefault(key, []).append(image)
+
         wrs = []
         for offset_path in range(-1, 2):
             for offset_row in range(-1, 2):
-                for image in images:
-                    local_path = path + offset_path
-                    local_row = row + offset_row
-                    local_geometry = image.get('GEOMETRY')
-                    if int(image.get('PATH')) == local_path and \
-                            int(image.get('ROW')) == local_row:
-                        wrs.append((local_path, local_row, local_geometry))
+                local_path = path + offset_path
+                local_row = row + offset_row
+                for image in self._pathrow_index.get((local_path, local_row), []):
+                    wrs.append((local_path, local_row, image.get('GEOMETRY')))
         return wrs
 
 
@@ -18,8 +18,9 @@ class Blard(ImageCollection):
         return Blard(collection)
 
     @staticmethod
-    def filter_collection_by_roi(roi, startDate, endDate, cloudCover, bands=blard.ALL_BANDS):
-        collection = blard.get16DayproductByROI(roi, startDate, endDate, cloudCover, bands)
+    def filter_collection_by_roi(roi, startDate, endDate, cloudCover, bands=blard.ALL_BANDS, productsPlan=None,
+                                 scenesIds=None):
+        collection = blard.get16DayproductByROI(roi, startDate, endDate, cloudCover, bands, productsPlan, scenesIds)
         return Blard(collection)
 
     def mask_clouds_and_shadows(self):
@@ -7,6 +7,12 @@ class SettingsNotFound(Exception):
     def __init__(self, settings_name):
         self.message = "Settings not found: " + settings_name
 
+
+class GraphTooLarge(Exception):
+    """A task graph is above the thresholds of the graph profiler"""
+    pass
+
+
 class FieldDoesNotExist(Exception):
     """The requested model field does not exist"""
     pass
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 
@@ -20,3 +20,20 @@ class DatabaseManager():
         Base.metadata.drop_all(bind=self.__engine)
         Base.metadata.create_all(bind=self.__engine)
         session.commit()
+
+    # creates the missing tables and adds the columns added to the models
+    # since the tables were created (e.g. tasks.fingerprint), keeping the
+    # stored tasks
+    def upgrade(self):
+        Base.metadata.create_all(bind=self.__engine)
+        inspector = inspect(self.__engine)
+
+        with self.__engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                columns = {column['name'] for column in inspector.get_columns(table.name)}
+
+                for column in table.columns:
+                    if column.name not in columns:
+                        connection.execute('ALTER TABLE {0} ADD COLUMN {1} {2}'.format(
+                            table.name, column.name,
+                            column.type.compile(dialect=self.__engine.dialect)))
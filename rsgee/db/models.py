@@ -12,6 +12,7 @@ class Task(Base):
     # region_id = Column(String)
     data = Column(String)
     output_id = Column(String)
+    fingerprint = Column(String)
     state = Column(String)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
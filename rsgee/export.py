@@ -1,22 +1,28 @@
+import json
+import os
+
 import ee
 
 from rsgee.settings import SettingsManager as sm
 from rsgee.image import Image
+from rsgee.utils import cache, grid
+from rsgee.utils.export_layout import ExportLayout
+
+PACKED_BAND_FORMAT = "Y{year}_{band}"
+PACKED_MANIFEST_PROPERTY = "PACKED_MANIFEST"
+
+# band of the classified and filtered results, the default of classify
+CLASSIFICATION_BAND = "classification"
 
 
 def generate_tasks_from_batch(batch, filename_sufix):
     export = sm.settings.EXPORT_CLASS
 
     export_dir = sm.settings.EXPORT_DIRECTORY
-    filename_patters = sm.settings.EXPORT_FILENAME_PATTERN
-    filename_prefix = sm.settings.EXPORT_FILENAME_PREFIX or sm.settings.NAME
 
     def generate(output):
-        filename = filename_patters.format(
-            prefix=filename_prefix,
-            year=output.get("year", ""),
-            region_id=output.get("region_id", ""),
-            sufix=filename_sufix,
+        filename = get_filename(
+            output.get("year", ""), output.get("region_id", ""), filename_sufix
         )
 
         directory = export_dir.format(
@@ -25,10 +31,15 @@ def generate_tasks_from_batch(batch, filename_sufix):
             region_id=output.get("region_id", ""),
         )
 
+        data = output["data"]
+
+        if output.get("manifest"):
+            data = save_manifest(filename, output["manifest"], data)
+
         export_params = {
             "directory": directory.strip("/"),
             "filename": filename,
-            "data": output["data"],
+            "data": data,
         }
 
         if output.get("region"):
@@ -36,11 +47,243 @@ def generate_tasks_from_batch(batch, filename_sufix):
 
         return export(**export_params)
 
-    tasks = [generate(output) for output in batch.get_all().values()]
+    outputs = list(batch.get_all().values())
+
+    layout = get_export_layout(filename_sufix)
+
+    if layout:
+        outputs = apply_export_layout(outputs, layout, filename_sufix)
+
+    if (sm.settings.EXPORT_YEARS_PER_TASK or 1) > 1:
+        outputs = pack_outputs_by_region(outputs, filename_sufix)
+
+    tasks = [generate(output) for output in outputs]
 
     return tasks
 
 
+def get_export_layout(filename_sufix):
+    settings = sm.settings
+
+    if not (settings.EXPORT_MAX_PIXELS_PER_TASK or settings.EXPORT_MIN_PIXELS_PER_TASK):
+        return None
+
+    # samples are exported as tables, their size does not follow the regions
+    if filename_sufix == "samples":
+        return None
+
+    bands_count = len(get_band_names(filename_sufix))
+
+    return ExportLayout(
+        grid.load_grid_index_from_settings(settings, apply_api_filter=False),
+        settings.GRID_FEATURE_ID_FIELD,
+        settings.EXPORT_SCALE,
+        bands_count or 1,
+        settings.EXPORT_MAX_PIXELS_PER_TASK,
+        settings.EXPORT_MIN_PIXELS_PER_TASK,
+    )
+
+
+# replaces the outputs of oversized regions by one output per part and the
+# outputs of packed regions by a single mosaic of them
+def apply_export_layout(outputs, layout, filename_sufix):
+    if not is_regions_images(outputs):
+        return outputs
+
+    outputs_by_cell = {(output["year"], output["region_id"]): output for output in outputs}
+    years = sorted({output["year"] for output in outputs})
+
+    sized_outputs = []
+
+    for year in years:
+        for unit in layout.units:
+            members = [outputs_by_cell[(year, region_id)]
+                       for region_id in unit.regions_ids
+                       if (year, region_id) in outputs_by_cell]
+
+            if not members:
+                continue
+
+            regions_ids = ",".join(str(member["region_id"]) for member in members)
+
+            if unit.is_split():
+                region = ee.Feature(members[0]["region"]).geometry()
+
+                for label, bounds in unit.parts:
+                    part = ee.Geometry.Rectangle(list(bounds), None, False)
+
+                    sized_outputs.append({
+                        "year": year,
+                        "region_id": label,
+                        "data": ee.Image(members[0]["data"]).set("regions_ids", regions_ids),
+                        "region": region.intersection(part, ee.ErrorMargin(1)),
+                    })
+            elif unit.is_packed():
+                regions = [ee.Feature(member["region"]).geometry() for member in members]
+
+                sized_outputs.append({
+                    "year": year,
+                    "region_id": unit.get_label(),
+                    "data": (ee.ImageCollection([member["data"] for member in members])
+                             .mosaic()
+                             .set("regions_ids", regions_ids)),
+                    "region": ee.FeatureCollection(
+                        [ee.Feature(region) for region in regions]).geometry(),
+                })
+            else:
+                sized_outputs.extend(members)
+
+    filename_prefix = sm.settings.EXPORT_FILENAME_PREFIX or sm.settings.NAME
+    manifest_path = os.path.join(
+        cache.get_cache_directory("manifests"),
+        f"{filename_prefix}_{filename_sufix}_layout.json")
+    cache.write_json(manifest_path, layout.to_manifest())
+
+    return sized_outputs
+
+
+# only images exported by region can be packed or split
+def is_regions_images(outputs):
+    return (bool(outputs) and isinstance(outputs[0]["data"], ee.Image)
+            and "region_id" in outputs[0])
+
+
+def get_years_groups(years):
+    size = sm.settings.EXPORT_YEARS_PER_TASK or 1
+    years = sorted(years)
+
+    return [years[index:index + size] for index in range(0, len(years), size)]
+
+
+def get_years_label(years):
+    if len(years) == 1:
+        return years[0]
+
+    return f"{years[0]}-{years[-1]}"
+
+
+# bands of the images exported by a stage, known from the settings instead of
+# evaluating the graph
+def get_band_names(filename_sufix):
+    if filename_sufix == "mosaic":
+        return list(sm.settings.GENERATION_VARIABLES)
+
+    return [CLASSIFICATION_BAND]
+
+
+# combines the images of up to EXPORT_YEARS_PER_TASK years of the same region
+# in a single multi-band image, band names are prefixed by their year. Outputs
+# with other bands than those of their stage list them in "bands".
+def pack_outputs_by_region(outputs, filename_sufix):
+    if not is_regions_images(outputs):
+        return outputs
+
+    outputs_by_region = {}
+
+    for output in outputs:
+        outputs_by_region.setdefault(output["region_id"], {})[output["year"]] = output
+
+    packed_outputs = []
+
+    for region_id, outputs_by_year in outputs_by_region.items():
+        for years_group in get_years_groups(sm.settings.YEARS):
+            years = [year for year in years_group if year in outputs_by_year]
+
+            if not years:
+                continue
+
+            band_names = outputs_by_year[years[0]].get("bands") or get_band_names(filename_sufix)
+            manifest = get_packed_manifest(years, band_names, region_id, filename_sufix)
+
+            images = [
+                ee.Image(outputs_by_year[year]["data"]).select(
+                    band_names, get_packed_band_names(manifest, year)
+                )
+                for year in years
+            ]
+
+            packed_outputs.append({
+                "year": get_years_label(years_group),
+                "region_id": region_id,
+                "data": ee.Image.cat(images),
+                "region": outputs_by_year[years[0]].get("region"),
+                "manifest": manifest,
+            })
+
+    return packed_outputs
+
+
+def get_packed_manifest(years, band_names, region_id, filename_sufix):
+    return {
+        "years": years,
+        "bands": band_names,
+        "band_format": PACKED_BAND_FORMAT,
+        "filenames": {
+            str(year): get_filename(year, region_id, filename_sufix)
+            for year in years
+        },
+    }
+
+
+# names of the bands of a year in a packed image
+def get_packed_band_names(manifest, year):
+    return [manifest["band_format"].format(year=year, band=band)
+            for band in manifest["bands"]]
+
+
+# the manifest is kept locally, to unpack exported files, and in the image
+# properties, to unpack exported assets
+def save_manifest(filename, manifest, image):
+    path = os.path.join(cache.get_cache_directory("manifests"), f"{filename}.json")
+    cache.write_json(path, manifest)
+
+    return ee.Image(image).set(PACKED_MANIFEST_PROPERTY, json.dumps(manifest))
+
+
+# splits a packed image asset back into one asset per year
+def unpack_asset(asset_id, directory):
+    properties = ee.data.getInfo(asset_id)["properties"]
+    manifest = json.loads(properties[PACKED_MANIFEST_PROPERTY])
+
+    image = ee.Image(asset_id)
+    region = image.geometry()
+
+    tasks = []
+
+    for year in manifest["years"]:
+        tasks.append(
+            Export.Image.to_asset(
+                directory,
+                manifest["filenames"][str(year)],
+                image.select(get_packed_band_names(manifest, year), manifest["bands"]).set("year", year),
+                region,
+            )
+        )
+
+    return tasks
+
+
+def get_filename(year, region_id, filename_sufix):
+    filename_prefix = sm.settings.EXPORT_FILENAME_PREFIX or sm.settings.NAME
+
+    return sm.settings.EXPORT_FILENAME_PATTERN.format(
+        prefix=filename_prefix, year=year, region_id=region_id, sufix=filename_sufix,
+    )
+
+
+# exports a generated mosaic to the mosaics cache at EXPORT_SCALE, mosaics
+# are cast to float by the generator
+def generate_cache_task(asset_id, image, region):
+    return ee.batch.Export.image.toAsset(
+        image=ee.Image(image).clip(region),
+        description=asset_id.split("/")[-1],
+        assetId=asset_id,
+        region=region,
+        scale=sm.settings.EXPORT_SCALE,
+        maxPixels=sm.settings.EXPORT_MAX_PIXELS,
+    )
+
+
 class _BaseExport:
     @staticmethod
     def _to_cloud_storage(directory, filename, ee_export, params):
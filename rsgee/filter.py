@@ -101,3 +101,34 @@ def build_ee_filter(query):
     ee_filter = build(filter_name, args)
 
     return ee_filter
+
+
+# evaluates the same filters locally against a properties dictionary. Filters
+# are built with leftValue and rightField, so comparisons read as
+# "value <operator> property", exactly like the ee filter they become
+__comparisons = {
+    'inList': lambda value, field_value: field_value in value,
+    'eq': lambda value, field_value: value == field_value,
+    'neq': lambda value, field_value: value != field_value,
+    'gt': lambda value, field_value: field_value is not None and value > field_value,
+    'gte': lambda value, field_value: field_value is not None and value >= field_value,
+    'lt': lambda value, field_value: field_value is not None and value < field_value,
+    'lte': lambda value, field_value: field_value is not None and value <= field_value,
+}
+
+
+def evaluate_filter(query, properties):
+    filter_name, args = list(query.items())[0]
+
+    if filter_name == 'and':
+        return all(evaluate_filter(arg, properties) for arg in args['rec'])
+
+    if filter_name == 'or':
+        return any(evaluate_filter(arg, properties) for arg in args['rec'])
+
+    if filter_name == 'not':
+        return not evaluate_filter(args['rec'], properties)
+
+    compare = __comparisons[filter_name]
+
+    return compare(args['leftValue'], properties.get(args['rightField']))
@@ -83,6 +83,17 @@ class ImageCollection(ee.ImageCollection):
         return self.map(calculate)
 
     def filter_period(self, period_start, period_end, year, offset=0):
+        # dates known on the client are compiled to literal date filters,
+        # the server-side parsing is kept for periods read from grid properties
+        if date.is_client_side(period_start, period_end, year, offset):
+            filters = [ee.Filter.date(start_date, end_date) for start_date, end_date
+                       in date.compile_period(period_start, period_end, year, offset)]
+
+            if len(filters) == 1:
+                return self.filter(filters[0])
+
+            return self.filter(ee.Filter.Or(*filters))
+
         end_year = ee.Number(year)
         start_year = end_year.subtract(offset)
 
@@ -0,0 +1,91 @@
+from functools import lru_cache
+
+import numpy as np
+
+# every value of a 16 bits quality band
+QA_VALUES_COUNT = 2 ** 16
+
+__qa_values = np.arange(QA_VALUES_COUNT, dtype=np.uint32)
+
+
+# local counterpart of rsgee.utils.bitmask: masks and scores are evaluated once
+# for every possible quality value, so decoding a quality band is a single
+# lookup per pixel
+@lru_cache(maxsize=None)
+def build_mask_lut(bitmasks, reducer='or', reverse=False):
+    matches = [(__qa_values & bitmask) == bitmask for bitmask in bitmasks]
+
+    if not matches:
+        lut = np.zeros(QA_VALUES_COUNT, dtype=bool)
+    else:
+        reduce = {'and': np.logical_and, 'or': np.logical_or}[reducer]
+        lut = reduce.reduce(matches)
+
+    if reverse:
+        lut = ~lut
+
+    lut.setflags(write=False)
+
+    return lut
+
+
+@lru_cache(maxsize=None)
+def build_score_lut(bitmasks_scores):
+    # every valid pixel scores at least 1, as the best score of get_qa_score
+    max_score = max([1, *[score for score, _ in bitmasks_scores]])
+    dtype = np.uint8 if max_score <= np.iinfo(np.uint8).max else np.int32
+
+    lut = np.ones(QA_VALUES_COUNT, dtype=dtype)
+
+    for score, bitmasks in bitmasks_scores:
+        mask = build_mask_lut(tuple(bitmasks), 'or')
+        np.maximum(lut, np.where(mask, score, 0).astype(dtype), out=lut)
+
+    lut.setflags(write=False)
+
+    return lut
+
+
+def get_mask_from_bitmask_list(quality_band, bitmasks, reducer='or', reverse=False):
+    lut = build_mask_lut(tuple(bitmasks), reducer, reverse)
+    return _lookup(lut, quality_band)
+
+
+def get_mask_from_bitmask(quality_band, bitmask):
+    return get_mask_from_bitmask_list(quality_band, [bitmask])
+
+
+def get_qa_score(quality_band, bitmasks_scores):
+    lut = build_score_lut(_freeze_scores(bitmasks_scores))
+    return _lookup(lut, quality_band)
+
+
+# same defaults as ImageCollection.mask_clouds_and_shadows, the mask is True
+# for the pixels kept
+def get_clouds_and_shadows_mask(quality_band, collection):
+    bitmasks = collection.get_bitmasks(collection.CLOUD_AND_SHADOW_BITMASKS)
+    return get_mask_from_bitmask_list(quality_band, bitmasks, reverse=True)
+
+
+# same defaults as ImageCollection.score_images
+def score_quality_band(quality_band, collection, bitmasks_scores=None):
+    bitmasks_scores = bitmasks_scores or collection.DEFAULT_QA_SCORES
+
+    bitmasks_scores = {
+        key: collection.get_bitmasks(bitmasks_names)
+        for key, bitmasks_names in bitmasks_scores.items()}
+
+    return get_qa_score(quality_band, bitmasks_scores)
+
+
+def _freeze_scores(bitmasks_scores):
+    return tuple((score, tuple(bitmasks)) for score, bitmasks in bitmasks_scores.items())
+
+
+def _lookup(lut, quality_band):
+    # masked pixels of the quality band stay masked, as in Earth Engine
+    if isinstance(quality_band, np.ma.MaskedArray):
+        values = np.take(lut, quality_band.filled(0).astype(np.intp))
+        return np.ma.MaskedArray(values, mask=np.ma.getmaskarray(quality_band))
+
+    return np.take(lut, np.asarray(quality_band).astype(np.intp, copy=False))
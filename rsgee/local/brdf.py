@@ -0,0 +1,149 @@
+from math import pi
+
+import numpy as np
+import rasterio.warp
+
+from rsgee.local.solar_position import get_solar_position
+from rsgee.local.view_angles import get_view_angles
+
+BANDS = ['BLUE', 'GREEN', 'RED', 'NIR', 'SWIR1', 'SWIR2']
+
+# ==================== BRDF parameters  ====================
+#    band     BLUE    GREEN   RED     NIR     SWIR1   SWIR2
+F_ISO = [0.0774, 0.1306, 0.1690, 0.3093, 0.3430, 0.2658]
+F_VOL = [0.0372, 0.0580, 0.0574, 0.1535, 0.1154, 0.0639]
+F_GEO = [0.0079, 0.0178, 0.0227, 0.0330, 0.0453, 0.0387]
+
+# solar zenith of the normalization, a polynomial in latitude
+SUN_ZEN_NORM_POLYNOMIAL = [31.0076, -0.1272, 0.01187, 2.4e-5, -9.48e-7, -1.95e-9, 6.15e-11]
+
+DEFAULT_GAIN = 2.5
+
+DEFAULT_CHUNK_ROWS = 512
+
+
+# local counterpart of rsgee.utils.brdf.apply_brdf_correction for a scene
+# grid: bands maps the common band names to 2D arrays (usually memory mapped)
+# over a grid given by its affine transform and CRS, the footprint is the list
+# of coordinates of system:footprint and the date the acquisition time.
+# Chunks of rows are corrected at a time, so only the angles of a chunk are
+# in memory.
+def apply_brdf_correction(bands, transform, crs, footprint, date, gain=None,
+                          out=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    names = [name for name in BANDS if name in bands]
+    rows, cols = np.shape(bands[names[0]])
+
+    if out is None:
+        out = {name: np.empty((rows, cols), dtype=np.float32) for name in names}
+
+    for start in range(0, rows, chunk_rows):
+        chunk = slice(start, min(start + chunk_rows, rows))
+        longitudes, latitudes = get_lon_lat(transform, crs, chunk, cols)
+
+        c_factors = get_c_factors(longitudes, latitudes, footprint, date, names, gain)
+
+        for name in names:
+            out[name][chunk] = bands[name][chunk] * c_factors[name]
+
+    return out
+
+
+def get_c_factors(longitudes, latitudes, footprint, date, names=BANDS, gain=None):
+    sun_zen, sun_az = get_solar_position(longitudes, latitudes, date)
+    view_az, view_zen = get_view_angles(footprint, longitudes, latitudes)
+
+    return adjust_brdf(names, latitudes, sun_zen, view_zen, sun_az, view_az, gain)
+
+
+# c-factors of the bands, the corrected reflectance is the band multiplied by
+# its factor. The normalization only depends on the latitude, it is computed
+# once per row of a geographic grid.
+def adjust_brdf(names, latitudes, sun_zen, view_zen, sun_az, view_az, gain=None):
+    gain = gain or DEFAULT_GAIN
+
+    relative_az = view_az - sun_az
+
+    sun_zen_norm = np.radians(np.polynomial.polynomial.polyval(
+        np.asarray(latitudes, dtype=np.float64), SUN_ZEN_NORM_POLYNOMIAL))
+
+    sensor_geo, sensor_vol = kernel(sun_zen, view_zen, relative_az)
+    norm_geo, norm_vol = kernel(sun_zen_norm, 0, pi)
+
+    c_factors = {}
+
+    for name in names:
+        position = BANDS.index(name)
+        f_iso, f_vol, f_geo = F_ISO[position], F_VOL[position], F_GEO[position]
+
+        norm = gain * norm_geo * f_geo + gain * norm_vol * f_vol + f_iso
+        sensor = gain * sensor_geo * f_geo + gain * sensor_vol * f_vol + f_iso
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c_factors[name] = (norm / sensor).astype(np.float32)
+
+    return c_factors
+
+
+# k_geo and k_vol kernels
+def kernel(theta_i, theta_v, azimuth):
+    b = 1
+    r = 1
+    h = 2
+
+    theta_i = np.asarray(theta_i, dtype=np.float64)
+    theta_v = np.asarray(theta_v, dtype=np.float64)
+    cos_azimuth = np.cos(azimuth)
+
+    # ================ k_vol  ================
+
+    cos_g = np.cos(theta_i) * np.cos(theta_v) + np.sin(theta_i) * np.sin(theta_v) * cos_azimuth
+    g = np.arccos(np.clip(cos_g, -1, 1))
+
+    k_vol = ((pi / 2 - g) * np.cos(g) + np.sin(g)) / (np.cos(theta_i) + np.cos(theta_v)) - pi / 4
+
+    # ================ k_geo  ================
+
+    theta_i1 = np.arctan(np.maximum(b / r * np.tan(theta_i), 0))
+    theta_v1 = np.arctan(np.maximum(b / r * np.tan(theta_v), 0))
+    tan_i1, tan_v1 = np.tan(theta_i1), np.tan(theta_v1)
+    sec_i1, sec_v1 = 1 / np.cos(theta_i1), 1 / np.cos(theta_v1)
+
+    g1 = np.arccos(np.clip(
+        np.cos(theta_i1) * np.cos(theta_v1) + np.sin(theta_i1) * np.sin(theta_v1) * cos_azimuth, -1, 1))
+
+    d = np.sqrt(np.maximum(tan_i1 ** 2 + tan_v1 ** 2 - 2 * tan_i1 * tan_v1 * cos_azimuth, 0))
+
+    tmp = tan_i1 * tan_v1 * np.sin(azimuth)
+    tmp_2 = sec_i1 + sec_v1
+
+    cos_t = h / b * np.sqrt(d ** 2 + tmp ** 2) / tmp_2
+    t = np.arccos(np.clip(cos_t, -1, 1))
+
+    o = np.maximum(1 / pi * (t - np.sin(t) * np.cos(t)) * tmp_2, 0)
+
+    k_geo = o - tmp_2 + (1 + np.cos(g1)) * sec_i1 * sec_v1 / 2
+
+    return k_geo, k_vol
+
+
+# longitudes and latitudes of the pixel centers of some rows. Geographic grids
+# return a row of longitudes and a column of latitudes, so the terms of each
+# are computed once and broadcast.
+def get_lon_lat(transform, crs, rows, cols):
+    row_centers = np.arange(rows.start, rows.stop, dtype=np.float64) + 0.5
+    col_centers = np.arange(cols, dtype=np.float64) + 0.5
+
+    if crs is None or crs.is_geographic:
+        longitudes = transform.c + transform.a * col_centers
+        latitudes = transform.f + transform.e * row_centers
+
+        return longitudes[None, :], latitudes[:, None]
+
+    col_grid, row_grid = np.meshgrid(col_centers, row_centers)
+    xs = transform.c + transform.a * col_grid + transform.b * row_grid
+    ys = transform.f + transform.d * col_grid + transform.e * row_grid
+
+    longitudes, latitudes = rasterio.warp.transform(crs, 'EPSG:4326', xs.ravel(), ys.ravel())
+
+    return (np.asarray(longitudes).reshape(xs.shape),
+            np.asarray(latitudes).reshape(xs.shape))
@@ -0,0 +1,194 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from scipy import ndimage
+
+DEFAULT_BLOCK_SIZE = 1024
+
+TEMPORAL = 'temporal'
+SPATIAL = 'spatial'
+CONNECTED_PIXELS = 'connected_pixels'
+
+EIGHT_CONNECTED = np.ones((3, 3), dtype=bool)
+FOUR_CONNECTED = ndimage.generate_binary_structure(2, 1)
+
+
+# local counterpart of the temporal and spatial filters of the agriculture
+# scripts (utils/temporal_spatial_filters.js). The stack holds the yearly
+# classification of an area, shape (years, rows, cols), usually a np.memmap.
+# Filters are (name, params) pairs applied in order, e.g.
+#   [(CONNECTED_PIXELS, {'min_pixels': 6}),
+#    (TEMPORAL, {'offsets': [1, 1], 'threshold': 2, 'start': 1, 'end': -1}),
+#    (CONNECTED_PIXELS, {'min_pixels': 6})]
+# Blocks are read with a halo wide enough for the spatial filters, filtered in
+# a process pool and written without the halo.
+def apply_filters(stack, filters, output=None, block_size=DEFAULT_BLOCK_SIZE, processes=None):
+    years, rows, cols = stack.shape
+
+    if output is None:
+        output = np.empty(stack.shape, dtype=np.uint8)
+
+    halo = sum(get_halo(name, params) for name, params in filters)
+
+    blocks = [(row, col, min(block_size, rows - row), min(block_size, cols - col))
+              for row in range(0, rows, block_size)
+              for col in range(0, cols, block_size)]
+
+    tasks = [(_get_source(stack, block, halo), block, halo, filters) for block in blocks]
+
+    def write(results):
+        for (row, col, height, width), result in zip(blocks, results):
+            output[:, row:row + height, col:col + width] = result
+
+    if processes == 1:
+        write(map(_filter_block, tasks))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            write(executor.map(_filter_block, tasks))
+
+    return output
+
+
+def get_halo(name, params):
+    if name == CONNECTED_PIXELS:
+        # a component bigger than min_pixels always has min_pixels + 1 of its
+        # pixels within min_pixels pixels of any of them
+        return max(params.get('min_pixels', 6), params.get('mode_radius', 2))
+
+    if name == SPATIAL:
+        kernel = params['kernel']
+        return max(len(kernel), len(kernel[0])) // 2
+
+    return 0
+
+
+def filter_stack(stack, filters):
+    stack = np.array(stack, dtype=np.uint8)
+
+    for name, params in filters:
+        if name == TEMPORAL:
+            stack = temporal_filter(stack, **params)
+        elif name == SPATIAL:
+            stack = np.stack([spatial_filter(image, **params) for image in stack])
+        elif name == CONNECTED_PIXELS:
+            stack = np.stack([connected_pixels_filter(image, **params) for image in stack])
+        else:
+            raise ValueError(f'Unknown filter: {name}')
+
+    return stack
+
+
+# moving window over years, as getMovingWindow with the threshold filters:
+# years are filtered in order and each window already sees the filtered
+# previous years, as the iterate of the original script. start and end slice
+# the filtered years (end=-1 skips the last one), the others only take part in
+# the windows.
+def temporal_filter(stack, offsets=1, threshold=2, mode='threshold', start=0, end=None):
+    if isinstance(offsets, int):
+        offsets = [offsets, offsets]
+
+    before, after = offsets
+    filtered = np.array(stack, dtype=np.uint8)
+
+    for position in range(*slice(start, end).indices(len(filtered))):
+        window = filtered[max(position - before, 0):position + after + 1]
+        passed = window.sum(axis=0, dtype=np.int32) >= threshold
+
+        if mode == 'inclusion':
+            passed |= filtered[position] > 0
+        elif mode == 'exclusion':
+            passed &= filtered[position] > 0
+
+        filtered[position] = passed
+
+    return filtered
+
+
+# weighted kernel convolution compared to a threshold
+def spatial_filter(image, kernel, threshold):
+    convolved = ndimage.convolve(image.astype(np.int32), np.asarray(kernel, dtype=np.int32),
+                                 mode='constant', cval=0)
+
+    return (convolved >= threshold).astype(np.uint8)
+
+
+# pixels of components with at most min_pixels pixels are replaced by the
+# mode of their neighborhood, as minConnnectedPixels
+def connected_pixels_filter(image, min_pixels=6, eight_connected=True, mode_radius=2):
+    structure = EIGHT_CONNECTED if eight_connected else FOUR_CONNECTED
+    image = np.asarray(image)
+    small = np.zeros(image.shape, dtype=bool)
+
+    for value in np.unique(image):
+        labels, _ = ndimage.label(image == value, structure=structure)
+        sizes = np.bincount(labels.ravel())
+        small |= (sizes[labels] <= min_pixels) & (labels > 0)
+
+    if not small.any():
+        return image
+
+    return np.where(small, focal_mode(image, mode_radius), image).astype(image.dtype)
+
+
+# most frequent value of a square neighborhood, ties go to the lowest value
+def focal_mode(image, radius):
+    values = np.unique(image)
+    size = 2 * radius + 1
+
+    counts = np.stack([
+        ndimage.uniform_filter((image == value).astype(np.float32), size=size, mode='constant')
+        for value in values])
+
+    return values[np.argmax(counts, axis=0)]
+
+
+def read_stack(paths, stack_path):
+    with rasterio.open(paths[0]) as first:
+        profile = first.profile
+        shape = (len(paths), first.height, first.width)
+
+    stack = np.memmap(stack_path, dtype=np.uint8, mode='w+', shape=shape)
+
+    for position, path in enumerate(paths):
+        with rasterio.open(path) as dataset:
+            for _, window in dataset.block_windows(1):
+                rows = slice(window.row_off, window.row_off + window.height)
+                cols = slice(window.col_off, window.col_off + window.width)
+                stack[position, rows, cols] = dataset.read(1, window=window)
+
+    stack.flush()
+
+    return stack, profile
+
+
+def _get_source(stack, block, halo):
+    row, col, height, width = block
+    rows, cols = stack.shape[1:]
+    window = (max(row - halo, 0), min(row + height + halo, rows),
+              max(col - halo, 0), min(col + width + halo, cols))
+
+    # memory mapped stacks are reopened by each worker, instead of pickling
+    # their blocks to the process pool
+    if isinstance(stack, np.memmap) and stack.filename:
+        return ('memmap', stack.filename, stack.dtype.str, stack.shape, stack.offset, window)
+
+    return ('array', stack[:, window[0]:window[1], window[2]:window[3]], window)
+
+
+def _filter_block(args):
+    source, (row, col, height, width), halo, filters = args
+
+    if source[0] == 'memmap':
+        _, filename, dtype, shape, offset, window = source
+        stack = np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset)
+        data = stack[:, window[0]:window[1], window[2]:window[3]]
+    else:
+        _, data, window = source
+
+    filtered = filter_stack(data, filters)
+
+    row_start = row - window[0]
+    col_start = col - window[2]
+
+    return filtered[:, row_start:row_start + height, col_start:col_start + width]
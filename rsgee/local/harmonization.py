@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+from math import pi
+
+import numpy as np
+
+from rsgee.local.solar_position import to_datetime
+
+DEFAULT_CHUNK_ROWS = 256
+
+DEFAULT_BANDS = ['BLUE', 'GREEN', 'RED', 'NIR', 'SWIR1', 'SWIR2']
+
+# validity patterns of a chunk solved by their pseudo-inverses, above it the
+# pixels are solved by their normal equations
+DEFAULT_MAX_PATTERNS = 256
+
+# pixels of a batch of normal equations
+DEFAULT_BATCH_SIZE = 65536
+
+
+# local counterpart of rsgee.utils.harmonization.harmonize_landsat. The stack
+# has shape (time, bands, rows, cols) with NaN for masked pixels, usually a
+# np.memmap, and dates are the acquisition times of its images. Every pixel
+# shares the same design matrix, so the pixels of a chunk with the same valid
+# observations are solved together by a single pseudo-inverse.
+def harmonize_landsat(stack, dates, start_date, band_names=DEFAULT_BANDS, harmonics=3,
+                      chunk_rows=DEFAULT_CHUNK_ROWS):
+    independents, independents_names = get_independent_terms(dates, start_date, harmonics)
+
+    coefficients = get_trend_coefficients(stack, independents, chunk_rows)
+    names = [f'{independent}_{band}' for independent in independents_names for band in band_names]
+
+    return {
+        'coefficients': coefficients,
+        'coefficients_names': names,
+        'independents': independents,
+        'independents_names': independents_names,
+        'harmonics': harmonics,
+    }
+
+
+# design matrix of shape (time, terms): constant, t, cos_1..n and sin_1..n
+def get_independent_terms(dates, start_date, harmonics=3):
+    frequencies = np.arange(1, harmonics + 1, dtype=np.float64)
+
+    years = np.array([get_years_between(start_date, date) for date in dates], dtype=np.float64)
+
+    # time is a float band in Earth Engine
+    time_radians = (years * 2 * pi).astype(np.float32).astype(np.float64)
+
+    angles = time_radians[:, None] * frequencies[None, :]
+
+    independents = np.concatenate([
+        np.ones((len(years), 1)),
+        time_radians[:, None],
+        np.cos(angles),
+        np.sin(angles),
+    ], axis=1)
+
+    names = ['constant', 't',
+             *[f'cos_{int(frequency)}' for frequency in frequencies],
+             *[f'sin_{int(frequency)}' for frequency in frequencies]]
+
+    return independents, names
+
+
+# coefficients of shape (terms, bands, rows, cols), as the array flattened by
+# [independents_names, dependents_names]. Pixels with fewer valid observations
+# than terms are NaN. Pixels are grouped by their validity pattern, and when a
+# chunk has more than max_patterns of them (masks varying pixel by pixel) each
+# pixel is solved by its own normal equations instead.
+def get_trend_coefficients(stack, independents, chunk_rows=DEFAULT_CHUNK_ROWS, out=None,
+                           max_patterns=DEFAULT_MAX_PATTERNS):
+    times, bands, rows, cols = stack.shape
+    terms = independents.shape[1]
+
+    if out is None:
+        out = np.empty((terms, bands, rows, cols), dtype=np.float32)
+
+    for start in range(0, rows, chunk_rows):
+        chunk = slice(start, min(start + chunk_rows, rows))
+        values = np.asarray(stack[:, :, chunk], dtype=np.float64)
+        chunk_height = values.shape[2]
+
+        values = values.reshape(times, bands, -1)
+
+        # an observation is used when every band is valid, as the inputs of
+        # the reducer
+        valid = ~np.isnan(values).any(axis=1)
+        patterns, inverse = np.unique(np.packbits(valid, axis=0).T, axis=0, return_inverse=True)
+
+        if len(patterns) > max_patterns:
+            coefficients = _solve_normal_equations(independents, values, valid)
+        else:
+            coefficients = _solve_by_pattern(independents, values, patterns, inverse.ravel())
+
+        out[:, :, chunk] = coefficients.reshape(terms, bands, chunk_height, cols)
+
+    return out
+
+
+# pixels sorted by pattern and split at its changes, one pseudo-inverse for
+# the pixels of each pattern
+def _solve_by_pattern(independents, values, patterns, inverse):
+    times, bands, pixels = values.shape
+    terms = independents.shape[1]
+
+    coefficients = np.full((terms, bands, pixels), np.nan)
+
+    order = np.argsort(inverse, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(inverse[order])) + 1)
+
+    for pattern, group in zip(patterns, groups):
+        used = np.unpackbits(pattern)[:times].astype(bool)
+
+        if used.sum() < terms:
+            continue
+
+        dependents = values[used][:, :, group].reshape(int(used.sum()), -1)
+
+        coefficients[:, :, group] = (np.linalg.pinv(independents[used]) @ dependents).reshape(terms, bands, -1)
+
+    return coefficients
+
+
+# least squares of each pixel from its own XᵀWX and XᵀWy, W being its valid
+# observations, in batches of pixels to bound the memory of the matrices
+def _solve_normal_equations(independents, values, valid, batch_size=DEFAULT_BATCH_SIZE):
+    times, bands, pixels = values.shape
+    terms = independents.shape[1]
+
+    coefficients = np.full((terms, bands, pixels), np.nan)
+    weights = valid.astype(np.float64)
+    dependents = np.where(valid[:, None, :], values, 0)
+
+    for start in range(0, pixels, batch_size):
+        batch = slice(start, min(start + batch_size, pixels))
+        solved = valid[:, batch].sum(axis=0) >= terms
+
+        if not solved.any():
+            continue
+
+        batch_weights = weights[:, batch][:, solved]
+        lhs = np.einsum('tp,ti,tj->pij', batch_weights, independents, independents)
+        rhs = np.einsum('tp,ti,tbp->pib', batch_weights, independents, dependents[:, :, batch][:, :, solved])
+
+        try:
+            solution = np.linalg.solve(lhs, rhs)
+        except np.linalg.LinAlgError:
+            # rank deficient pixels (e.g. repeated dates) get the minimum norm
+            # solution, as the pseudo-inverse
+            solution = np.linalg.pinv(lhs) @ rhs
+
+        positions = np.arange(batch.start, batch.stop)[solved]
+        coefficients[:, :, positions] = solution.transpose(1, 2, 0)
+
+    return coefficients
+
+
+# fitted values of shape (time, bands, rows, cols), named fitted_{band}
+def fit_collection(independents, coefficients, chunk_rows=DEFAULT_CHUNK_ROWS, out=None):
+    terms, bands, rows, cols = coefficients.shape
+
+    if out is None:
+        out = np.empty((len(independents), bands, rows, cols), dtype=np.float32)
+
+    for start in range(0, rows, chunk_rows):
+        chunk = slice(start, min(start + chunk_rows, rows))
+        chunk_coefficients = np.asarray(coefficients[:, :, chunk], dtype=np.float64)
+
+        fitted = independents @ chunk_coefficients.reshape(terms, -1)
+        out[:, :, chunk] = fitted.reshape(len(independents), bands, -1, cols)
+
+    return out
+
+
+# magnitude and phase of each harmonic and band, named as get_sazonality
+# (magnitude_1_NIR, phase_1_NIR), the magnitude scaled by 5 and the phase
+# scaled from [-pi, pi] to [0, 1]
+def get_sazonality(coefficients, coefficients_names):
+    sin_positions = [position for position, name in enumerate(coefficients_names)
+                     if name.startswith('sin')]
+    cos_positions = [position for position, name in enumerate(coefficients_names)
+                     if name.startswith('cos')]
+
+    flat = coefficients.reshape(-1, *coefficients.shape[2:])
+
+    sin = np.asarray(flat[sin_positions], dtype=np.float64)
+    cos = np.asarray(flat[cos_positions], dtype=np.float64)
+
+    magnitude = np.hypot(sin, cos) * 5
+    phase = (np.arctan2(sin, cos) + pi) / (2 * pi)
+
+    names = ([coefficients_names[position].replace('sin', 'magnitude', 1) for position in sin_positions]
+             + [coefficients_names[position].replace('sin', 'phase', 1) for position in sin_positions])
+
+    return np.concatenate([magnitude, phase]).astype(np.float32), names
+
+
+# fractional years between two dates, as date.difference(start_date, 'year')
+def get_years_between(start_date, date):
+    return _get_fractional_year(to_datetime(date)) - _get_fractional_year(to_datetime(start_date))
+
+
+def _get_fractional_year(date):
+    start = datetime(date.year, 1, 1, tzinfo=timezone.utc)
+    end = datetime(date.year + 1, 1, 1, tzinfo=timezone.utc)
+
+    return date.year + (date - start) / (end - start)
+
@@ -0,0 +1,249 @@
+import ast
+import operator
+import re
+
+import numpy as np
+
+from rsgee.index import Index
+
+EXPRESSION_NAME_REGEX = re.compile(r'^\s*(\w+)\s*=(?!=)')
+
+DEFAULT_CHUNK_ROWS = 1024
+
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: np.negative,
+    ast.UAdd: operator.pos,
+}
+
+_COMPARISON_OPERATORS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_FUNCTIONS = {
+    'exp': np.exp,
+    'sqrt': np.sqrt,
+    'log': np.log,
+    'log10': np.log10,
+    'abs': np.abs,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'min': np.minimum,
+    'max': np.maximum,
+    'pow': np.power,
+}
+
+__compiled = {}
+
+
+# local counterpart of rsgee.index: the same expression strings of Index are
+# parsed once and compiled into a tree of numpy calls, so indexes can be
+# computed over downloaded rasters and checked without Earth Engine
+def compile_index(index):
+    if index not in __compiled:
+        __compiled[index] = compile_expression(index.value)
+
+    return __compiled[index]
+
+
+def compile_expression(expression):
+    match = EXPRESSION_NAME_REGEX.match(expression)
+    name = match.group(1) if match else None
+    body = expression[match.end():] if match else expression
+
+    # Earth Engine expressions use '? :' for conditionals and '&&'/'||' for
+    # logical operators, they are rewritten to their python counterparts
+    body = _rewrite_conditionals(body).replace('&&', ' and ').replace('||', ' or ')
+
+    return name, _compile_node(ast.parse(body.strip(), mode='eval').body, expression)
+
+
+def calculate_index(index, bands, params={}):
+    _, kernel = compile_index(index)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        result = np.asarray(kernel(bands, params), dtype=np.float32)
+
+    # Earth Engine masks the pixels of invalid operations
+    result[~np.isfinite(result)] = np.nan
+
+    return result
+
+
+# computes an index by blocks of rows, so memory mapped bands are read a block
+# at a time and the result can be written to a memory mapped output
+def calculate_index_by_chunks(index, bands, params={}, out=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    shape = np.shape(next(iter(bands.values())))
+
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+
+    for start in range(0, shape[0], chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        chunk_bands = {name: band[rows] for name, band in bands.items()}
+        chunk_params = {key: value[rows] if isinstance(value, np.ndarray) else value
+                        for key, value in params.items()}
+
+        out[rows] = calculate_index(index, chunk_bands, chunk_params)
+
+    return out
+
+
+def calculate_indexes(bands, indexes, parameters={}):
+    bands = dict(bands)
+
+    for index in indexes:
+        params = parameters.get(index.name, {})
+        calculate = __indexes_functions.get(index.name, __default_calculator)
+        bands.update(calculate(bands, index, params))
+
+    return bands
+
+
+def __default_calculator(bands, index, params={}):
+    name, _ = compile_index(index)
+    return {name or index.name: calculate_index(index, bands, params)}
+
+
+def __SAFER(bands, index, params):
+    planetary_albedo = calculate_index(index, bands, params)
+
+    temperature_celsius = bands['TIR1'] - 273.15
+    ndvi = calculate_index(Index.NDVI, bands)
+
+    surface_albedo = planetary_albedo * params.get('A_ALBEDO') + params.get('B_ALBEDO')
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        safer = np.exp(temperature_celsius * params.get('B_ET_ET0')
+                       / (ndvi * surface_albedo) + params.get('A_ET_ET0'))
+
+    safer = np.where(ndvi < 0, 0, safer).astype(np.float32)
+    safer[~np.isfinite(safer)] = np.nan
+
+    return {'SAFER': safer}
+
+
+def __CEI(bands, index, params):
+    # missing wet or dry bands are masked, as the constant bands of the server
+    # implementation
+    def get_band(name):
+        return bands.get(name, np.full(np.shape(next(iter(bands.values()))), np.nan))
+
+    return {
+        output_band: calculate_index(index, bands, {
+            'wet_max': get_band(wet_band),
+            'dry_min': get_band(dry_band),
+        })
+        for wet_band, dry_band, output_band
+        in zip(params['wet_bands'], params['dry_bands'], params['output_bands'])
+    }
+
+
+__indexes_functions = {
+    Index.SAFER.name: __SAFER,
+    Index.CEI.name: __CEI,
+}
+
+
+def _compile_node(node, expression):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = node.value
+        return lambda bands, params: value
+
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'i':
+        band = node.attr
+        return lambda bands, params: bands[band]
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda bands, params: params[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        function = _BINARY_OPERATORS[type(node.op)]
+        left = _compile_node(node.left, expression)
+        right = _compile_node(node.right, expression)
+        return lambda bands, params: function(left(bands, params), right(bands, params))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        function = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand, expression)
+        return lambda bands, params: function(operand(bands, params))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand, expression)
+        return lambda bands, params: np.logical_not(operand(bands, params))
+
+    if (isinstance(node, ast.Compare) and len(node.ops) == 1
+            and type(node.ops[0]) in _COMPARISON_OPERATORS):
+        function = _COMPARISON_OPERATORS[type(node.ops[0])]
+        left = _compile_node(node.left, expression)
+        right = _compile_node(node.comparators[0], expression)
+        return lambda bands, params: function(left(bands, params), right(bands, params))
+
+    if isinstance(node, ast.BoolOp):
+        function = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        values = [_compile_node(value, expression) for value in node.values]
+
+        def evaluate(bands, params):
+            result = values[0](bands, params)
+
+            for value in values[1:]:
+                result = function(result, value(bands, params))
+
+            return result
+
+        return evaluate
+
+    if isinstance(node, ast.IfExp):
+        test = _compile_node(node.test, expression)
+        body = _compile_node(node.body, expression)
+        orelse = _compile_node(node.orelse, expression)
+        return lambda bands, params: np.where(
+            test(bands, params), body(bands, params), orelse(bands, params))
+
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS and not node.keywords):
+        function = _FUNCTIONS[node.func.id]
+        arguments = [_compile_node(argument, expression) for argument in node.args]
+        return lambda bands, params: function(
+            *[argument(bands, params) for argument in arguments])
+
+    raise ValueError(f'Unsupported index expression: {expression}')
+
+
+def _rewrite_conditionals(body):
+    # 'a ? b : c' becomes '(b) if (a) else (c)', right associative as in
+    # Earth Engine, e.g. 'a ? b : c ? d : e'
+    if '?' not in body:
+        return body
+
+    condition, rest = body.split('?', 1)
+    depth = 0
+
+    for position, character in enumerate(rest):
+        if character == '?':
+            depth += 1
+        elif character == ':':
+            if depth == 0:
+                value, otherwise = rest[:position], rest[position + 1:]
+                return '({0}) if ({1}) else ({2})'.format(
+                    _rewrite_conditionals(value), condition.strip(),
+                    _rewrite_conditionals(otherwise))
+
+            depth -= 1
+
+    raise ValueError(f'Unbalanced conditional expression: {body}')
@@ -0,0 +1,217 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from rsgee import export
+from rsgee.local.index import compile_expression
+
+DEFAULT_BLOCK_SIZE = 512
+
+DEFAULT_CREATION_OPTIONS = {
+    'tiled': True,
+    'compress': 'deflate',
+    'bigtiff': 'if_safer',
+}
+
+# opened tiles of each worker process
+__datasets = {}
+
+
+# exported files of a year, named by EXPORT_FILENAME_PATTERN. Large exports
+# split by Earth Engine in several files are included.
+def find_tiles(directory, year, filename_sufix):
+    filename = export.get_filename(year, '*', filename_sufix)
+
+    paths = [*glob.glob(os.path.join(directory, f'{filename}.tif')),
+             *glob.glob(os.path.join(directory, f'{filename}-*-*.tif'))]
+
+    return sorted(set(paths))
+
+
+# merges tiles of the same grid in a tiled and compressed GeoTIFF, block by
+# block in a process pool, so memory only holds a few blocks at a time.
+# Sources maps variable names to their tiles. Without calc the tiles of a
+# single variable are merged, later tiles overwrite earlier ones as in
+# gdal_merge. With calc, e.g. '(A+B+C)>=3', every variable is merged and the
+# expression is evaluated over their first bands in the same pass.
+def merge(sources, output_path, calc=None, nodata=0, dtype=None,
+          block_size=DEFAULT_BLOCK_SIZE, processes=None, overviews=False):
+    if not isinstance(sources, dict):
+        sources = {'A': list(sources)}
+
+    tiles, profile = _get_tiles_layout(sources, nodata)
+
+    count = 1 if calc else profile['count']
+    dtype = dtype or (np.uint8 if calc else profile['dtype'])
+
+    output_profile = {
+        'driver': 'GTiff',
+        'width': profile['width'],
+        'height': profile['height'],
+        'count': count,
+        'dtype': dtype,
+        'crs': profile['crs'],
+        'transform': profile['transform'],
+        'nodata': nodata,
+        'blockxsize': block_size,
+        'blockysize': block_size,
+        **DEFAULT_CREATION_OPTIONS,
+    }
+
+    windows = [Window(col, row,
+                      min(block_size, profile['width'] - col),
+                      min(block_size, profile['height'] - row))
+               for row in range(0, profile['height'], block_size)
+               for col in range(0, profile['width'], block_size)]
+
+    def get_tasks(windows):
+        return [(window, _get_window_tiles(tiles, window), count, nodata, calc, dtype)
+                for window in windows]
+
+    with rasterio.open(output_path, 'w', **output_profile) as output:
+        if processes == 1:
+            for window, block in zip(windows, map(_merge_block, get_tasks(windows))):
+                output.write(block, window=window)
+        else:
+            with ProcessPoolExecutor(processes) as executor:
+                # blocks are submitted in batches, so finished blocks waiting
+                # to be written do not pile up in memory
+                batch_size = (processes or os.cpu_count() or 1) * 4
+
+                for start in range(0, len(windows), batch_size):
+                    batch = windows[start:start + batch_size]
+                    blocks = executor.map(_merge_block, get_tasks(batch))
+
+                    for window, block in zip(batch, blocks):
+                        output.write(block, window=window)
+
+        if overviews:
+            output.build_overviews([2, 4, 8, 16, 32], Resampling.nearest)
+
+    return output_path
+
+
+def _get_tiles_layout(sources, nodata):
+    infos = {}
+
+    for variable, paths in sources.items():
+        for path in paths:
+            with rasterio.open(path) as dataset:
+                infos[path] = {
+                    'bounds': dataset.bounds,
+                    'transform': dataset.transform,
+                    'width': dataset.width,
+                    'height': dataset.height,
+                    'count': dataset.count,
+                    'dtype': dataset.dtypes[0],
+                    'crs': dataset.crs,
+                    'nodata': dataset.nodata,
+                }
+
+    first = next(iter(infos.values()))
+    resolution_x, resolution_y = first['transform'].a, -first['transform'].e
+
+    left = min(info['bounds'].left for info in infos.values())
+    top = max(info['bounds'].top for info in infos.values())
+    right = max(info['bounds'].right for info in infos.values())
+    bottom = min(info['bounds'].bottom for info in infos.values())
+
+    # tiles exported at the same scale share the pixel grid, so each tile is
+    # placed by integer offsets in the output
+    tiles = {
+        variable: [
+            (path,
+             int(round((infos[path]['bounds'].left - left) / resolution_x)),
+             int(round((top - infos[path]['bounds'].top) / resolution_y)),
+             infos[path]['width'],
+             infos[path]['height'],
+             infos[path]['nodata'] if infos[path]['nodata'] is not None else nodata)
+            for path in paths
+        ]
+        for variable, paths in sources.items()
+    }
+
+    profile = {
+        'width': int(round((right - left) / resolution_x)),
+        'height': int(round((top - bottom) / resolution_y)),
+        'count': first['count'],
+        'dtype': first['dtype'],
+        'crs': first['crs'],
+        'transform': from_origin(left, top, resolution_x, resolution_y),
+    }
+
+    return tiles, profile
+
+
+def _get_window_tiles(tiles, window):
+    def intersects(tile):
+        _, col_off, row_off, width, height, _ = tile
+        return (col_off < window.col_off + window.width and window.col_off < col_off + width
+                and row_off < window.row_off + window.height and window.row_off < row_off + height)
+
+    return {variable: [tile for tile in variable_tiles if intersects(tile)]
+            for variable, variable_tiles in tiles.items()}
+
+
+def _merge_block(args):
+    window, tiles, count, nodata, calc, dtype = args
+
+    variables = {
+        variable: _read_merged(variable_tiles, window, 1 if calc else count, nodata)
+        for variable, variable_tiles in tiles.items()
+    }
+
+    if not calc:
+        return next(iter(variables.values())).astype(dtype)
+
+    _, kernel = compile_expression(calc)
+    values = {variable: data[0] for variable, data in variables.items()}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.asarray(kernel({}, values)).astype(dtype)
+
+    valid = np.any([data[0] != nodata for data in variables.values()], axis=0)
+
+    return np.where(valid, result, nodata).astype(dtype)[None]
+
+
+def _read_merged(tiles, window, count, nodata):
+    block = None
+
+    for path, col_off, row_off, width, height, tile_nodata in tiles:
+        col_start = max(window.col_off, col_off)
+        row_start = max(window.row_off, row_off)
+        col_end = min(window.col_off + window.width, col_off + width)
+        row_end = min(window.row_off + window.height, row_off + height)
+
+        data = _open(path).read(
+            list(range(1, count + 1)),
+            window=Window(col_start - col_off, row_start - row_off,
+                          col_end - col_start, row_end - row_start))
+
+        if block is None:
+            block = np.full((count, window.height, window.width), nodata, dtype=data.dtype)
+
+        target = block[:, row_start - window.row_off:row_end - window.row_off,
+                       col_start - window.col_off:col_end - window.col_off]
+
+        valid = data != tile_nodata
+        target[valid] = data[valid]
+
+    if block is None:
+        block = np.full((count, window.height, window.width), nodata)
+
+    return block
+
+
+def _open(path):
+    if path not in __datasets:
+        __datasets[path] = rasterio.open(path)
+
+    return __datasets[path]
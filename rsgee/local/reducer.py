@@ -0,0 +1,155 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 256
+
+
+# local counterpart of ImageCollection.apply_reducers. The stack is an array
+# of shape (time, bands, rows, cols) where masked pixels are NaN, usually a
+# np.memmap, and the reducers are the same specs of rsgee.reducer.Reducer.
+# Output bands are named as the combined reducers of Earth Engine, band by
+# band ({band}_{output}), followed by the quality mosaic bands ({band}_qmo).
+def apply_reducers(stack, band_names, reducers, chunk_rows=DEFAULT_CHUNK_ROWS, processes=None):
+    band_names = list(band_names)
+    output_names = get_output_names(band_names, reducers)
+
+    rows = stack.shape[2]
+    output = np.empty((len(output_names), rows, stack.shape[3]), dtype=np.float32)
+
+    chunks = [slice(start, min(start + chunk_rows, rows))
+              for start in range(0, rows, chunk_rows)]
+    tasks = [(_get_source(stack, chunk), band_names, reducers) for chunk in chunks]
+
+    def write(results):
+        for chunk, result in zip(chunks, results):
+            output[:, chunk] = result
+
+    if processes == 1:
+        write(map(_reduce_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            write(executor.map(_reduce_chunk, tasks))
+
+    return output, output_names
+
+
+def get_output_names(band_names, reducers):
+    reducers, qmo = _split_qmo(reducers)
+
+    names = [f'{band}_{output}'
+             for band in band_names
+             for reducer in reducers
+             for output in _get_reducer_outputs(reducer)]
+
+    if qmo:
+        names += [f'{band}_qmo' for band in band_names]
+
+    return names
+
+
+def reduce_stack(stack, band_names, reducers):
+    reducers, qmo = _split_qmo(reducers)
+    outputs = []
+
+    with warnings.catch_warnings():
+        # pixels masked in every image are expected and stay NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+
+        for position in range(len(band_names)):
+            values = stack[:, position].astype(np.float32, copy=False)
+
+            for reducer in reducers:
+                outputs.extend(_reduce(values, reducer))
+
+    if qmo:
+        outputs.extend(quality_mosaic(stack, band_names.index(_get_quality_band(qmo[0]))))
+
+    return np.stack(outputs) if outputs else np.empty((0, *stack.shape[2:]), dtype=np.float32)
+
+
+# image of the highest quality value of each pixel, as qualityMosaic
+def quality_mosaic(stack, quality_position):
+    quality = stack[:, quality_position].astype(np.float32)
+    valid = ~np.isnan(quality)
+
+    best = np.argmax(np.where(valid, quality, -np.inf), axis=0)
+    mosaic = np.take_along_axis(stack, best[None, None], axis=0)[0].astype(np.float32)
+
+    mosaic[:, ~valid.any(axis=0)] = np.nan
+
+    return list(mosaic)
+
+
+def _reduce(values, reducer):
+    name = _get_reducer_name(reducer)
+    params = reducer.get('params')
+
+    if name == 'percentile':
+        return list(np.nanpercentile(values, _get_percentiles(params), axis=0))
+
+    if name == 'count':
+        return [np.sum(~np.isnan(values), axis=0).astype(np.float32)]
+
+    return [{
+        'mean': np.nanmean,
+        'median': np.nanmedian,
+        'max': np.nanmax,
+        'min': np.nanmin,
+        'stdDev': np.nanstd,
+    }[name](values, axis=0)]
+
+
+def _get_reducer_outputs(reducer):
+    name = _get_reducer_name(reducer)
+
+    if name == 'percentile':
+        return [f'p{percentile}' for percentile in _get_percentiles(reducer.get('params'))]
+
+    return [name]
+
+
+def _get_reducer_name(reducer):
+    return reducer['reducer_name'].split('.')[-1]
+
+
+def _get_percentiles(params):
+    if isinstance(params, dict):
+        return params['percentiles']
+
+    return params
+
+
+def _get_quality_band(reducer):
+    quality_band = reducer['params']
+    return getattr(quality_band, 'name', quality_band)
+
+
+def _split_qmo(reducers):
+    qmo = [reducer for reducer in reducers if _get_reducer_name(reducer) == 'qmo']
+    others = [reducer for reducer in reducers if _get_reducer_name(reducer) != 'qmo']
+
+    return others, qmo
+
+
+def _get_source(stack, chunk):
+    # memory mapped stacks are reopened by each worker, instead of pickling
+    # their chunks to the process pool
+    if isinstance(stack, np.memmap) and stack.filename:
+        return ('memmap', stack.filename, stack.dtype.str, stack.shape, stack.offset, chunk)
+
+    return ('array', stack[:, :, chunk])
+
+
+def _reduce_chunk(args):
+    source, band_names, reducers = args
+
+    if source[0] == 'memmap':
+        _, filename, dtype, shape, offset, chunk = source
+        stack = np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset)
+        stack = stack[:, :, chunk]
+    else:
+        stack = source[1]
+
+    return reduce_stack(np.asarray(stack), band_names, reducers)
@@ -0,0 +1,274 @@
+import json
+import math
+import os
+
+import ee
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from rsgee.utils.spatial_index import buffer_bounds
+
+INDEX_COLUMN = 'system:index'
+SOURCE_COLUMN = 'source'
+GEOMETRY_COLUMN = '.geo'
+LONGITUDE_COLUMN = 'longitude'
+LATITUDE_COLUMN = 'latitude'
+CELL_COLUMN = 'cell'
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('year', pa.int32()), ('region_id', pa.string())]), flavor='hive')
+
+DEFAULT_CELL_SIZE = 0.1
+
+DEFAULT_ROW_GROUP_SIZE = 16384
+
+# cells of a row of the cell grid, enough for the whole globe with cells of
+# a thousandth of a degree
+CELLS_PER_ROW = 360000
+
+
+class SampleStore:
+    # exported sample tables (CSV or GeoJSON) stored as Parquet files
+    # partitioned by year and region. Rows are sorted by a grid cell of their
+    # point, so the row groups of a file cover small areas and bounds queries
+    # only read the row groups whose coordinates statistics intersect them.
+    # Every row keeps its system:index and the asset it was exported from, so
+    # selected samples can be sent back to Earth Engine as a filter of their
+    # source instead of a list of features.
+
+    def __init__(self, directory, cell_size=DEFAULT_CELL_SIZE, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        self.__directory = directory
+        self.__cell_size = cell_size
+        self.__row_group_size = row_group_size
+
+    def get_path(self, year, region_id, name):
+        return os.path.join(self.__directory, f'year={year}', f'region_id={region_id}', f'{name}.parquet')
+
+    # ingesting the same file again replaces its partition file
+    def ingest(self, path, year, region_id='', source=None):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return self.ingest_table(read_table(path), year, region_id, name, source)
+
+    def ingest_table(self, table, year, region_id, name, source=None):
+        table = self.__prepare(table, source)
+
+        output_path = self.get_path(year, region_id, name)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        pq.write_table(table, output_path, row_group_size=self.__row_group_size)
+
+        return output_path
+
+    def get_dataset(self):
+        return ds.dataset(self.__directory, format='parquet', partitioning=PARTITIONING)
+
+    def load(self, years=None, regions_ids=None, bounds=None, columns=None, filter=None):
+        if not os.path.isdir(self.__directory):
+            return pa.table({})
+
+        expression = filter
+
+        if years is not None:
+            expression = _and(expression, ds.field('year').isin([int(year) for year in years]))
+
+        if regions_ids is not None:
+            expression = _and(expression, ds.field('region_id').isin([str(id) for id in regions_ids]))
+
+        if bounds is not None:
+            xmin, ymin, xmax, ymax = bounds
+            expression = _and(expression, (
+                (ds.field(LONGITUDE_COLUMN) >= xmin) & (ds.field(LONGITUDE_COLUMN) <= xmax)
+                & (ds.field(LATITUDE_COLUMN) >= ymin) & (ds.field(LATITUDE_COLUMN) <= ymax)))
+
+        return self.get_dataset().to_table(columns=columns, filter=expression)
+
+    # count and last modification of the partition files, ingesting or
+    # removing samples changes it
+    def get_version(self):
+        if not os.path.isdir(self.__directory):
+            return None
+
+        files = [os.path.join(root, name)
+                 for root, _, names in os.walk(self.__directory)
+                 for name in names if name.endswith('.parquet')]
+
+        return {'files': len(files),
+                'modified': max([os.path.getmtime(path) for path in files], default=None)}
+
+    # samples within a distance in meters of some bounds, as the
+    # filterBounds(geometry.buffer(distance)) of the classification scripts
+    def load_near(self, bounds, distance=0, years=None, columns=None, filter=None):
+        return self.load(years=years, bounds=buffer_bounds(bounds, distance),
+                         columns=columns, filter=filter)
+
+    def __prepare(self, table, source):
+        table = _add_coordinates(table)
+
+        if SOURCE_COLUMN not in table.column_names:
+            table = table.append_column(SOURCE_COLUMN, pa.array([source] * table.num_rows, pa.string()))
+
+        # partition columns come from the directories
+        table = table.drop([name for name in ('year', 'region_id') if name in table.column_names])
+
+        cells = get_cells(np.asarray(table.column(LONGITUDE_COLUMN)),
+                          np.asarray(table.column(LATITUDE_COLUMN)),
+                          self.__cell_size)
+
+        if CELL_COLUMN in table.column_names:
+            table = table.drop([CELL_COLUMN])
+
+        table = table.append_column(CELL_COLUMN, pa.array(cells))
+
+        return table.take(pa.array(np.argsort(cells, kind='stable')))
+
+
+def read_table(path):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        # system:index is kept as a string even when every id looks like a number
+        return pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+            column_types={INDEX_COLUMN: pa.string(), GEOMETRY_COLUMN: pa.string()}))
+
+    if extension in ('.json', '.geojson'):
+        with open(path) as file:
+            collection = json.load(file)
+
+        features = collection['features']
+        names = list(dict.fromkeys(name for feature in features
+                                   for name in feature.get('properties', {})))
+
+        columns = {name: [feature.get('properties', {}).get(name) for feature in features]
+                   for name in names}
+        columns[INDEX_COLUMN] = [str(feature.get('id', position))
+                                 for position, feature in enumerate(features)]
+        columns[GEOMETRY_COLUMN] = [json.dumps(feature.get('geometry')) for feature in features]
+
+        return pa.table(columns)
+
+    if extension == '.parquet':
+        return pq.read_table(path)
+
+    raise ValueError(f'Unsupported samples file: {path}')
+
+
+def get_cells(longitudes, latitudes, cell_size=DEFAULT_CELL_SIZE):
+    columns = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) / cell_size)
+    rows = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) / cell_size)
+
+    return (rows * CELLS_PER_ROW + columns).astype(np.int64)
+
+
+# random draw of count rows, the same seed always draws the same rows, as
+# randomColumn(seed=seed).limit(count, 'RANDOM')
+def draw(table, count, seed=0):
+    if count is None or count >= table.num_rows:
+        return table
+
+    generator = np.random.default_rng(seed)
+    positions = np.sort(generator.permutation(table.num_rows)[:max(int(count), 0)])
+
+    return table.take(pa.array(positions))
+
+
+# rows exported from a source and the other rows
+def split_by_source(table, source):
+    is_source = _equal(table.column(SOURCE_COLUMN), source)
+    return table.filter(is_source), table.filter(pc.invert(is_source))
+
+
+# balanced training set of the classification scripts: the class of interest
+# keeps up to total samples and is topped up with extra samples to reach
+# min_coi, the other classes fill the set up to total samples
+def draw_balanced(table, total, min_coi=0, extra=None, class_column='class', class_value=1, seed=0):
+    samples = draw(table, total, seed)
+    is_coi = _equal(samples.column(class_column), class_value)
+
+    coi = samples.filter(is_coi)
+    others = samples.filter(pc.invert(is_coi))
+
+    if extra is not None and coi.num_rows < min_coi:
+        extra_coi = draw(extra, min_coi - coi.num_rows, seed)
+        coi = pa.concat_tables([coi, _align(extra_coi, coi.schema)])
+
+    others = draw(others, max(total - coi.num_rows, 0), seed)
+
+    return pa.concat_tables([coi, others])
+
+
+# selected samples as a filter of the assets they came from, a compact graph
+# even for thousands of samples
+def to_feature_collection(table):
+    sources = table.column(SOURCE_COLUMN).to_pylist()
+    indexes = table.column(INDEX_COLUMN).to_pylist()
+
+    ids_by_source = {}
+
+    for source, index in zip(sources, indexes):
+        if not source:
+            raise ValueError('Samples without source can not be sent to Earth Engine')
+
+        ids_by_source.setdefault(source, []).append(index)
+
+    collections = [ee.FeatureCollection(source).filter(ee.Filter.inList(INDEX_COLUMN, ids))
+                   for source, ids in sorted(ids_by_source.items())]
+
+    if not collections:
+        return ee.FeatureCollection([])
+
+    collection = collections[0]
+
+    for other in collections[1:]:
+        collection = collection.merge(other)
+
+    return collection
+
+
+def _add_coordinates(table):
+    if LONGITUDE_COLUMN in table.column_names and LATITUDE_COLUMN in table.column_names:
+        return table
+
+    if GEOMETRY_COLUMN not in table.column_names:
+        raise ValueError('Samples need a .geo column or longitude and latitude columns')
+
+    points = [_get_point(geometry) for geometry in table.column(GEOMETRY_COLUMN).to_pylist()]
+
+    table = table.drop([GEOMETRY_COLUMN])
+    table = table.append_column(LONGITUDE_COLUMN, pa.array([point[0] for point in points], pa.float64()))
+    table = table.append_column(LATITUDE_COLUMN, pa.array([point[1] for point in points], pa.float64()))
+
+    return table
+
+
+def _get_point(geometry):
+    if not geometry:
+        return math.nan, math.nan
+
+    geometry = json.loads(geometry) if isinstance(geometry, str) else geometry
+    coordinates = geometry['coordinates']
+
+    while isinstance(coordinates[0], list):
+        coordinates = coordinates[0]
+
+    return coordinates[0], coordinates[1]
+
+
+def _align(table, schema):
+    columns = [table.column(field.name).cast(field.type) if field.name in table.column_names
+               else pa.nulls(table.num_rows, field.type)
+               for field in schema]
+
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _and(expression, other):
+    return other if expression is None else expression & other
+
+
+# the compute functions of pyarrow 2.0 only take arrow values
+def _equal(column, value):
+    return pc.equal(column, pa.scalar(value, type=column.type))
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+from math import pi
+
+import numpy as np
+
+
+# local counterpart of rsgee.utils.solar_position.get_solar_position. Angles
+# are in radians and longitudes and latitudes in degrees. Arrays broadcast, so
+# the longitudes of a row (1, cols) and the latitudes of a column (rows, 1)
+# compute the terms of latitude once per row and of longitude once per column.
+# The terms of the date are computed once per call.
+def get_solar_position(longitudes, latitudes, date):
+    jdpr, seconds_gmt = get_date_terms(date)
+
+    lon_deg = np.asarray(longitudes, dtype=np.float64)
+    lat_rad = np.radians(np.asarray(latitudes, dtype=np.float64))
+
+    local_solar_diff = ((0.000075
+                         + 0.001868 * np.cos(jdpr) - 0.032077 * np.sin(jdpr)
+                         - 0.014615 * np.cos(2 * jdpr) - 0.040849 * np.sin(2 * jdpr))
+                        * 12 * 60 / pi)
+
+    mean_solar_time = seconds_gmt / 3600 + lon_deg / 15
+    true_solar_time = mean_solar_time + local_solar_diff / 60 - 12
+    angle_hour = true_solar_time * 15 * pi / 180
+
+    # solar declination
+    delta = (0.006918
+             - 0.399912 * np.cos(jdpr) + 0.070257 * np.sin(jdpr)
+             - 0.006758 * np.cos(2 * jdpr) + 0.000907 * np.sin(2 * jdpr)
+             - 0.002697 * np.cos(3 * jdpr) + 0.001480 * np.sin(3 * jdpr))
+
+    sin_lat, cos_lat = np.sin(lat_rad), np.cos(lat_rad)
+    sin_hour, cos_hour = np.sin(angle_hour), np.cos(angle_hour)
+
+    cos_sun_zen = sin_lat * np.sin(delta) + cos_lat * np.cos(delta) * cos_hour
+    sun_zen = np.arccos(np.clip(cos_sun_zen, -1, 1))
+    sin_sun_zen = np.sin(sun_zen)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sin_sun_az_sw = np.clip(np.cos(delta) * sin_hour / sin_sun_zen, -1, 1)
+        cos_sun_az_sw = (-cos_lat * np.sin(delta) + sin_lat * np.cos(delta) * cos_hour) / sin_sun_zen
+
+    sun_az_sw = np.arcsin(sin_sun_az_sw)
+    sun_az_sw = np.where(cos_sun_az_sw <= 0, pi - sun_az_sw, sun_az_sw)
+    sun_az_sw = np.where((cos_sun_az_sw > 0) & (sin_sun_az_sw <= 0), 2 * pi + sun_az_sw, sun_az_sw)
+
+    sun_az = sun_az_sw + pi
+    sun_az = np.where(sun_az > 2 * pi, sun_az - 2 * pi, sun_az)
+
+    return sun_zen, sun_az
+
+
+# julian date proportion in radians and seconds since the start of the day,
+# as date.getFraction('year') and date.getRelative('second', 'day') in UTC
+def get_date_terms(date):
+    date = to_datetime(date)
+
+    start_of_year = datetime(date.year, 1, 1, tzinfo=timezone.utc)
+    start_of_next_year = datetime(date.year + 1, 1, 1, tzinfo=timezone.utc)
+    start_of_day = datetime(date.year, date.month, date.day, tzinfo=timezone.utc)
+
+    fraction = (date - start_of_year) / (start_of_next_year - start_of_year)
+
+    return fraction * 2 * pi, int((date - start_of_day).total_seconds())
+
+
+def to_datetime(date):
+    # milliseconds since the epoch, as system:time_start
+    if isinstance(date, (int, float)):
+        return datetime.fromtimestamp(date / 1000, tz=timezone.utc)
+
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+
+    return date.astimezone(timezone.utc)
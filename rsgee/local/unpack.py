@@ -0,0 +1,64 @@
+import os
+import re
+
+import rasterio
+
+from rsgee.utils import cache
+
+# suffix added by Earth Engine when a large export is split in several files
+TILE_SUFFIX_REGEX = re.compile(r'-\d{10}-\d{10}$')
+
+
+# splits a packed multi-year file, exported to drive or cloud storage, into one
+# file per year. Bands are packed year after year in the order of the manifest,
+# the file is read by blocks so large tiles do not need to fit in memory.
+def unpack_file(path, output_directory, manifest=None):
+    if manifest is None:
+        manifest = read_manifest(path)
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    bands_count = len(manifest['bands'])
+    tile_suffix = get_tile_suffix(path)
+    paths = []
+
+    with rasterio.open(path) as packed:
+        profile = {**packed.profile, 'count': bands_count}
+
+        for position, year in enumerate(manifest['years']):
+            first_band = position * bands_count + 1
+            indexes = list(range(first_band, first_band + bands_count))
+
+            output_path = os.path.join(
+                output_directory,
+                '{0}{1}.tif'.format(manifest['filenames'][str(year)], tile_suffix))
+
+            with rasterio.open(output_path, 'w', **profile) as unpacked:
+                for _, window in packed.block_windows(1):
+                    unpacked.write(packed.read(indexes, window=window), window=window)
+
+                unpacked.descriptions = tuple(manifest['bands'])
+
+            paths.append(output_path)
+
+    return paths
+
+
+def read_manifest(path):
+    filename = os.path.splitext(os.path.basename(path))[0]
+    filename = TILE_SUFFIX_REGEX.sub('', filename)
+
+    manifest_path = os.path.join(cache.get_cache_directory('manifests'), f'{filename}.json')
+    manifest = cache.read_json(manifest_path)
+
+    if manifest is None:
+        raise FileNotFoundError(f'Manifest not found: {manifest_path}')
+
+    return manifest
+
+
+def get_tile_suffix(path):
+    filename = os.path.splitext(os.path.basename(path))[0]
+    match = TILE_SUFFIX_REGEX.search(filename)
+
+    return match.group(0) if match else ''
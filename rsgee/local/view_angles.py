@@ -0,0 +1,110 @@
+from math import pi
+
+import numpy as np
+
+MAX_DISTANCE_TO_SCENE_EDGE = 210000
+
+MAX_SATELLITE_ZENITH = 7.5
+
+# radius of the sphere of the geodesic distances, only the ratio of the
+# distances to the scene edges is used
+EARTH_RADIUS = 6378137
+
+
+# local counterpart of rsgee.utils.view_angles.get_view_angles. The footprint
+# is the list of [lon, lat] coordinates of system:footprint, angles are in
+# radians and pixels farther than MAX_DISTANCE_TO_SCENE_EDGE from the scene
+# edges are NaN, as the masked pixels of FeatureCollection.distance.
+def get_view_angles(footprint, longitudes, latitudes):
+    corners = find_corners(footprint)
+
+    # center line of the scene, between the 'top' points and the 'bottom' points
+    upper_center = point_between(corners['upper_left'], corners['upper_right'])
+    lower_center = point_between(corners['lower_left'], corners['lower_right'])
+    slope = slope_between(lower_center, upper_center)
+
+    view_az = pi / 2 - np.arctan(-1 / slope)
+
+    left = get_distance_to_segment(longitudes, latitudes, corners['upper_left'], corners['lower_left'])
+    right = get_distance_to_segment(longitudes, latitudes, corners['upper_right'], corners['lower_right'])
+
+    left = np.where(left <= MAX_DISTANCE_TO_SCENE_EDGE, left, np.nan)
+    right = np.where(right <= MAX_DISTANCE_TO_SCENE_EDGE, right, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        view_zen = ((right * MAX_SATELLITE_ZENITH * 2) / (right + left) - MAX_SATELLITE_ZENITH) * pi / 180
+
+    return np.full(np.shape(view_zen), view_az), view_zen
+
+
+# corners closest to the edges of the bounds, as find_corners of the server
+# implementation
+def find_corners(footprint):
+    coordinates = np.asarray(_get_ring(footprint), dtype=np.float64)
+    xs, ys = coordinates[:, 0], coordinates[:, 1]
+
+    def find_corner(target, values):
+        return [float(value) for value in coordinates[np.argmin(np.abs(values - target))]]
+
+    return {
+        'upper_left': find_corner(ys.max(), ys),
+        'upper_right': find_corner(xs.max(), xs),
+        'lower_right': find_corner(ys.min(), ys),
+        'lower_left': find_corner(xs.min(), xs),
+    }
+
+
+# center point between two points, on the sphere
+def point_between(point_a, point_b):
+    middle = _to_vector(*point_a) + _to_vector(*point_b)
+    return _to_lon_lat(middle / np.linalg.norm(middle))
+
+
+def slope_between(point_a, point_b):
+    return (point_a[1] - point_b[1]) / (point_a[0] - point_b[0])
+
+
+# distance in meters from points to the geodesic segment between two points
+def get_distance_to_segment(longitudes, latitudes, point_a, point_b):
+    points = _to_vector(np.asarray(longitudes, dtype=np.float64), np.asarray(latitudes, dtype=np.float64))
+    a, b = _to_vector(*point_a), _to_vector(*point_b)
+
+    normal = np.cross(a, b)
+    normal = normal / np.linalg.norm(normal)
+
+    # points whose projection on the great circle falls between a and b are at
+    # their cross track distance, the others at the distance of an end
+    cross_track = np.arcsin(np.clip(np.tensordot(normal, points, axes=1), -1, 1))
+    projected = points - np.tensordot(normal, points, axes=1) * normal.reshape(3, *[1] * (points.ndim - 1))
+
+    within = ((np.tensordot(np.cross(a, normal), projected, axes=1) <= 0)
+              & (np.tensordot(np.cross(normal, b), projected, axes=1) <= 0))
+
+    to_a = _angle_between(points, a)
+    to_b = _angle_between(points, b)
+
+    return EARTH_RADIUS * np.where(within, np.abs(cross_track), np.minimum(to_a, to_b))
+
+
+def _angle_between(points, vector):
+    return np.arccos(np.clip(np.tensordot(vector, points, axes=1), -1, 1))
+
+
+def _to_vector(longitudes, latitudes):
+    lon, lat = np.radians(longitudes), np.radians(latitudes)
+    return np.stack(np.broadcast_arrays(np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _to_lon_lat(vector):
+    return [float(np.degrees(np.arctan2(vector[1], vector[0]))),
+            float(np.degrees(np.arcsin(vector[2])))]
+
+
+def _get_ring(footprint):
+    if isinstance(footprint, dict):
+        coordinates = footprint['coordinates']
+
+        # polygons are reduced to their outer ring
+        return coordinates[0] if footprint['type'] == 'Polygon' else coordinates
+
+    return footprint
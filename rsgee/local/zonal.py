@@ -0,0 +1,170 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio import features
+from rasterio.enums import MergeAlg
+from rasterio.windows import Window, bounds as window_bounds
+
+from rsgee.utils.spatial_index import GridIndex
+
+DEFAULT_BLOCK_ROWS = 1024
+
+# authalic radius of WGS84, as ee.Image.pixelArea
+EARTH_RADIUS = 6371007.2
+
+# zone id of the pixels outside every zone
+NO_ZONE = 0
+
+
+# local counterpart of rsgee.utils.zonal: area of each class by zone and year
+# over the merged results of each year (rsgee.local.merge). Zones are GeoJSON
+# features in the CRS of the rasters, rasterized block by block, and the areas
+# of a block are a single bincount of zone * classes + class weighted by the
+# pixel areas of its rows. Returns rows of {zone, year, class, area}. Each
+# pixel belongs to a single zone, so overlapping zones (e.g. the WRS grid),
+# counted once per zone by reduceRegions, are rejected.
+def get_zonal_areas(paths_by_year, zones, zone_field, classes, area_unit=10000,
+                    block_rows=DEFAULT_BLOCK_ROWS, processes=None):
+    zones = list(zones)
+    zones_ids = [zone['properties'][zone_field] for zone in zones]
+    classes = list(classes)
+
+    rows = []
+
+    for year, path in sorted(paths_by_year.items()):
+        areas = get_areas(path, zones, classes, block_rows, processes) / area_unit
+
+        rows.extend(
+            {'zone': zone_id, 'year': year, 'class': class_value, 'area': float(area)}
+            for zone_id, zone_areas in zip(zones_ids, areas[1:])
+            for class_value, area in zip(classes, zone_areas)
+        )
+
+    return rows
+
+
+# areas in square meters of shape (zones + 1, classes), the first row holds
+# the pixels outside every zone
+def get_areas(path, zones, classes, block_rows=DEFAULT_BLOCK_ROWS, processes=None):
+    with rasterio.open(path) as dataset:
+        height = dataset.height
+
+    index = GridIndex(zones)
+    blocks = [(row, min(block_rows, height - row)) for row in range(0, height, block_rows)]
+    tasks = [(path, block, index, classes) for block in blocks]
+
+    areas = np.zeros((len(zones) + 1, len(classes)), dtype=np.float64)
+
+    if processes == 1:
+        results = map(_get_block_areas, tasks)
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_get_block_areas, tasks))
+
+    for result in results:
+        areas += result
+
+    return areas
+
+
+def rasterize_zones(index, window, transform):
+    left, bottom, right, top = window_bounds(window, transform)
+    positions = {id(zone): position for position, zone in enumerate(index.get_features(), start=1)}
+
+    # only zones intersecting the block are burned, zone ids are their
+    # positions so the bincount has a row per zone
+    shapes = [(zone['geometry'], positions[id(zone)])
+              for zone in index.query_bounds((min(left, right), min(bottom, top),
+                                              max(left, right), max(bottom, top)))]
+
+    out_shape = (int(window.height), int(window.width))
+    window_transform = rasterio.windows.transform(window, transform)
+
+    if not shapes:
+        return np.full(out_shape, NO_ZONE, dtype=np.int32)
+
+    coverage = features.rasterize(
+        [(geometry, 1) for geometry, _ in shapes],
+        out_shape=out_shape,
+        transform=window_transform,
+        fill=0,
+        merge_alg=MergeAlg.add,
+        dtype=np.int32)
+
+    if coverage.max() > 1:
+        raise ValueError('Zones overlap, each pixel must belong to a single zone')
+
+    return features.rasterize(
+        shapes,
+        out_shape=out_shape,
+        transform=window_transform,
+        fill=NO_ZONE,
+        dtype=np.int32)
+
+
+# area of the pixels of each row of a window. In geographic coordinates pixels
+# are areas of a sphere between two parallels, otherwise every pixel has the
+# same area.
+def get_rows_areas(window, transform, crs):
+    rows = np.arange(window.row_off, window.row_off + window.height, dtype=np.float64)
+
+    if crs is None or not crs.is_geographic:
+        return np.full(len(rows), abs(transform.a * transform.e))
+
+    top = np.radians(transform.f + transform.e * rows)
+    bottom = np.radians(transform.f + transform.e * (rows + 1))
+
+    return EARTH_RADIUS ** 2 * np.radians(abs(transform.a)) * np.abs(np.sin(top) - np.sin(bottom))
+
+
+def get_class_lut(classes, dtype):
+    # position of each class, classes not summarized go to an extra position
+    # dropped from the result
+    info = np.iinfo(dtype)
+    lut = np.full(int(info.max) - int(info.min) + 1, len(classes), dtype=np.int64)
+
+    for position, class_value in enumerate(classes):
+        lut[int(class_value) - int(info.min)] = position
+
+    return lut, int(info.min)
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['zone', 'year', 'class', 'area'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return path
+
+
+def _get_block_areas(args):
+    path, (row, height), index, classes = args
+    classes_count = len(classes) + 1
+    zones_count = len(index) + 1
+
+    with rasterio.open(path) as dataset:
+        window = Window(0, row, dataset.width, height)
+        data = dataset.read(1, window=window)
+        zones_ids = rasterize_zones(index, window, dataset.transform)
+        rows_areas = get_rows_areas(window, dataset.transform, dataset.crs)
+        valid = dataset.read_masks(1, window=window) > 0
+
+    if np.issubdtype(data.dtype, np.integer) and data.dtype.itemsize <= 2:
+        lut, offset = get_class_lut(classes, data.dtype)
+        classes_ids = lut[data.astype(np.int64) - offset]
+    else:
+        classes_ids = np.full(data.shape, len(classes), dtype=np.int64)
+
+        for position, class_value in enumerate(classes):
+            classes_ids[data == class_value] = position
+
+    weights = np.broadcast_to(rows_areas[:, None], data.shape)
+    bins = zones_ids.astype(np.int64) * classes_count + classes_ids
+
+    areas = np.bincount(bins[valid], weights=weights[valid],
+                        minlength=zones_count * classes_count)
+
+    return areas.reshape(zones_count, classes_count)[:, :-1]
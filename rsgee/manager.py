@@ -6,7 +6,11 @@ import ee
 from rsgee.settings import SettingsManager as sm
 from rsgee.db import DatabaseManager
 from rsgee.taskmanager import TaskManager
+from rsgee.planner import IncrementalPlanner
+from rsgee.preflight import Preflight
+from rsgee.profiler import GraphProfiler
 from rsgee.processors.processing_mediator import ProcessingMediator
+from rsgee.utils.scene_inventory import SceneInventory, get_collection_id
 
 
 class Manager(object):
@@ -19,8 +23,14 @@ class Manager(object):
             self.run(settings_name)
         if command in ["-s", "script"]:
             self.run_script(settings_name)
+        elif command in ["-i", "inventory"]:
+            self.inventory(settings_name)
+        elif command in ["-p", "profile"]:
+            self.profile(settings_name)
         elif command in ["-m", "migrate"]:
             self.migrate()
+        elif command in ["-u", "upgrade"]:
+            self.upgrade()
         elif command in ["-h", "help"]:
             self.help()
         elif command in ["-w", "watch"]:
@@ -43,18 +53,82 @@ class Manager(object):
 
         sm.set_running_settings(settings_name)
 
-        session = DatabaseManager(self.db_settings).get_session()
+        database = DatabaseManager(self.db_settings)
+        database.upgrade()
+
+        session = database.get_session()
         task_manager = TaskManager(session, sm.settings)
         mediator = ProcessingMediator()
 
-        tasks = mediator.process()
+        planner = IncrementalPlanner(session, sm.settings)
+        plan = Preflight(sm.settings).check(planner.plan())
+        planner.report(plan)
+
+        sm.set_scheduled_cells(plan.changed)
+        task_manager.skip_tasks(plan.reasons, plan.fingerprints)
+
+        tasks = plan.filter_tasks(mediator.process())
 
-        task_manager.add_tasks(tasks)
+        if sm.settings.PROFILE_GRAPHS:
+            profiler = GraphProfiler(sm.settings)
+            profiler.profile_tasks(tasks)
+            profiler.report()
+            print("Profile saved in {0}".format(profiler.write_csv()))
+            profiler.check()
+
+        task_manager.add_tasks(tasks, plan.fingerprints)
         task_manager.start()
         task_manager.join()
 
         session.close()
 
+    # fetches the scenes of the years of the settings, with the years of the
+    # generation offset and the periods ending in the next year
+    def inventory(self, settings_name):
+        self.ee_initialize()
+
+        sm.set_running_settings(settings_name)
+
+        settings = sm.settings
+        collection_id = get_collection_id(settings.IMAGE_COLLECTION())
+
+        if not collection_id:
+            print("The image collection of the settings is not loaded by id")
+            return
+
+        offset = settings.GENERATION_OFFSET or 0
+        years = range(min(settings.YEARS) - offset, max(settings.YEARS) + 2)
+
+        inventory = SceneInventory()
+        inventory.refresh(collection_id, years)
+
+        for year in years:
+            scenes = inventory.query(
+                collection_id, periods=[(f"{year}-01-01", f"{year + 1}-01-01")]
+            )
+            print("{0} {1}: {2} scenes".format(collection_id, year, len(scenes)))
+
+        inventory.close()
+
+    # profiles the graphs of every stage and task of the settings, without
+    # submitting them
+    def profile(self, settings_name):
+        self.ee_initialize()
+
+        sm.set_running_settings(settings_name)
+
+        mediator = ProcessingMediator()
+        tasks = mediator.process()
+
+        profiler = GraphProfiler(sm.settings)
+        profiler.profile_stages(mediator)
+        profiler.profile_tasks(tasks)
+        profiler.report()
+
+        print("Profile saved in {0}".format(profiler.write_csv()))
+
+        profiler.check()
+
     def run_script(self, script):
         import importlib
 
@@ -64,6 +138,10 @@ class Manager(object):
         db = DatabaseManager(self.db_settings)
         db.migrate()
 
+    def upgrade(self):
+        db = DatabaseManager(self.db_settings)
+        db.upgrade()
+
     def watch(self):
         pass
 
@@ -71,7 +149,10 @@ class Manager(object):
         print(
             """Usage: manage.py [COMMAND]...
         -r, run                 COMMAND start the processing of tasks.
+        -i, inventory           COMMAND fetch the scene inventory of the settings.
+        -p, profile             COMMAND profile the graphs of the tasks of the settings.
         -m, migrate             COMMAND create tables in database.
+        -u, upgrade             COMMAND add new tables and columns, keeping the tasks.
         -w, watch               COMMAND watch tasks processing.
         -h, help                COMMAND show the help
         """
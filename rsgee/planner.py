@@ -0,0 +1,182 @@
+import ee
+
+from rsgee import export
+from rsgee.db.models import Task
+from rsgee.processors.processing_mediator import ProcessingMediator
+from rsgee.utils import grid
+from rsgee.utils.export_layout import ExportUnit
+from rsgee.utils.fingerprint import hash_description
+
+# settings that only control how tasks are run or which cells exist, changing
+# them does not change the output of a cell
+RUNTIME_SETTINGS = [
+    'YEARS',
+    'GRID_FILTER',
+    'CACHE_DIRECTORY',
+    'EXPORT_MAX_TASKS',
+    'EXPORT_INTERVAL',
+    'EXPORT_MAX_ERRORS',
+]
+
+
+class Plan:
+
+    def __init__(self):
+        self.changed = []
+        self.skipped = []
+        self.skipped_codes = set()
+        self.fingerprints = {}
+        self.layout = None
+        # cells of each task and the tasks skipped by the preflight checks
+        self.cells = {}
+        self.empty = []
+        self.reasons = {}
+
+    def filter_tasks(self, tasks):
+        return [task for task in tasks
+                if task.config["description"] not in self.skipped_codes]
+
+    # tasks known to fail or to export an empty result are not rebuilt
+    def skip_empty(self, code, reason):
+        cells = self.cells[code]
+
+        self.changed = [cell for cell in self.changed if cell not in cells]
+        self.empty.extend(cell for cell in cells if cell not in self.empty)
+        self.skipped_codes.add(code)
+        self.reasons[code] = reason
+
+
+class IncrementalPlanner:
+    # fingerprints the effective settings of each (year, region) cell and
+    # compares them to the fingerprints stored with the tasks of the last run,
+    # so only new or changed cells are rebuilt and resubmitted
+
+    def __init__(self, session, settings):
+        self.__session = session
+        self.__settings = settings
+        self.__assets_versions = {}
+        self.__grid_index = grid.load_grid_index_from_settings(settings)
+
+    def plan(self):
+        plan = Plan()
+        id_field = self.__settings.GRID_FEATURE_ID_FIELD
+        filename_sufix = ProcessingMediator.get_filename_sufix()
+        settings_description = self.__get_settings_description()
+
+        layout = export.get_export_layout(filename_sufix)
+        regions = {region['properties'].get(id_field): region
+                   for region in self.__grid_index.get_features()}
+        units = layout.units if layout else [
+            ExportUnit([region_id], None) for region_id in regions]
+
+        plan.layout = layout
+
+        # with packed or split exports a task covers several cells, so they are
+        # rebuilt together when any of them changes
+        for years in export.get_years_groups(self.__settings.YEARS):
+            for unit in units:
+                regions_ids = [region_id for region_id in unit.regions_ids
+                               if region_id in regions]
+
+                if not regions_ids:
+                    continue
+
+                fingerprints = [
+                    self.get_fingerprint(year, region_id, regions[region_id],
+                                         settings_description)
+                    for year in years
+                    for region_id in regions_ids
+                ]
+                fingerprint = (fingerprints[0] if len(fingerprints) == 1
+                               else hash_description(fingerprints))
+
+                codes = [export.get_filename(export.get_years_label(years), label, filename_sufix)
+                         for label in unit.get_labels()]
+                cells = [(year, region_id) for year in years for region_id in regions_ids]
+
+                for code in codes:
+                    plan.fingerprints[code] = fingerprint
+                    plan.cells[code] = cells
+
+                if all(self.__is_up_to_date(code, fingerprint) for code in codes):
+                    plan.skipped.extend(cells)
+                    plan.skipped_codes.update(codes)
+                else:
+                    plan.changed.extend(cells)
+
+        return plan
+
+    def get_fingerprint(self, year, region_id, region, settings_description):
+        return hash_description({
+            'settings': settings_description,
+            'year': year,
+            'region_id': region_id,
+            'region_properties': region['properties'],
+            'assets_versions': self.__get_cell_assets_versions(year, region_id),
+        })
+
+    def report(self, plan):
+        print("******************** Incremental plan ********************")
+        print("To process:  {0} cells".format(len(plan.changed)))
+        print("Up to date:  {0} cells (skipped)".format(len(plan.skipped)))
+
+        if plan.layout:
+            units = plan.layout.units
+            print("Export layout: {0} regions in {1} exports ({2} split, {3} packed)".format(
+                sum(len(unit.regions_ids) for unit in units),
+                sum(len(unit.get_labels()) for unit in units),
+                len([unit for unit in units if unit.is_split()]),
+                len([unit for unit in units if unit.is_packed()])))
+
+        if plan.reasons:
+            print("Empty:       {0} cells (skipped)".format(len(plan.empty)))
+
+        for year, region_id in plan.skipped:
+            print("Skipped: {0} {1}".format(year, region_id))
+
+        for code, reason in sorted(plan.reasons.items()):
+            print("Empty: {0} ({1})".format(code, reason))
+
+        print("**********************************************************")
+
+    def __is_up_to_date(self, code, fingerprint):
+        task = self.__session.query(Task).filter_by(code=code).first()
+
+        if not task or task.state != ee.batch.Task.State.COMPLETED:
+            return False
+
+        # tasks completed before fingerprints were stored keep the previous
+        # behaviour of being skipped by name
+        return task.fingerprint in [None, fingerprint]
+
+    def __get_settings_description(self):
+        return {
+            key: getattr(self.__settings, key)
+            for key in dir(self.__settings)
+            if key.isupper() and key not in RUNTIME_SETTINGS
+        }
+
+    def __get_cell_assets_versions(self, year, region_id):
+        assets_ids = [
+            getattr(self.__settings, key)
+            for key in dir(self.__settings)
+            if key.isupper() and key.endswith('_ID')
+            and isinstance(getattr(self.__settings, key), str)
+            and '/' in getattr(self.__settings, key)
+        ]
+
+        assets_ids = [asset_id.format(year=year, region_id=region_id)
+                      for asset_id in assets_ids]
+
+        return {asset_id: self.__get_asset_version(asset_id) for asset_id in assets_ids}
+
+    def __get_asset_version(self, asset_id):
+        if asset_id not in self.__assets_versions:
+            try:
+                info = ee.data.getInfo(asset_id) or {}
+            except ee.EEException:
+                info = {}
+
+            self.__assets_versions[asset_id] = info.get('updateTime') or info.get('version')
+
+        return self.__assets_versions[asset_id]
@@ -0,0 +1,233 @@
+import os
+
+import ee
+
+from rsgee.utils import cache, date, grid
+from rsgee.utils.fingerprint import hash_description
+from rsgee.utils.geometry import merge_bounds
+from rsgee.utils.scene_inventory import SceneInventory, get_collection_id, get_periods_years
+
+CHECKS = ['scenes', 'reference', 'samples']
+
+
+class Preflight:
+    # detects the cells of a plan whose tasks are known to fail or to export a
+    # masked result, from the local inventories: periods without scenes in the
+    # scene inventory, no pixels of the class of interest in the reference and
+    # no samples of it in the sample store. Their tasks are skipped with the
+    # reason instead of using export slots.
+
+    def __init__(self, settings):
+        self.__settings = settings
+        self.__grid_index = grid.load_grid_index_from_settings(settings)
+        self.__clusters = None
+        self.__scene_inventory = None
+        self.__sample_store = None
+        self.__references_counts = {}
+
+    def check(self, plan):
+        checks = [check for check in self.__settings.PREFLIGHT_CHECKS if check in CHECKS]
+
+        if not checks:
+            return plan
+
+        reasons = {}
+
+        for year, region_id in plan.changed:
+            reason = self.get_reason(year, region_id, checks)
+
+            if reason:
+                reasons[(year, region_id)] = reason
+
+        # tasks covering several cells are only skipped when all of them are
+        # empty
+        for code, cells in plan.cells.items():
+            if code in plan.skipped_codes or not all(cell in reasons for cell in cells):
+                continue
+
+            plan.skip_empty(code, '; '.join(sorted({reasons[cell] for cell in cells})))
+
+        if self.__scene_inventory:
+            self.__scene_inventory.close()
+
+        return plan
+
+    def get_reason(self, year, region_id, checks=CHECKS):
+        checkers = {
+            'scenes': self.__check_scenes,
+            'reference': self.__check_reference,
+            'samples': self.__check_samples,
+        }
+
+        for check in checks:
+            reason = checkers[check](year, region_id)
+
+            if reason:
+                return reason
+
+        return None
+
+    def __check_scenes(self, year, region_id):
+        settings = self.__settings
+        collection_id = get_collection_id(settings.IMAGE_COLLECTION())
+        periods = settings.GENERATION_PERIODS
+
+        # periods stored as grid properties are only known on the server
+        if not collection_id or not isinstance(periods, dict):
+            return None
+
+        roi = self.__grid_index.get_by_id(region_id)['geometry']
+
+        if settings.GENERATION_USE_GEOMETRY_CENTROID:
+            roi = grid.to_point(roi)
+
+        if self.__scene_inventory is None:
+            self.__scene_inventory = SceneInventory()
+
+        for period_name, period_interval in periods.items():
+            period_start, period_end = [date_format.strip() for date_format in period_interval.split(',')]
+            compiled = date.compile_period(period_start, period_end, year, settings.GENERATION_OFFSET)
+
+            self.__scene_inventory.refresh(collection_id, get_periods_years(compiled))
+
+            count = self.__scene_inventory.count(
+                collection_id, roi, compiled, settings.GENERATION_MAX_CLOUD_COVER)
+
+            if not count:
+                return f'No scenes in the period {period_name}'
+
+        return None
+
+    def __check_reference(self, year, region_id):
+        if not self.__settings.SAMPLING_REFERENCE_ID:
+            return None
+
+        counts = self.__get_reference_counts(year).get(str(region_id))
+
+        if counts is None:
+            return None
+
+        if not counts.get('reference'):
+            return 'No reference pixels'
+
+        if not counts.get('class_of_interest'):
+            return 'No reference pixels of class {0}'.format(self.__settings.SAMPLING_CLASS_OF_INTEREST)
+
+        return None
+
+    def __check_samples(self, year, region_id):
+        settings = self.__settings
+
+        if not settings.SAMPLES_STORE_DIRECTORY:
+            return None
+
+        # pyarrow is only needed by the sample store
+        from rsgee.local import samples as sample_store
+
+        if self.__sample_store is None:
+            self.__sample_store = sample_store.SampleStore(settings.SAMPLES_STORE_DIRECTORY)
+
+        # shared classifiers are trained with the samples of the whole cluster
+        bounds = merge_bounds([self.__grid_index.get_bounds_by_id(member_id)
+                               for member_id in self.__get_cluster(region_id)])
+
+        samples = self.__sample_store.load_near(
+            bounds, settings.SAMPLING_BUFFER, [settings.SAMPLES_STORE_YEAR or year])
+
+        if not samples.num_rows:
+            return 'No samples in the sample store'
+
+        classes = samples.column('class').to_pylist()
+
+        if settings.SAMPLING_CLASS_OF_INTEREST not in classes:
+            return 'No samples of class {0}'.format(settings.SAMPLING_CLASS_OF_INTEREST)
+
+        return None
+
+    def __get_cluster(self, region_id):
+        if self.__clusters is None:
+            settings = self.__settings
+            self.__clusters = {}
+
+            if settings.CLASSIFICATION_SHARE_CLASSIFIER:
+                distance = settings.CLASSIFICATION_SHARE_DISTANCE
+
+                if distance is None:
+                    distance = 2 * settings.SAMPLING_BUFFER
+
+                for cluster in self.__grid_index.get_clusters(
+                        distance, settings.CLASSIFICATION_SHARE_MAX_REGIONS):
+                    for member_id in cluster:
+                        self.__clusters[member_id] = cluster
+
+        return self.__clusters.get(region_id, [region_id])
+
+    # pixels of the reference and of its class of interest by region, counted
+    # at PREFLIGHT_REFERENCE_SCALE once per reference and year and kept in
+    # the local cache
+    def __get_reference_counts(self, year):
+        if year in self.__references_counts:
+            return self.__references_counts[year]
+
+        settings = self.__settings
+        reference_id = settings.SAMPLING_REFERENCE_ID
+        id_field = settings.GRID_FEATURE_ID_FIELD
+
+        # regions ids are only unique within a grid
+        key = hash_description({
+            'grid': settings.GRID_COLLECTION_ID,
+            'grid_filter': settings.GRID_FILTER,
+            'class_of_interest': settings.SAMPLING_CLASS_OF_INTEREST,
+            'scale': settings.PREFLIGHT_REFERENCE_SCALE,
+        })
+
+        path = os.path.join(
+            cache.get_cache_directory('preflight'),
+            cache.get_cache_filename('{0}_{1}_{2}'.format(reference_id, year, key[:16])))
+
+        counts = cache.read_json(path, {})
+
+        regions_ids = [feature['properties'].get(id_field)
+                       for feature in self.__grid_index.get_features()]
+        missing = [region_id for region_id in regions_ids if str(region_id) not in counts]
+
+        if missing:
+            counts.update(self.__count_reference_pixels(year, missing))
+            cache.write_json(path, counts)
+
+        self.__references_counts[year] = counts
+
+        return counts
+
+    def __count_reference_pixels(self, year, regions_ids):
+        settings = self.__settings
+        id_field = settings.GRID_FEATURE_ID_FIELD
+
+        references = ee.ImageCollection(settings.SAMPLING_REFERENCE_ID)
+        references_of_year = references.filterMetadata('year', 'equals', year)
+
+        # references without a year property are shared by every year
+        reference = ee.Image(ee.Algorithms.If(
+            references_of_year.size().gt(0), references_of_year.max(), references.max())).select([0])
+
+        reference = (reference.rename('reference')
+                     .addBands(reference.eq(settings.SAMPLING_CLASS_OF_INTEREST)
+                               .selfMask()
+                               .rename('class_of_interest')))
+
+        regions = (ee.FeatureCollection(settings.GRID_COLLECTION_ID)
+                   .filter(ee.Filter.inList(id_field, regions_ids)))
+
+        features = (reference
+                    .reduceRegions(
+                        collection=regions,
+                        reducer=ee.Reducer.count(),
+                        scale=settings.PREFLIGHT_REFERENCE_SCALE,
+                        tileScale=4)
+                    .select([id_field, 'reference', 'class_of_interest'], None, False)
+                    .getInfo()['features'])
+
+        return {str(feature['properties'][id_field]): {
+                    'reference': feature['properties'].get('reference', 0),
+                    'class_of_interest': feature['properties'].get('class_of_interest', 0)}
+                for feature in features}
@@ -1,42 +1,138 @@
 from abc import ABC, abstractclassmethod
 
+import ee
+
 from rsgee.settings import SettingsManager as sm
 from rsgee.featurecollection import FeatureCollection
+from rsgee.utils import grid, seed, spatial_index
 
 
 class BaseProcessor(ABC):
 
+    # name of the processing stage, part of the seeds derived by the processor
+    STAGE = ''
+
     def __init__(self, batch_keys):
         self._settings = sm.settings
         self._batch = Batch(batch_keys)
         self._grid_collection = FeatureCollection.init_grid_from_settings()
+        self.__grid_index = None
+        self.__clusters = None
+        self.__dependencies = []
+
+    def _get_grid_index(self):
+        if self.__grid_index is None:
+            self.__grid_index = grid.load_grid_index_from_settings(self._settings)
+
+        return self.__grid_index
 
     def _get_regions_ids(self):
-        return self._grid_collection.get_features_ids().getInfo()
+        id_field = self._settings.GRID_FEATURE_ID_FIELD
+        features = self._get_grid_index().get_features()
+
+        return [feature['properties'].get(id_field) for feature in features]
+
+    def _is_scheduled(self, year, region_id):
+        return sm.is_cell_scheduled(year, region_id)
+
+    # cells needed by a scheduled cell: when classifiers are shared every
+    # region of a cluster is needed to train the classifier of the cluster, and
+    # temporal filters need the years before and after the scheduled one
+    def _is_required(self, year, region_id):
+        return any(self._is_in_temporal_window(year, member_id)
+                   for member_id in self._get_cluster(region_id))
+
+    def _is_in_temporal_window(self, year, region_id):
+        left, right = self._get_temporal_window()
+
+        if not (left or right):
+            return self._is_scheduled(year, region_id)
+
+        # the window of a year sees the filtered previous years, so a year is
+        # needed by the scheduled years after it and up to right years before
+        return any(self._is_scheduled(scheduled_year, region_id)
+                   for scheduled_year in range(year - right, max(self._settings.YEARS) + 1))
+
+    # years before and after each year used by the post processing filters
+    def _get_temporal_window(self):
+        settings = self._settings
+
+        if not (settings.POST_PROCESSING_CLASS
+                and 'temporal' in settings.POST_PROCESSING_FILTERS):
+            return 0, 0
+
+        offset = settings.POST_PROCESSING_TEMPORAL_FILTER_OFFSET
+
+        if isinstance(offset, int):
+            return offset, offset
+
+        return tuple(offset)
+
+    def _get_clusters(self):
+        if self.__clusters is None:
+            if self._settings.CLASSIFICATION_SHARE_CLASSIFIER:
+                distance = self._settings.CLASSIFICATION_SHARE_DISTANCE
+
+                if distance is None:
+                    distance = 2 * self._settings.SAMPLING_BUFFER
+
+                clusters = self._get_grid_index().get_clusters(
+                    distance, self._settings.CLASSIFICATION_SHARE_MAX_REGIONS)
+            else:
+                clusters = [[region_id] for region_id in self._get_regions_ids()]
+
+            self.__clusters = {region_id: cluster
+                               for cluster in clusters
+                               for region_id in cluster}
+
+        return self.__clusters
+
+    def _get_cluster(self, region_id):
+        return self._get_clusters().get(region_id, [region_id])
+
+    def _get_seed(self, year=None, region_id=None):
+        return seed.derive_seed(
+            self._settings.NAME, year, region_id, self.STAGE, self._settings.SEED)
 
     def _get_region_by_id(self, region_id):
         return (self._grid_collection
                 .get_feature_by_id(region_id))
 
+    def _get_all_regions_bounds(self):
+        bounds = [self._get_grid_index().get_bounds_by_id(region_id)
+                  for region_id in self._get_regions_ids()]
+
+        return ee.Geometry.Rectangle([
+            min(bound[0] for bound in bounds), min(bound[1] for bound in bounds),
+            max(bound[2] for bound in bounds), max(bound[3] for bound in bounds),
+        ], None, False)
+
     def _add_in_batch(self, **data):
         self._batch.add(**data)
 
     def _get_batch(self):
         return self._batch
 
-    def _get_neighbor_regions_ids(self, region_id):
-        id_field = self._settings.GRID_FEATURE_ID_FIELD
+    # export tasks this processor needs besides its own output, e.g. trained
+    # models. Cache dependencies (e.g. mosaics missing from the cache) are only
+    # needed when the output is not exported itself.
+    def _add_dependency(self, task, cache=False):
+        self.__dependencies.append((task, cache))
 
-        region = (self._grid_collection
-                  .get_feature_by_id(region_id)
-                  .buffer(1))
+    def get_dependencies(self, exported=False):
+        return [task for task, cache in self.__dependencies
+                if not (exported and cache)]
 
-        regions_ids = (self._grid_collection
-                       .filterBounds(region)
-                       .aggregate_array(id_field)
-                       .getInfo())
+    def _get_neighbor_regions_ids(self, region_id, distance=0):
+        return self._get_grid_index().get_neighbors_ids(region_id, distance)
 
-        return regions_ids
+    def _get_region_bounds(self, region_id, distance=0):
+        bounds = self._get_grid_index().get_bounds_by_id(region_id)
+
+        if distance:
+            bounds = spatial_index.buffer_bounds(bounds, distance)
+
+        return ee.Geometry.Rectangle(list(bounds), None, False)
 
     @abstractclassmethod
     def process(self, args):
@@ -67,6 +163,9 @@ class Batch():
     def get_all(self):
         return self.__batch
 
+    def contains(self, **keys):
+        return self.__build_key(keys) in self.__batch
+
     def __get_key_format(self, keys):
         return '_'.join([f'{{{key}}}' for key in keys])
 
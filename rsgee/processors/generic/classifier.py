@@ -1,55 +1,81 @@
 from abc import ABC, abstractclassmethod
-from datetime import datetime
 
 import ee
 
 from rsgee.processors.generic.base import BaseProcessor
 from rsgee.export import Export
+from rsgee.utils.model_cache import ModelCache
 
 
 class BaseClassifier(BaseProcessor, ABC):
 
+    STAGE = 'classification'
+
+    # CLASSIFICATION_MODEL_MODE values: 'train' only exports the trained
+    # models, 'classify' classifies with the exported ones without training
+    TRAIN_MODE = 'train'
+    CLASSIFY_MODE = 'classify'
+
     def __init__(self, batch_keys=['year', 'region_id']):
         super().__init__(batch_keys)
 
     def process(self, **args):
         self._run(
             mosaics=args['mosaics'],
-            samples=args['samples'])
+            samples=args.get('samples'))
         return self._batch
 
     @abstractclassmethod
     def _run(self, mosaics, samples):
         pass
 
+    def _get_model_cache(self):
+        if not self._settings.CLASSIFICATION_MODEL_MODE:
+            return None
+
+        directory = self._settings.CLASSIFICATION_MODEL_DIRECTORY
+
+        if "{user_assets_root}" in directory:
+            directory = directory.format(
+                user_assets_root=Export.get_user_assets_root())
+
+        return ModelCache(self._settings, directory)
+
 
 class DefaultClassifier(BaseClassifier):
 
     def _run(self, samples, mosaics):
         regions_ids = self._get_regions_ids()
+        model_cache = self._get_model_cache()
 
         for year in self._settings.YEARS:
+            classifiers = {}
+
             for region_id in regions_ids:
+                if not self._is_in_temporal_window(year, region_id):
+                    continue
+
+                cluster = self._get_cluster(region_id)
+
+                if not self._has_training_samples(year, cluster, samples):
+                    print("No samples to classify {0} {1}".format(year, region_id))
+                    continue
+
+                if cluster[0] not in classifiers:
+                    classifiers[cluster[0]] = self._get_classifier(
+                        year, cluster, samples, mosaics, model_cache)
+
+                if self._settings.CLASSIFICATION_MODEL_MODE == self.TRAIN_MODE:
+                    continue
+
                 roi = self._get_region_by_id(region_id).geometry()
                 samples_bounds = roi
 
                 mosaic = mosaics.get_element(year=year, region_id=region_id)
-                training_samples = samples.get_element(year=year, region_id=region_id)
-
-                training_samples = ee.FeatureCollection(training_samples)
-
-                classifier = (ee.Classifier
-                              .smileRandomForest(
-                                  numberOfTrees=self._settings.CLASSIFICATION_TREES,
-                                  seed=datetime.now().microsecond)
-                              .train(
-                                  features=training_samples,
-                                  classProperty='class',
-                                  inputProperties=mosaic.bandNames()))
 
                 classified = (mosaic
                               .unmask()
-                              .classify(classifier)
+                              .classify(classifiers[cluster[0]])
                               .set({
                                 'year': year,
                                 'region_id': region_id}))
@@ -59,3 +85,68 @@ class DefaultClassifier(BaseClassifier):
                     region_id=region_id,
                     data=classified,
                     region=roi)
+
+    # samplers add no samples for cells without training data (e.g. an empty
+    # sample store), these cells are not classified
+    def _has_training_samples(self, year, cluster, samples):
+        if self._settings.CLASSIFICATION_MODEL_MODE == self.CLASSIFY_MODE:
+            return True
+
+        return any(samples.contains(year=year, region_id=member_id)
+                   for member_id in cluster)
+
+    def _get_classifier(self, year, cluster, samples, mosaics, model_cache):
+        mode = self._settings.CLASSIFICATION_MODEL_MODE
+
+        if not model_cache:
+            return self._train_classifier(year, cluster, samples, mosaics)
+
+        name = model_cache.get_name(year, cluster)
+
+        if mode == self.CLASSIFY_MODE:
+            return model_cache.load(name)
+
+        classifier = self._train_classifier(year, cluster, samples, mosaics)
+
+        self._add_dependency(model_cache.save(name, classifier))
+
+        return classifier
+
+    def _train_classifier(self, year, cluster, samples, mosaics):
+        # the classifier of a cluster is named after its first region, so it
+        # is the same whichever region of the cluster is classified
+        region_id = cluster[0]
+        mosaic = mosaics.get_element(year=year, region_id=region_id)
+
+        if len(cluster) > 1:
+            # samplers drawing a single table per cluster only add it for
+            # the first region. The buffers of neighbor regions overlap, so
+            # points sampled by several members are kept once.
+            training_samples = (ee.FeatureCollection([
+                samples.get_element(year=year, region_id=member_id)
+                for member_id in cluster
+                if samples.contains(year=year, region_id=member_id)])
+                .flatten()
+                .distinct('.geo'))
+
+            max_samples = self._settings.CLASSIFICATION_SHARE_MAX_SAMPLES
+
+            if max_samples:
+                training_samples = (training_samples
+                                    .randomColumn(
+                                        columnName='RANDOM',
+                                        seed=self._get_seed(year, region_id))
+                                    .limit(max_samples, 'RANDOM'))
+        else:
+            training_samples = samples.get_element(year=year, region_id=region_id)
+
+        training_samples = ee.FeatureCollection(training_samples)
+
+        return (ee.Classifier
+                .smileRandomForest(
+                    numberOfTrees=self._settings.CLASSIFICATION_TREES,
+                    seed=self._get_seed(year, region_id))
+                .train(
+                    features=training_samples,
+                    classProperty='class',
+                    inputProperties=mosaic.bandNames()))
@@ -6,22 +6,78 @@ from rsgee.image import Image
 from rsgee.imagecollection import ImageCollection
 from rsgee.band import Band
 from rsgee.processors.generic.base import BaseProcessor
-from rsgee.utils import date
+from rsgee.utils import blard, date, grid
+from rsgee.utils.scene_inventory import SceneInventory, get_collection_id, get_periods_years
+from rsgee.utils.mosaic_cache import MosaicCache
 from rsgee.collections import Blard
+from rsgee import export
 
 
 class BaseGenerator(BaseProcessor, ABC):
+
+    STAGE = "generation"
+
     def __init__(self, batch_keys=["year", "region_id"]):
         super().__init__(batch_keys)
+        self.__scene_inventory = None
 
     def process(self, **args):
         self._run()
         return self._batch
 
+    def _get_scene_inventory(self):
+        if self.__scene_inventory is None:
+            self.__scene_inventory = SceneInventory()
+
+        return self.__scene_inventory
+
+    # system:index of the images of a cell and period from the scene
+    # inventory, None when the inventory can not answer for the collection
+    def _get_images_indexes(self, collection, period_start, period_end, year, region_id):
+        collection_id = get_collection_id(collection)
+
+        if not (self._settings.GENERATION_USE_SCENE_INVENTORY and collection_id
+                and region_id is not None
+                and date.is_client_side(period_start, period_end, year)):
+            return None
+
+        roi = self._get_grid_index().get_by_id(region_id)["geometry"]
+
+        if self._settings.GENERATION_USE_GEOMETRY_CENTROID:
+            roi = grid.to_point(roi)
+
+        periods = date.compile_period(
+            period_start, period_end, year, self._settings.GENERATION_OFFSET
+        )
+
+        inventory = self._get_scene_inventory()
+        inventory.refresh(collection_id, get_periods_years(periods))
+
+        return inventory.get_images_indexes(
+            collection_id,
+            roi,
+            periods,
+            self._settings.GENERATION_MAX_CLOUD_COVER,
+            self._settings.GENERATION_IMAGES_LIMIT,
+        )
+
     @abstractclassmethod
     def _run(self):
         pass
 
+    def _get_mosaic_cache(self):
+        directory = self._settings.GENERATION_CACHE_DIRECTORY
+
+        if not directory:
+            return None
+
+        if "{user_assets_root}" in directory:
+            directory = directory.format(
+                user_assets_root=export.Export.get_user_assets_root()
+            )
+
+        return MosaicCache(self._settings, directory)
+
     def _get_fake_mosaic(self, extra_bands=[]):
         variables = [*self._settings.GENERATION_VARIABLES, *extra_bands]
 
@@ -46,6 +102,15 @@ class BaseGenerator(BaseProcessor, ABC):
 
         return feature.toDictionary(ee.List(self._settings.GENERATION_PERIODS))
 
+    def _get_client_periods(self):
+        generation_periods = self._settings.GENERATION_PERIODS
+
+        if isinstance(generation_periods, dict):
+            return generation_periods
+
+        # periods stored as grid properties are only known on the server
+        return None
+
     def _apply_generation_buffer(self, images):
         buffer = self._settings.GENERATION_BUFFER
 
@@ -73,20 +138,46 @@ class BaseGenerator(BaseProcessor, ABC):
 class DefaultGenerator(BaseGenerator):
     def _run(self):
         regions_ids = self._get_regions_ids()
+        mosaic_cache = self._get_mosaic_cache()
         # fake_bands = self._get_fake_mosaic(['AC_DRY_NIR_min', 'AC_WET_NDWI_qmo'])
 
         for year in self._settings.YEARS:
             for region_id in regions_ids:
+                if not self._is_required(year, region_id):
+                    continue
+
                 roi = self._get_region_by_id(region_id)
 
+                cache_asset_id = None
+
+                if mosaic_cache:
+                    cache_asset_id = mosaic_cache.get_asset_id(year, region_id)
+
+                    if mosaic_cache.contains(cache_asset_id):
+                        mosaic = mosaic_cache.load(cache_asset_id).set(
+                            {"year": year, "region_id": region_id}
+                        )
+
+                        self._add_in_batch(
+                            year=year,
+                            region_id=region_id,
+                            data=mosaic,
+                            region=roi.geometry(),
+                        )
+                        continue
+
                 def get_mosaic(period_name, period_interval):
                     return self._generate_mosaic(
-                        roi, year, period_name, period_interval
+                        roi, year, period_name, period_interval, region_id
                     )
 
-                periods = self._get_periods(roi)
+                periods = self._get_client_periods()
 
-                mosaics = periods.map(get_mosaic).values()
+                if periods:
+                    mosaics = [get_mosaic(period_name, period_interval)
+                               for period_name, period_interval in periods.items()]
+                else:
+                    mosaics = self._get_periods(roi).map(get_mosaic).values()
 
                 mosaic = Image(ImageCollection(mosaics).to_bands())
                 # mosaic = Image(fake_bands.addBands(mosaic, None, True))
@@ -100,20 +191,42 @@ class DefaultGenerator(BaseGenerator):
                 # feature_space = self._filter_avaliable_bands_from_mosaic(mosaic)
                 feature_space = ee.List(self._settings.GENERATION_VARIABLES)
 
-                mosaic = mosaic.select(feature_space).set(
-                    {"year": year, "region_id": region_id}
-                )
+                mosaic = mosaic.select(feature_space)
+
+                if cache_asset_id:
+                    # cached mosaics are stored as float, so a fresh mosaic has
+                    # the band types of a cache hit
+                    mosaic = mosaic.float()
+
+                mosaic = mosaic.set({"year": year, "region_id": region_id})
+
+                if cache_asset_id:
+                    self._add_dependency(
+                        export.generate_cache_task(
+                            cache_asset_id, mosaic, roi.geometry()
+                        ),
+                        cache=True,
+                    )
 
                 self._add_in_batch(
                     year=year, region_id=region_id, data=mosaic, region=roi.geometry()
                 )
 
-    def _generate_mosaic(self, roi, year, period_name, period_interval):
-        period_interval = ee.String(period_interval).split(",")
-        period_start = period_interval.getString(0)
-        period_end = period_interval.getString(1)
-
-        images = self._filter_collection(roi.geometry(), period_start, period_end, year)
+    def _generate_mosaic(
+        self, roi, year, period_name, period_interval, region_id=None
+    ):
+        if isinstance(period_interval, str):
+            period_start, period_end = [
+                date_format.strip() for date_format in period_interval.split(",")
+            ]
+        else:
+            period_interval = ee.String(period_interval).split(",")
+            period_start = period_interval.getString(0)
+            period_end = period_interval.getString(1)
+
+        images = self._filter_collection(
+            roi.geometry(), period_start, period_end, year, region_id
+        )
 
         images = images.padronize_band_names().padronize_band_scales()
 
@@ -142,15 +255,27 @@ class DefaultGenerator(BaseGenerator):
 
         return mosaic
 
-    def _filter_collection(self, roi, period_start, period_end, year):
+    def _filter_collection(
+        self, roi, period_start, period_end, year, region_id=None
+    ):
         offset = self._settings.GENERATION_OFFSET
         cloud_cover = self._settings.GENERATION_MAX_CLOUD_COVER
+        collection = self._settings.IMAGE_COLLECTION()
+
+        # images known by the scene inventory are filtered by their ids, the
+        # bounds, dates and cloud cover filters are already applied
+        images_indexes = self._get_images_indexes(
+            collection, period_start, period_end, year, region_id
+        )
+
+        if images_indexes is not None:
+            return collection.filter(ee.Filter.inList("system:index", images_indexes))
 
         if self._settings.GENERATION_USE_GEOMETRY_CENTROID:
             roi = roi.centroid()
 
         return (
-            self._settings.IMAGE_COLLECTION()
+            collection
             .filterBounds(roi)
             .filter_period(period_start, period_end, year, offset)
             .filterMetadata("CLOUD_COVER", "less_than", cloud_cover)
@@ -158,9 +283,9 @@ class DefaultGenerator(BaseGenerator):
 
 
 class DefaultBLARDGenerator(DefaultGenerator):
-    def _filter_collection(self, roi, period_start, period_end, year):
-        # path = roi.getNumber('PATH')
-        # row = roi.getNumber('ROW')
+    def _filter_collection(
+        self, roi, period_start, period_end, year, region_id=None
+    ):
         offset = self._settings.GENERATION_OFFSET
         cloud_cover = self._settings.GENERATION_MAX_CLOUD_COVER
         bands = self._settings.GENERATION_BANDS
@@ -168,15 +293,64 @@ class DefaultBLARDGenerator(DefaultGenerator):
         if self._settings.GENERATION_USE_GEOMETRY_CENTROID:
             roi = roi.centroid()
 
-        start_date = date.parse_date(period_start, year).advance(-offset, "year")
-        end_date = date.parse_date(period_end, year)
+        products_plan = None
+        scenes_ids = None
+
+        if date.is_client_side(period_start, period_end, year):
+            start_date = date.compile_date(period_start, year - offset)
+            end_date = date.compile_date(period_end, year)
+
+            if region_id is not None:
+                products_plan = self._plan_products(region_id, start_date, end_date)
+
+                if self._settings.GENERATION_USE_COEFFICIENTS_INDEX:
+                    scenes_ids = self._get_scenes_ids(region_id, start_date, end_date)
+        else:
+            start_date = date.parse_date(period_start, year).advance(-offset, "year")
+            end_date = date.parse_date(period_end, year)
 
         collection = Blard.filter_collection_by_roi(
-            roi, start_date, end_date, cloud_cover
+            roi, start_date, end_date, cloud_cover, productsPlan=products_plan,
+            scenesIds=scenes_ids
         )
 
         return collection.filter_period(period_start, period_end, year, offset)
 
+    def _plan_products(self, region_id, start_date, end_date):
+        return blard.plan_16day_products(
+            self._get_local_roi(region_id), start_date, end_date
+        )
+
+    # LANDSAT_SCENE_ID of the scenes of the BLARD collections from the scene
+    # inventory, so the normalization coefficients come from the local index
+    def _get_scenes_ids(self, region_id, start_date, end_date):
+        roi = self._get_local_roi(region_id)
+        periods = [(start_date, end_date)]
+        inventory = self._get_scene_inventory()
+        scenes_ids = []
+
+        for collection in blard.LANDSAT_COLLECTIONS:
+            collection_id = get_collection_id(collection())
+
+            inventory.refresh(collection_id, get_periods_years(periods))
+            scenes_ids.extend(
+                scene["scene_id"]
+                for scene in inventory.query(
+                    collection_id, roi, periods,
+                    self._settings.GENERATION_MAX_CLOUD_COVER,
+                )
+            )
+
+        return scenes_ids
+
+    def _get_local_roi(self, region_id):
+        roi = self._get_grid_index().get_by_id(region_id)["geometry"]
+
+        if self._settings.GENERATION_USE_GEOMETRY_CENTROID:
+            roi = grid.to_point(roi)
+
+        return roi
+
 
 class LoadMosaicsFromAsset(BaseGenerator):
     def _run(self, **args):
@@ -185,6 +359,9 @@ class LoadMosaicsFromAsset(BaseGenerator):
 
         for year in self._settings.YEARS:
             for region_id in regions_ids:
+                if not self._is_required(year, region_id):
+                    continue
+
                 roi = self._get_region_by_id(region_id).geometry()
 
                 if self._settings.GRID_GEOMETRY_USE_CENTROID:
@@ -1,21 +1,22 @@
 from abc import ABC, abstractclassmethod
-from datetime import datetime
-from functools import reduce
 
 import ee
 
+from rsgee.core.exceptions import ImproperlyConfigured
 from rsgee.processors.generic.base import BaseProcessor
+from rsgee.export import get_years_label
+from rsgee.utils import zonal
 
 
 class BasePostProcessor(BaseProcessor, ABC):
 
-    # OUTPUT_NAME = 'filtered_results'
+    STAGE = 'post_processing'
 
     def __init__(self, batch_keys=['year', 'region_id']):
         super().__init__(batch_keys)
 
     def process(self, **args):
-        self._run(raw_results=args['raw_resutls'])
+        self._run(raw_results=args['raw_results'])
         return self._batch
 
     @abstractclassmethod
@@ -37,8 +38,13 @@ class MergeImagesByYear(BasePostProcessor):
             return ee.Image(raw).unmask()
 
         for year in self._settings.YEARS:
+            # cells skipped by the incremental plan are not in the batch
             all_results_of_year = [
-                get_raw_result(year, region_id) for region_id in regions_ids]
+                get_raw_result(year, region_id) for region_id in regions_ids
+                if raw_results.contains(year=year, region_id=region_id)]
+
+            if not all_results_of_year:
+                continue
 
             collection = ee.ImageCollection(all_results_of_year)
             single_image_result = collection.Or().set('year', year)
@@ -48,121 +54,171 @@ class MergeImagesByYear(BasePostProcessor):
                 data=single_image_result,
                 region=roi)
 
-# class Filter(enum.Enum):
-#     TEMPORAL = "TEMPORAL"
-#     SPATIAL = "SPATIAL"
-
-
-# class PostProcessor(BaseProcessor):
-#     def __init__(self, collection, collection_prefix='', filters=[], years=[],
-#                  class_of_reference=1):
-#         BaseProcessor.__init__(self)
-#         self.__collection = collection.filter(
-#             ee.Filter.inList('year', ee.List(years))).sort('year')
-#         self.__collection_prefix = collection_prefix
-#         self.__filters = filters
-#         self.__class_of_reference = class_of_reference
-#         self.__years = years
-
-#     def run(self):
-#         for filter in self.__filters:
-#             if filter == Filter.TEMPORAL:
-#                 self.__collection = self.apply_temporal_filter(
-#                     self.__collection,
-#                     settings.POSTPROCESSING_TEMPORAL_FILTER_OFFSET,
-#                     settings.POSTPROCESSING_TEMPORAL_FILTER_THRESHOLD)
-#             if filter == Filter.SPATIAL:
-#                 self.__collection = self.apply_spatial_filter(
-#                     self.__collection,
-#                     settings.POSTPROCESSING_SPATIAL_FILTER_KERNEL,
-#                     settings.POSTPROCESSING_SPATIAL_FILTER_THRESHOLD)
-
-#     def apply_temporal_filter(self, collection, offset, initial_threshold):
-#         collection = collection.toList(settings.MAX_IMAGES)
-#         new_collection = ImageCollection([])
-#         for index in xrange(len(self.__years)):
-#             left, center, right, threshold = self.__break_list(collection,
-#                                                                index, offset,
-#                                                                0, len(
-#                     self.__years) - 1, initial_threshold)
-
-#             year = self.__years[index]
-#             roi = center.geometry()
-
-#             filename = "{0}_{1}".format(self.__collection_prefix, str(year))
-
-#             center = center.unmask(None).eq(self.__class_of_reference)
-#             left = ImageCollection(left)
-#             right = ImageCollection(right)
-
-#             sides = ImageCollection(left.merge(right)).map(
-#                 lambda image: Image(image).eq(self.__class_of_reference)).sum()
-#             mask = center.add(sides.eq(0)).neq(2)
-#             image = center.add(sides).gte(threshold + 1)
-
-#             filtered_image = Image(center.add(image)).updateMask(mask).gte(1)
-
-#             filtered_image = filtered_image \
-#                 .clip(roi) \
-#                 .set('system:index', filename) \
-#                 .set('year', year) \
-#                 .set('system:footprint', roi)
-
-#             new_collection = new_collection.merge(
-#                 ImageCollection(filtered_image))
-
-#             final_name = filename
-#             final_image = filtered_image
-
-#             self.add_image_in_batch(final_name,
-#                                     {"image": final_image, "year": int(year),
-#                                      "geometry": roi})
-
-#         return new_collection
-
-#     def apply_spatial_filter(self, collection, kernel, threshold):
-#         kernel = ee.Kernel.fixed(len(kernel[0]), len(kernel), kernel,
-#                                  -(len(kernel[0]) / 2), -(len(kernel) / 2),
-#                                  False)
-#         new_collection = ImageCollection([])
-#         for year in self.__years:
-#             image = Image(collection
-#                           .filter(ee.Filter.eq('year', year))
-#                           .first()) \
-#                 .unmask(None)
-
-#             filename = "{0}_{1}".format(self.__collection_prefix, str(year))
-
-#             roi = image.geometry()
-
-#             filtered_image = image.convolve(kernel).gte(threshold)
-
-#             filtered_image = filtered_image.clip(roi).set('system:index',
-#                                                           filename).set('year',
-#                                                                         year).set(
-#                 'system:footprint', roi)
-#             new_collection = new_collection.merge(
-#                 ImageCollection(filtered_image))
-
-#             final_name = filename
-#             final_image = filtered_image
-#             self.add_image_in_batch(final_name,
-#                                     {"image": final_image, "year": int(year),
-#                                      "geometry": roi})
-
-#         return new_collection
-
-#     def __break_list(self, list, index, offset, min, max, threshold):
-#         start = index - offset
-#         end = index + offset
-#         if start < min:
-#             threshold = threshold + start
-#             start = min
-#         if end > max:
-#             threshold = threshold + (max - end)
-#             end = max
-
-#         left = list.slice(start, index)
-#         center = ee.Image(list.get(index))
-#         right = list.slice(index + 1, end + 1)
-#         return left, center, right, threshold
+
+class TemporalSpatialFilter(BasePostProcessor):
+    # filters the binary classification of each region with the filters of
+    # POST_PROCESSING_FILTERS, in order. The moving window over the years is
+    # unrolled on the client, from the dict of yearly images, instead of a
+    # server side iterate over a list of all years.
+
+    TEMPORAL = 'temporal'
+    SPATIAL = 'spatial'
+    CONNECTED_PIXELS = 'connected_pixels'
+
+    def _run(self, raw_results):
+        regions_ids = self._get_regions_ids()
+        filters = {
+            self.TEMPORAL: self._apply_temporal_filter,
+            self.SPATIAL: self._apply_spatial_filter,
+            self.CONNECTED_PIXELS: self._apply_connected_pixels_filter,
+        }
+
+        for region_id in regions_ids:
+            years = [year for year in self._settings.YEARS
+                     if raw_results.contains(year=year, region_id=region_id)]
+
+            scheduled_years = [year for year in years
+                               if self._is_scheduled(year, region_id)]
+
+            if not scheduled_years:
+                continue
+
+            images = {year: self._to_binary(
+                          raw_results.get_element(year=year, region_id=region_id))
+                      for year in years}
+
+            for filter_name in self._settings.POST_PROCESSING_FILTERS:
+                images = filters[filter_name](images)
+
+            roi = self._get_region_by_id(region_id).geometry()
+
+            for year in scheduled_years:
+                filtered = (images[year]
+                            .byte()
+                            .set({
+                                'year': year,
+                                'region_id': region_id}))
+
+                self._add_in_batch(
+                    year=year,
+                    region_id=region_id,
+                    data=filtered,
+                    region=roi)
+
+    def _to_binary(self, image):
+        class_of_reference = self._settings.POST_PROCESSING_CLASS_OF_REFERENCE
+        return ee.Image(image).unmask().eq(class_of_reference)
+
+    def _apply_temporal_filter(self, images):
+        left, right = self._get_temporal_window()
+        threshold = self._settings.POST_PROCESSING_TEMPORAL_FILTER_THRESHOLD
+        mode = self._settings.POST_PROCESSING_TEMPORAL_FILTER_MODE
+
+        # years are filtered in order and each window sees the filtered
+        # previous years, as the iterate of getMovingWindow and
+        # rsgee.local.filters.temporal_filter
+        filtered = dict(images)
+
+        for year in sorted(images):
+            center = images[year]
+            window_years = [window_year for window_year in sorted(images)
+                            if year - left <= window_year <= year + right]
+
+            window = (ee.ImageCollection([filtered[window_year] for window_year in window_years])
+                      .sum()
+                      .gte(threshold))
+
+            if mode == 'inclusion':
+                window = center.Or(window)
+            elif mode == 'exclusion':
+                window = center.And(window)
+
+            filtered[year] = window.rename(center.bandNames())
+
+        return filtered
+
+    def _apply_spatial_filter(self, images):
+        weights = self._settings.POST_PROCESSING_SPATIAL_FILTER_KERNEL
+        threshold = self._settings.POST_PROCESSING_SPATIAL_FILTER_THRESHOLD
+
+        width, height = len(weights[0]), len(weights)
+        kernel = ee.Kernel.fixed(width, height, weights, width // 2, height // 2, False)
+
+        return {year: image.unmask().convolve(kernel).gte(threshold)
+                for year, image in images.items()}
+
+    def _apply_connected_pixels_filter(self, images):
+        min_connected_pixels = self._settings.POST_PROCESSING_MIN_CONNECTED_PIXELS
+
+        def apply(image):
+            image = image.unmask()
+
+            connected_pixels = image.connectedPixelCount(
+                maxSize=min_connected_pixels * 2, eightConnected=True)
+
+            mode = (image
+                    .focal_mode(2, 'square', 'pixels')
+                    .updateMask(connected_pixels.lte(min_connected_pixels)))
+
+            return image.blend(mode)
+
+        return {year: apply(image) for year, image in images.items()}
+
+
+class ZonalStatistics(BasePostProcessor):
+    # area of each class by zone and year, all years and zones are reduced in
+    # one table export. Results come from ZONAL_STATISTICS_COLLECTION_ID, an
+    # image collection with a 'year' property, or from the classified regions
+    # when every region is processed.
+
+    def __init__(self, batch_keys=['year']):
+        super().__init__(batch_keys)
+
+    def _run(self, raw_results):
+        settings = self._settings
+        years = settings.YEARS
+
+        images_by_year = {year: self._get_result_of_year(raw_results, year) for year in years}
+        images_by_year = {year: image for year, image in images_by_year.items() if image}
+
+        if not images_by_year:
+            return
+
+        zones = (ee.FeatureCollection(settings.ZONAL_STATISTICS_ZONES_ID)
+                 if settings.ZONAL_STATISTICS_ZONES_ID else self._grid_collection)
+        zone_field = settings.ZONAL_STATISTICS_ZONE_FIELD or settings.GRID_FEATURE_ID_FIELD
+
+        areas = zonal.get_zonal_areas(
+            images_by_year, zones, zone_field,
+            settings.ZONAL_STATISTICS_CLASSES,
+            settings.EXPORT_SCALE)
+
+        self._add_in_batch(
+            year=get_years_label(sorted(images_by_year)),
+            data=areas)
+
+    def _get_result_of_year(self, raw_results, year):
+        collection_id = self._settings.ZONAL_STATISTICS_COLLECTION_ID
+
+        if collection_id:
+            return (ee.ImageCollection(collection_id)
+                    .filterMetadata('year', 'equals', year)
+                    .mosaic())
+
+        regions_ids = [region_id for region_id in self._get_regions_ids()
+                       if raw_results.contains(year=year, region_id=region_id)]
+
+        if not regions_ids:
+            return None
+
+        # the table of a year covers every region, so the regions skipped by
+        # the incremental plan have to come from the exported results
+        if len(regions_ids) < len(self._get_regions_ids()):
+            raise ImproperlyConfigured(
+                'ZONAL_STATISTICS_COLLECTION_ID is required when only some '
+                'regions of {0} are processed'.format(year))
+
+        results = [raw_results.get_element(year=year, region_id=region_id)
+                   for region_id in regions_ids]
+
+        return ee.ImageCollection(results).mosaic()
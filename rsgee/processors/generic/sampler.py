@@ -1,13 +1,15 @@
 from abc import ABC, abstractclassmethod
-from datetime import datetime
 
 import ee
 
 from rsgee.processors.generic.base import BaseProcessor
+from rsgee.utils.geometry import merge_bounds
 
 
 class BaseSampler(BaseProcessor, ABC):
 
+    STAGE = 'sampling'
+
     def __init__(self, batch_keys=['year', 'region_id']):
         super().__init__(batch_keys)
 
@@ -44,6 +46,9 @@ class DefaultSimpleSampler(BaseSampler):
                                   .rename(['class']))
 
             for region_id in regions_ids:
+                if not self._is_required(year, region_id):
+                    continue
+
                 mosaic = mosaics.get_element(year=year, region_id=region_id)
 
                 roi = (self._get_region_by_id(region_id)
@@ -59,7 +64,7 @@ class DefaultSimpleSampler(BaseSampler):
                                region=roi,
                                numPixels=self._settings.SAMPLING_POINTS,
                                scale=self._settings.EXPORT_SCALE,
-                               seed=datetime.now().microsecond,
+                               seed=self._get_seed(year, region_id),
                                tileScale=4,
                                geometries=True))
 
@@ -82,14 +87,20 @@ class LoadSamplesFromAsset(BaseSampler):
 
         for year in self._settings.YEARS:
             for region_id in regions_ids:
+                if not self._is_required(year, region_id):
+                    continue
+
                 asset_id = (self._settings.SAMPLES_ASSET_ID
                             .format(
                                year=year,
                                region_id=region_id))
 
-                roi = (self._get_region_by_id(region_id)
-                       .geometry()
-                       .buffer(sampling_buffer, 30))
+                if self._settings.SAMPLING_USE_REGION_BOUNDS:
+                    roi = self._get_region_bounds(region_id, sampling_buffer)
+                else:
+                    roi = (self._get_region_by_id(region_id)
+                           .geometry()
+                           .buffer(sampling_buffer, 30))
 
                 samplesCollection = (ee.FeatureCollection(asset_id)
                                      .filterBounds(roi))
@@ -98,7 +109,7 @@ class LoadSamplesFromAsset(BaseSampler):
                     samplesCollection = (samplesCollection
                                          .randomColumn(
                                              columnName='RANDOM',
-                                             seed=datetime.now().microsecond
+                                             seed=self._get_seed(year, region_id)
                                          )
                                          .limit(sampling_points, 'RANDOM'))
 
@@ -116,6 +127,9 @@ class StratifiedSampler(BaseSampler):
 
         for year in self._settings.YEARS:
             for region_id in regions_ids:
+                if not self._is_required(year, region_id):
+                    continue
+
                 mosaic = mosaics.get_element(year=year, region_id=region_id)
 
                 roi = self._get_region_by_id(region_id)
@@ -136,6 +150,7 @@ class StratifiedSampler(BaseSampler):
                               scale=30,
                               classValues=[0, 1],
                               classPoints=[other_samples, coi_samples], 
+                              seed=self._get_seed(year, region_id),
                               geometries=True
                            ))
 
@@ -147,3 +162,60 @@ class StratifiedSampler(BaseSampler):
                     year=year,
                     region_id=region_id,
                     data=samples)
+
+
+class BalancedSampler(BaseSampler):
+    # balanced training sets drawn from the local sample store
+    # (rsgee.local.samples), as the coi/extra/others policy of the
+    # classification scripts: up to SAMPLING_POINTS samples around the region,
+    # the class of interest topped up with the samples of SAMPLING_EXTRA_SOURCE
+    # to SAMPLING_MIN_CLASS_SAMPLES and the other classes filling the rest.
+    # Drawn samples are a filter of their source assets, exported as one table
+    # per region, or per cluster when classifiers are shared.
+
+    def _run(self, mosaics):
+        # pyarrow is only needed by this sampler
+        from rsgee.local import samples as sample_store
+
+        settings = self._settings
+        store = sample_store.SampleStore(settings.SAMPLES_STORE_DIRECTORY)
+        extra_source = settings.SAMPLING_EXTRA_SOURCE
+
+        for year in settings.YEARS:
+            for region_id in self._get_regions_ids():
+                cluster = self._get_cluster(region_id)
+
+                if region_id != cluster[0] or not self._is_required(year, region_id):
+                    continue
+
+                store_years = [settings.SAMPLES_STORE_YEAR or year]
+                bounds = merge_bounds([self._get_grid_index().get_bounds_by_id(member_id)
+                                       for member_id in cluster])
+
+                all_samples = store.load_near(bounds, settings.SAMPLING_BUFFER, store_years)
+                extra = None
+
+                if extra_source and all_samples.num_rows:
+                    extra, all_samples = sample_store.split_by_source(all_samples, extra_source)
+
+                if not all_samples.num_rows:
+                    continue
+
+                balanced = sample_store.draw_balanced(
+                    all_samples,
+                    total=settings.SAMPLING_POINTS,
+                    min_coi=settings.SAMPLING_MIN_CLASS_SAMPLES,
+                    extra=extra,
+                    class_value=settings.SAMPLING_CLASS_OF_INTEREST,
+                    seed=self._get_seed(year, region_id))
+
+                samples = (sample_store
+                           .to_feature_collection(balanced)
+                           .set({
+                               'year': year,
+                               'region_id': region_id}))
+
+                self._add_in_batch(
+                    year=year,
+                    region_id=region_id,
+                    data=samples)
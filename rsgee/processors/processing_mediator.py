@@ -4,8 +4,16 @@ from rsgee import export
 
 class ProcessingMediator():
 
+    FILENAME_SUFIXES = {
+        'mosaics': 'mosaic',
+        'samples': 'samples',
+        'raw_results': 'raw_result',
+        'filtered_results': 'filtered_result'
+    }
+
     def __init__(self):
         self.__data = {}
+        self.__processors = {}
         self.__to_export_key = ''
 
     def process(self):
@@ -24,18 +32,32 @@ class ProcessingMediator():
             self.__execute(classifier, 'raw_results')
 
         if (post_processor):
-            self.__execute(post_processor, 'results')
+            self.__execute(post_processor, 'filtered_results')
 
         batch = self.__data[self.__to_export_key]
 
-        filename_sufix = {
-            'mosaics': 'mosaic',
-            'samples': 'samples',
-            'raw_results': 'raw_result',
-            'filtered_results': 'filtered_result'
-        }[self.__to_export_key]
+        filename_sufix = ProcessingMediator.FILENAME_SUFIXES[self.__to_export_key]
+
+        tasks = export.generate_tasks_from_batch(batch, filename_sufix)
+
+        return [*self.__get_dependencies(), *tasks]
+
+    # batches of each processing stage, by output key
+    def get_stages_batches(self):
+        return dict(self.__data)
 
-        return export.generate_tasks_from_batch(batch, filename_sufix)
+    @staticmethod
+    def get_filename_sufix():
+        output_keys = [
+            (sm.settings.POST_PROCESSING_CLASS, 'filtered_results'),
+            (sm.settings.CLASSIFICATION_CLASS, 'raw_results'),
+            (sm.settings.SAMPLING_CLASS, 'samples'),
+            (sm.settings.GENERATOR_CLASS, 'mosaics'),
+        ]
+
+        output_key = next(key for processor, key in output_keys if processor)
+
+        return ProcessingMediator.FILENAME_SUFIXES.get(output_key)
 
     def __execute(self, processor, output_key):
         processor = processor()
@@ -44,4 +66,13 @@ class ProcessingMediator():
         result = processor.process(**self.__data)
 
         self.__data[output_key] = result
+        self.__processors[output_key] = processor
         self.__to_export_key = output_key
+
+    def __get_dependencies(self):
+        # the output of the last stage is already exported, so its own cache
+        # dependencies (e.g. caching the mosaics being exported) are skipped
+        return [task
+                for output_key, processor in self.__processors.items()
+                for task in processor.get_dependencies(
+                    exported=output_key == self.__to_export_key)]
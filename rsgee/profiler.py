@@ -0,0 +1,93 @@
+import csv
+import os
+
+from rsgee.core.exceptions import GraphTooLarge
+from rsgee.utils import cache
+from rsgee.utils.graph_profile import profile_graph
+
+MEASURES = ['nodes', 'expanded_nodes', 'bytes', 'depth',
+            'iterate', 'map', 'join', 'duplicate_subgraphs']
+
+# rows of the submitted graphs, the thresholds only apply to them
+TASKS_STAGE = 'tasks'
+
+
+class GraphProfiler:
+    # measures the serialized graph of the output of every processing stage
+    # and of every task (see rsgee.utils.graph_profile), to find the stages
+    # that make graphs slow to submit or too large, and to compare runs
+
+    def __init__(self, settings):
+        self.__settings = settings
+        self.rows = []
+
+    def profile_stages(self, mediator):
+        for stage, batch in mediator.get_stages_batches().items():
+            for name, element in batch.get_all().items():
+                self.__add_row(stage, name, element['data'])
+
+        return self.rows
+
+    def profile_tasks(self, tasks):
+        for task in tasks:
+            expression = task.config.get('expression')
+
+            if expression is not None:
+                self.__add_row(TASKS_STAGE, task.config['description'], expression)
+
+        return self.rows
+
+    def write_csv(self, path=None):
+        path = path or self.__settings.PROFILE_PATH or os.path.join(
+            cache.get_cache_directory('profiles'),
+            cache.get_cache_filename(self.__settings.NAME, 'csv'))
+
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['stage', 'name', *MEASURES])
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+        return path
+
+    def report(self):
+        print("********************* Graph profile **********************")
+
+        stages = []
+
+        for row in self.rows:
+            if row['stage'] not in stages:
+                stages.append(row['stage'])
+
+        for stage in stages:
+            rows = [row for row in self.rows if row['stage'] == stage]
+
+            print("{0}: {1} graphs, max {2}".format(stage, len(rows), ", ".join(
+                "{0} {1}".format(measure, max(row[measure] for row in rows))
+                for measure in MEASURES)))
+
+        print("**********************************************************")
+
+    # tasks above the thresholds, as (code, measure, value, threshold)
+    def get_exceeded(self):
+        thresholds = self.__settings.PROFILE_THRESHOLDS or {}
+
+        return [(row['name'], measure, row[measure], threshold)
+                for row in self.rows if row['stage'] == TASKS_STAGE
+                for measure, threshold in thresholds.items()
+                if row[measure] > threshold]
+
+    def check(self):
+        exceeded = self.get_exceeded()
+
+        for code, measure, value, threshold in exceeded:
+            print("Warning: {0} has {1} {2} (threshold {3})".format(code, measure, value, threshold))
+
+        if exceeded and self.__settings.PROFILE_THRESHOLDS_ACTION == 'fail':
+            raise GraphTooLarge("{0} task graphs above the thresholds".format(
+                len({code for code, *_ in exceeded})))
+
+    def __add_row(self, stage, name, obj):
+        profile = profile_graph(obj)
+
+        self.rows.append({'stage': stage, 'name': name,
+                          **{measure: profile[measure] for measure in MEASURES}})
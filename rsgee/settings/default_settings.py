@@ -2,6 +2,10 @@ class DefaultSettings():
 
     NAME = 'default'
 
+    # run seed, combined with the settings name, stage, year and region to
+    # derive the seeds of samplers and classifiers
+    SEED = 0
+
     # ************* COLLECTION SETTINGS *************
 
     IMAGE_COLLECTION = None
@@ -16,6 +20,11 @@ class DefaultSettings():
 
     GRID_FEATURE_ID_FIELD = 'PATHROW'
 
+    # ******************* CACHE *********************
+
+    # local directory for data fetched once from earth engine (grids, etc)
+    CACHE_DIRECTORY = '.rsgee_cache'
+
     # ********** GENERATION SETTINGS *******************
 
     GENERATOR_CLASS = None
@@ -50,8 +59,26 @@ class DefaultSettings():
 
     GENERATION_USE_GEOMETRY_CENTROID = False
 
+    # images of each cell and period are listed by the local scene inventory
+    # and filtered by id, only for collections loaded by id and client-side
+    # periods
+    GENERATION_USE_SCENE_INVENTORY = False
+
+    # images of each period with the lowest cloud cover, None keeps all. Only
+    # applied with the scene inventory.
+    GENERATION_IMAGES_LIMIT = None
+
+    # normalization coefficients of DefaultBLARDGenerator from the local
+    # coefficients index, for the scenes listed by the scene inventory,
+    # instead of a join in every graph
+    GENERATION_USE_COEFFICIENTS_INDEX = False
+
     GENERATION_ADDITIONAL_DATA = []
 
+    # assets folder of the mosaics cache, shared between settings. Cached
+    # mosaics replace the generation graph, missing ones are exported to it.
+    GENERATION_CACHE_DIRECTORY = ''
+
     # *********** SAMPLING SETTINGS ***********
 
     SAMPLING_CLASS = None
@@ -66,6 +93,23 @@ class DefaultSettings():
 
     SAMPLING_BUFFER = 0
 
+    # filter samples by the buffered bounding box of the region, computed
+    # locally, instead of a server-side buffer of its geometry
+    SAMPLING_USE_REGION_BOUNDS = False
+
+    # local sample store (rsgee.local.samples) of BalancedSampler
+    SAMPLES_STORE_DIRECTORY = ''
+
+    # year of the stored samples, None draws the samples of each year
+    SAMPLES_STORE_YEAR = None
+
+    SAMPLING_CLASS_OF_INTEREST = 1
+
+    SAMPLING_MIN_CLASS_SAMPLES = 500
+
+    # source asset of the stored samples used to top up the class of interest
+    SAMPLING_EXTRA_SOURCE = ''
+
     # ********** CLASSIFICATION SETTINGS **************
 
     CLASSIFICATION_CLASS = None
@@ -74,29 +118,67 @@ class DefaultSettings():
 
     CLASSIFICATION_TREES = 100
 
+    # trains one classifier per cluster of neighbor regions, with the samples of
+    # all of them, and reuses it to classify every region of the cluster
+    CLASSIFICATION_SHARE_CLASSIFIER = False
+
+    # distance in meters between regions of a cluster, None uses twice the
+    # sampling buffer, where the samples of neighbor regions overlap
+    CLASSIFICATION_SHARE_DISTANCE = None
+
+    CLASSIFICATION_SHARE_MAX_REGIONS = 9
+
+    # limit of merged samples to train a shared classifier, 0 keeps all
+    CLASSIFICATION_SHARE_MAX_SAMPLES = 0
+
+    # None trains inside every classification graph, 'train' exports the trees
+    # of each (year, cluster) classifier and 'classify' reuses them
+    CLASSIFICATION_MODEL_MODE = None
+
+    # assets directory of the exported trees
+    CLASSIFICATION_MODEL_DIRECTORY = '{user_assets_root}/rsgee_models'
+
 
 
     # *********** POST PROCESSING SETTINGS ************
 
     POST_PROCESSING_CLASS = None
 
-    # POSTPROCESSING_COLLECTION = ''
+    # filters of TemporalSpatialFilter, applied in order: 'temporal', 'spatial'
+    # and 'connected_pixels'
+    POST_PROCESSING_FILTERS = []
+
+    POST_PROCESSING_CLASS_OF_REFERENCE = 1
+
+    # years before and after each year, an int or [before, after]
+    POST_PROCESSING_TEMPORAL_FILTER_OFFSET = 2
+
+    POST_PROCESSING_TEMPORAL_FILTER_THRESHOLD = 2
+
+    # 'threshold', 'inclusion' (center or window) or 'exclusion' (center and window)
+    POST_PROCESSING_TEMPORAL_FILTER_MODE = 'threshold'
 
-    # POSTPROCESSING_FILTERS = []
+    POST_PROCESSING_SPATIAL_FILTER_THRESHOLD = 15
 
-    # POSTPROCESSING_TEMPORAL_FILTER_THRESHOLD = 2
+    POST_PROCESSING_SPATIAL_FILTER_KERNEL = [
+        [1, 1, 1, 1, 1],
+        [1, 2, 2, 2, 1],
+        [1, 2, 2, 2, 1],
+        [1, 2, 2, 2, 1],
+        [1, 1, 1, 1, 1]
+    ]
 
-    # POSTPROCESSING_TEMPORAL_FILTER_OFFSET = 2
+    POST_PROCESSING_MIN_CONNECTED_PIXELS = 6
 
-    # POSTPROCESSING_SPATIAL_FILTER_THRESHOLD = 15
+    # zones of ZonalStatistics, the grid when empty
+    ZONAL_STATISTICS_ZONES_ID = ''
 
-    # POSTPROCESSING_SPATIAL_FILTER_KERNEL = [
-    #     [1, 1, 1, 1, 1],
-    #     [1, 2, 2, 2, 1],
-    #     [1, 2, 2, 2, 1],
-    #     [1, 2, 2, 2, 1],
-    #     [1, 1, 1, 1, 1]
-    # ]
+    ZONAL_STATISTICS_ZONE_FIELD = None
+
+    ZONAL_STATISTICS_CLASSES = [1]
+
+    # results to summarize, the classified regions of the run when empty
+    ZONAL_STATISTICS_COLLECTION_ID = ''
 
     # ********** EXPORT SETTINGS **********************
 
@@ -126,6 +208,38 @@ class DefaultSettings():
 
     EXPORT_FILENAME_PREFIX = None
 
+    EXPORT_YEARS_PER_TASK = 1
+
+    # pixels times bands of a single export, bigger regions are split in parts
+    # and smaller neighbors packed together. None keeps one export per region.
+    EXPORT_MAX_PIXELS_PER_TASK = None
+
+    EXPORT_MIN_PIXELS_PER_TASK = None
+
+    # ********** PREFLIGHT SETTINGS **********************
+
+    # checks of the cells before submission ('scenes', 'reference' and
+    # 'samples'), cells that fail them are stored as SKIPPED with the reason
+    PREFLIGHT_CHECKS = []
+
+    # scale of the reference pixels counted by region, only their presence
+    # is checked
+    PREFLIGHT_REFERENCE_SCALE = 300
+
+    # ********** GRAPH PROFILE SETTINGS **********************
+
+    # profiles the graphs of the tasks before submission, written as CSV to
+    # PROFILE_PATH (by default to the cache)
+    PROFILE_GRAPHS = False
+
+    PROFILE_PATH = None
+
+    # limits of the measures of a task graph, e.g. {'bytes': 10E6, 'depth': 500}
+    PROFILE_THRESHOLDS = {}
+
+    # 'warn' prints the tasks above the thresholds, 'fail' stops the run
+    PROFILE_THRESHOLDS_ACTION = 'warn'
+
     @classmethod
     def get_formated(clss, key, **args):
         return clss.__dict__[key].format(settings_name=clss.NAME, **args)
@@ -5,6 +5,9 @@ class SettingsManager:
 
     settings = None
 
+    # (year, region_id) cells to process, None processes all of them
+    scheduled_cells = None
+
     __all_settings = {}
 
     @staticmethod
@@ -22,6 +25,15 @@ class SettingsManager:
     def set_running_settings(settings_name):
         SettingsManager.settings = SettingsManager.get_settings(settings_name)
 
+    @staticmethod
+    def set_scheduled_cells(cells):
+        SettingsManager.scheduled_cells = None if cells is None else set(cells)
+
+    @staticmethod
+    def is_cell_scheduled(year, region_id):
+        cells = SettingsManager.scheduled_cells
+        return cells is None or (year, region_id) in cells
+
     @staticmethod
     def get_processors():
         if SettingsManager.settings:
@@ -9,6 +9,9 @@ import ee
 from rsgee.settings import SettingsManager as sm
 from rsgee.db.models import Task, TaskLog
 
+# state of the tasks of cells that failed the preflight checks
+SKIPPED = "SKIPPED"
+
 
 class TaskManager(Thread):
     def __init__(self, session, settings):
@@ -44,11 +47,12 @@ class TaskManager(Thread):
         print("Finished!!!")
         sys.exit(0)
 
-    def add_tasks(self, tasks):
+    def add_tasks(self, tasks, fingerprints={}):
         for task in tasks:
-            self.add_task(task)
+            code = task.config["description"]
+            self.add_task(task, fingerprints.get(code))
 
-    def add_task(self, task):
+    def add_task(self, task, fingerprint=None):
         code = task.config["description"]
 
         self.__data[code] = task
@@ -57,7 +61,11 @@ class TaskManager(Thread):
 
         if not task:
             # data_json = ee.serializer.toJSON(data)
-            task = Task(code=code, state=ee.batch.Task.State.UNSUBMITTED)
+            task = Task(
+                code=code,
+                state=ee.batch.Task.State.UNSUBMITTED,
+                fingerprint=fingerprint,
+            )
 
             self.__session.add(task)
             self.__session.commit()
@@ -71,6 +79,50 @@ class TaskManager(Thread):
             self.__session.add(task_log)
             self.__session.commit()
 
+        elif fingerprint and task.fingerprint != fingerprint:
+            # the inputs or settings of the cell changed since the last run,
+            # tasks saved before fingerprints existed only get it recorded.
+            # Submitted tasks keep the old fingerprint, so they are rebuilt by
+            # the first run after Earth Engine finishes them
+            if task.state in [
+                ee.batch.Task.State.READY,
+                ee.batch.Task.State.RUNNING,
+            ]:
+                print("Task {0} is {1}, not rebuilt".format(code, task.state))
+                return
+
+            if task.fingerprint is not None:
+                if task.state == ee.batch.Task.State.COMPLETED:
+                    self.__delete_asset(self.__data[code])
+
+                task.state = ee.batch.Task.State.UNSUBMITTED
+
+                self.__session.add(
+                    TaskLog(
+                        task=task.id,
+                        state=task.state,
+                        date=datetime.datetime.now(),
+                        info="Fingerprint changed",
+                    )
+                )
+
+            task.fingerprint = fingerprint
+            self.__session.commit()
+
+        if task.state == SKIPPED:
+            # the cell passed the preflight checks of this run
+            task.state = ee.batch.Task.State.UNSUBMITTED
+
+            self.__session.add(
+                TaskLog(
+                    task=task.id,
+                    state=task.state,
+                    date=datetime.datetime.now(),
+                    info="Preflight checks passed",
+                )
+            )
+            self.__session.commit()
+
         if task and task.state not in [
             ee.batch.Task.State.COMPLETED,
             ee.batch.Task.State.CANCELLED,
@@ -79,6 +131,48 @@ class TaskManager(Thread):
         else:
             print("Task {0} exists!".format(code))
 
+    # tasks of cells without imagery or training data are stored as skipped,
+    # with the reason, and never submitted
+    def skip_tasks(self, reasons, fingerprints={}):
+        for code, reason in reasons.items():
+            self.skip_task(code, reason, fingerprints.get(code))
+
+    def skip_task(self, code, reason, fingerprint=None):
+        task = self.get_task(code)
+
+        if not task:
+            task = Task(code=code, state=SKIPPED, fingerprint=fingerprint)
+
+            self.__session.add(task)
+            self.__session.commit()
+
+        elif task.state == SKIPPED and task.fingerprint == fingerprint:
+            return
+
+        # submitted or finished tasks are kept, as Earth Engine still runs or
+        # ran them
+        elif task.state not in [
+            ee.batch.Task.State.UNSUBMITTED,
+            ee.batch.Task.State.FAILED,
+            SKIPPED,
+        ]:
+            print("Task {0} is {1}, not skipped: {2}".format(code, task.state, reason))
+            return
+
+        task.state = SKIPPED
+        task.fingerprint = fingerprint
+
+        self.__session.add(
+            TaskLog(
+                task=task.id,
+                state=SKIPPED,
+                date=datetime.datetime.now(),
+                info=reason,
+            )
+        )
+        self.__session.commit()
+        print("Task {0} skipped: {1}".format(code, reason))
+
     def update_tasks(self):
         for code, t in self.__tasks_running.copy().items():
             task = self.get_task(code)
@@ -185,6 +279,20 @@ class TaskManager(Thread):
                 "name"
             ].replace("projects/earthengine-legacy/assets/users/", "")
 
+    # exports to an existing asset are rejected, the asset of a completed task
+    # is deleted before it is rebuilt
+    def __delete_asset(self, task):
+        if "assetExportOptions" not in task.config:
+            return
+
+        asset_id = task.config["assetExportOptions"]["earthEngineDestination"]["name"]
+
+        try:
+            ee.data.deleteAsset(asset_id)
+            print("Asset {0} deleted!".format(asset_id))
+        except ee.EEException as e:
+            print("Asset {0} not deleted: {1}".format(asset_id, e))
+
     def __submit_task(self, tasks):
 
         for code in sorted(tasks.copy().keys()):
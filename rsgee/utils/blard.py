@@ -1,9 +1,12 @@
+import datetime
 from functools import reduce
 
 import ee
 
 from rsgee.collections import Landsat5, Landsat7, Landsat8, Modis
 from rsgee.band import Band
+from rsgee.utils import grid
+from rsgee.utils.coefficients_index import get_coefficients_index
 
 LANDSAT_COLLECTIONS = [Landsat5.TOA.Tier1, Landsat7.TOA.Tier1, Landsat8.TOA.Tier1]
 
@@ -21,6 +24,10 @@ NORMALIZATION_TARGET = (
     "users/agrosatelite_mapbiomas/COLECAO_5/BLARD/MODIS_2000_2019_NORMALIZATION_TARGET"
 )
 
+NORMALIZATION_COEFFICIENTS_ID = (
+    "users/agrosatelite_mapbiomas/BLARD/NORMALIZATION/COEFFICIENTS"
+)
+
 SPATIAL_RESOLUTION = 30
 
 CFACTOR = 0.05
@@ -30,6 +37,8 @@ PSINV_PIXELS_MASK = "PSINV_PIXELS_MASK"
 PSINV_PIXELS_COUNT = "PSINV_PIXELS_COUNT"
 MIN_PSINV_PIXELS_COUNT = 5000
 
+INTERVAL_DAYS = 16
+
 
 def get16DayProductByPathRow(
     path, row, start_date, end_date, cloud_cover, export_bands
@@ -46,17 +55,23 @@ def get16DayProductByPathRow(
     return get16DayproductByROI(roi, start_date, end_date, cloud_cover, export_bands)
 
 
-def get16DayproductByROI(roi, start_date, end_date, cloud_cover, export_bands):
-    # collection = getLandsatCollection(roi, start_date, end_date, cloud_cover)
+def get16DayproductByROI(
+    roi, start_date, end_date, cloud_cover, export_bands, products_plan=None,
+    scenes_ids=None
+):
+    collection = getLandsatCollection(roi, start_date, end_date, cloud_cover)
     # normalized_collection = getLandsatNormCollection(collection, export_bands)
     normalized_collection = (
-        normalize_collection(collection, start_date, end_date, roi)
+        normalize_collection(
+            collection, start_date, end_date, roi,
+            use_coefficients_index=scenes_ids is not None, scenes_ids=scenes_ids
+        )
         .select([Band.QA_SCORE, *export_bands])
         .map(addQualityFlag)
     )
 
     return build16DayProduct(
-        roi, normalized_collection, start_date, end_date, export_bands
+        roi, normalized_collection, start_date, end_date, export_bands, products_plan
     )
 
 
@@ -80,29 +95,38 @@ def getLandsatCollection(roi, startDate, endDate, cloud_cover):
     return landsatCollection
 
 
-def normalize_collection(collection, start_date, end_date, roi):
-    # bandsRegex = ee.List(BANDS).map(lambda band: ee.String(band).cat("_.*"))
-    coefficients = (
-        ee.FeatureCollection(
-            "users/agrosatelite_mapbiomas/BLARD/NORMALIZATION/COEFFICIENTS"
-        )
-        .filterDate(start_date, end_date)
-        .filterBounds(roi.buffer(200000))
-    )
-
+def normalize_collection(
+    collection, start_date, end_date, roi, use_coefficients_index=False, scenes_ids=None
+):
     def add_sufix(sufix):
         return lambda band: ee.String(band).cat(sufix)
 
     gainBands = ee.List(BANDS).map(add_sufix("_gain"))
     offsetBands = ee.List(BANDS).map(add_sufix("_offset"))
 
-    collection = ee.Join.saveFirst(matchKey="NORMALIZATION_COEFFS").apply(
-        primary=collection,
-        secondary=coefficients,
-        condition=ee.Filter.equals(
-            leftField="LANDSAT_SCENE_ID", rightField="LANDSAT_SCENE_ID"
-        ),
-    )
+    # the coefficients index needs the scenes of the collection, known ones
+    # (e.g. from the scene inventory) or requested while the graph is built
+    if use_coefficients_index:
+        index = get_coefficients_index(NORMALIZATION_COEFFICIENTS_ID)
+        collection = index.join(
+            collection, "NORMALIZATION_COEFFS", scenes_ids,
+            fetch_scenes_ids=scenes_ids is None
+        )
+    else:
+        # bandsRegex = ee.List(BANDS).map(lambda band: ee.String(band).cat("_.*"))
+        coefficients = (
+            ee.FeatureCollection(NORMALIZATION_COEFFICIENTS_ID)
+            .filterDate(start_date, end_date)
+            .filterBounds(roi.buffer(200000))
+        )
+
+        collection = ee.Join.saveFirst(matchKey="NORMALIZATION_COEFFS").apply(
+            primary=collection,
+            secondary=coefficients,
+            condition=ee.Filter.equals(
+                leftField="LANDSAT_SCENE_ID", rightField="LANDSAT_SCENE_ID"
+            ),
+        )
 
     def apply_normalization(image):
         img_coefs = ee.Feature(image.get("NORMALIZATION_COEFFS"))
@@ -131,7 +155,9 @@ def getLandsatNormCollection(landsat_collection, bands):
     return landsatNormCollection
 
 
-def build16DayProduct(roi, normalized_collection, start_date, end_date, export_bands):
+def build16DayProduct(
+    roi, normalized_collection, start_date, end_date, export_bands, products_plan=None
+):
     intervals = ee.FeatureCollection(getIntervals(start_date, end_date))
 
     def cross_with_periods(wrs, periods_with_pathrow):
@@ -209,13 +235,14 @@ def build16DayProduct(roi, normalized_collection, start_date, end_date, export_b
 
         return landsatNormMosaic
 
-    regionsByInterval = (
-        ee.FeatureCollection(
-            "users/agrosatelite_mapbiomas/COLECAO_5/GRIDS/BRASIL_COMPLETO"
+    if products_plan is not None:
+        regionsByInterval = plan_to_feature_collection(products_plan)
+    else:
+        regionsByInterval = (
+            ee.FeatureCollection(LANDSAT_GRID)
+            .filterBounds(roi)
+            .iterate(cross_with_periods, ee.FeatureCollection([]))
         )
-        .filterBounds(roi)
-        .iterate(cross_with_periods, ee.FeatureCollection([]))
-    )
 
     products = (
         ee.FeatureCollection(regionsByInterval)
@@ -411,6 +438,91 @@ def getIntervals(startDateInput, endDateInput):
     return collection
 
 
+# client-side counterpart of getIntervals, dates as 'YYYY-MM-DD' strings
+def get_client_intervals(start_date, end_date):
+    start_date = _to_datetime(start_date)
+    end_date = _to_datetime(end_date)
+    limit_date = end_date + datetime.timedelta(days=1)
+
+    intervals = []
+
+    for year in range(start_date.year, end_date.year + 1):
+        first_day = datetime.datetime(year, 1, 1)
+        last_doy = (datetime.datetime(year, 12, 31) - first_day).days
+
+        starts = list(range(1, last_doy + 1, INTERVAL_DAYS))
+        ends = [*range(1 + INTERVAL_DAYS, last_doy + 1, INTERVAL_DAYS), last_doy]
+
+        for index, (start_doy, end_doy) in enumerate(zip(starts, ends), 1):
+            interval_start = first_day + datetime.timedelta(days=start_doy)
+            interval_end = first_day + datetime.timedelta(days=end_doy)
+
+            if interval_start >= start_date and interval_end <= limit_date:
+                intervals.append((index, interval_start, interval_end))
+
+    return intervals
+
+
+# crosses the 16 day intervals with the WRS tiles intersecting the roi (a
+# GeoJSON geometry), returning (interval, path, row, start, end, geometry)
+# tuples computed locally
+def plan_16day_products(roi, start_date, end_date, grid_features=None):
+    grid_features = grid_features or grid.load_grid_index(LANDSAT_GRID)
+    wrs_tiles = grid.get_intersecting_features(grid_features, roi)
+    intervals = get_client_intervals(start_date, end_date)
+
+    return [
+        (
+            interval,
+            wrs["properties"]["PATH"],
+            wrs["properties"]["ROW"],
+            interval_start,
+            interval_end,
+            wrs["geometry"],
+        )
+        for wrs in wrs_tiles
+        for interval, interval_start, interval_end in intervals
+    ]
+
+
+def plan_to_feature_collection(products_plan):
+    # geometries are shared between the intervals of the same tile, so each
+    # one is serialized only once in the graph
+    geometries = {}
+
+    def to_feature(product):
+        interval, path, row, start_date, end_date, wrs_geometry = product
+
+        if (path, row) not in geometries:
+            geometries[(path, row)] = ee.Geometry(wrs_geometry)
+
+        return ee.Feature(
+            None,
+            {
+                "interval": interval,
+                "path": path,
+                "row": row,
+                "geometry": geometries[(path, row)],
+                "start_date": _to_millis(start_date),
+                "end_date": _to_millis(end_date),
+            },
+        )
+
+    return ee.FeatureCollection([to_feature(product) for product in products_plan])
+
+
+def _to_datetime(date):
+    if isinstance(date, datetime.datetime):
+        return date
+
+    return datetime.datetime.strptime(date, "%Y-%m-%d")
+
+
+def _to_millis(date):
+    epoch = datetime.datetime(1970, 1, 1)
+    return int((date - epoch).total_seconds() * 1000)
+
+
 def addQualityFlag(image):
     # qualityFlag = ee.Image(cloudLib.cloudScore(image)).rename("QF")
     qualityFlag = image.select([Band.QA_SCORE], ["QF"])
@@ -0,0 +1,39 @@
+import json
+import os
+import re
+
+from rsgee.settings import SettingsManager as sm
+
+DEFAULT_CACHE_DIRECTORY = '.rsgee_cache'
+
+
+def get_cache_directory(*subdirectories):
+    root = getattr(sm.settings, 'CACHE_DIRECTORY', None) or DEFAULT_CACHE_DIRECTORY
+    directory = os.path.join(root, *subdirectories)
+
+    os.makedirs(directory, exist_ok=True)
+
+    return directory
+
+
+def get_cache_filename(asset_id, extension='json'):
+    return '{0}.{1}'.format(re.sub('[^A-Za-z0-9_.-]', '_', asset_id), extension)
+
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+
+    with open(path) as cache_file:
+        return json.load(cache_file)
+
+
+def write_json(path, data):
+    # write to a temporary file first, so an interrupted run never leaves a
+    # truncated cache behind
+    temporary_path = f'{path}.tmp'
+
+    with open(temporary_path, 'w') as cache_file:
+        json.dump(data, cache_file)
+
+    os.replace(temporary_path, path)
@@ -0,0 +1,105 @@
+import os
+
+import ee
+
+from rsgee.utils import cache
+
+DEFAULT_KEY_FIELD = 'LANDSAT_SCENE_ID'
+
+# features downloaded by request, below the limit of getInfo
+PAGE_SIZE = 5000
+
+__indexes = {}
+
+
+class CoefficientsIndex:
+    # coefficient tables keyed by scene (e.g. the normalization and topography
+    # coefficients of BLARD) downloaded once to the local cache. Collections
+    # whose scenes are known get their coefficients as literal properties
+    # instead of a Join with the whole table inside every graph.
+
+    def __init__(self, table_id, key_field=DEFAULT_KEY_FIELD):
+        self.__table_id = table_id
+        self.__key_field = key_field
+        self.__coefficients = None
+
+    def get_local_path(self):
+        return os.path.join(cache.get_cache_directory('coefficients'),
+                            cache.get_cache_filename(self.__table_id))
+
+    def load(self, refresh=False):
+        if self.__coefficients is not None and not refresh:
+            return self.__coefficients
+
+        coefficients = None if refresh else cache.read_json(self.get_local_path())
+
+        if coefficients is None:
+            coefficients = self.__download()
+            cache.write_json(self.get_local_path(), coefficients)
+
+        self.__coefficients = coefficients
+
+        return coefficients
+
+    def get(self, scene_id):
+        return self.load().get(scene_id)
+
+    # coefficients of the scenes found in the table, the others are left out
+    # as the images without a match of Join.saveFirst
+    def get_coefficients(self, scenes_ids):
+        coefficients = self.load()
+
+        return {scene_id: coefficients[scene_id]
+                for scene_id in scenes_ids if scene_id in coefficients}
+
+    def get_feature(self, scene_id):
+        return ee.Feature(None, self.get(scene_id))
+
+    # same result of Join.saveFirst(match_key) on the key field. The scenes of
+    # the collection come from scenes_ids (e.g. the scene inventory), or with
+    # fetch_scenes_ids from a request while the graph is built.
+    def join(self, collection, match_key, scenes_ids=None, fetch_scenes_ids=False):
+        collection = ee.ImageCollection(collection)
+
+        if scenes_ids is None:
+            if not fetch_scenes_ids:
+                raise ValueError('The scenes ids of the collection are required, '
+                                 'or fetch_scenes_ids to request them')
+
+            scenes_ids = collection.aggregate_array(self.__key_field).getInfo()
+
+        coefficients = self.get_coefficients(scenes_ids)
+        lookup = ee.Dictionary(coefficients)
+        key_field = self.__key_field
+
+        def set_coefficients(image):
+            return image.set(match_key, ee.Feature(None, lookup.get(image.get(key_field))))
+
+        return (collection
+                .filter(ee.Filter.inList(key_field, list(coefficients)))
+                .map(set_coefficients))
+
+    def __download(self):
+        table = (ee.FeatureCollection(self.__table_id)
+                 .select(['.*'], None, False))
+
+        size = table.size().getInfo()
+        coefficients = {}
+
+        for offset in range(0, size, PAGE_SIZE):
+            features = table.toList(PAGE_SIZE, offset).getInfo()
+
+            for feature in features:
+                properties = feature.get('properties', {})
+                coefficients.setdefault(properties.get(self.__key_field), properties)
+
+        return coefficients
+
+
+# indexes are shared by the whole process, so each table is read from the
+# cache once
+def get_coefficients_index(table_id, key_field=DEFAULT_KEY_FIELD):
+    if (table_id, key_field) not in __indexes:
+        __indexes[(table_id, key_field)] = CoefficientsIndex(table_id, key_field)
+
+    return __indexes[(table_id, key_field)]
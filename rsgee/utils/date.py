@@ -1,5 +1,21 @@
+import ast
+import operator
+import re
+
 import ee
 
+DATE_TEMPLATE_REGEX = re.compile(r'\((.+)\)')
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
 
 def parse_date(date_format, date_year):
     regex = '\\(.+\\)'
@@ -7,3 +23,55 @@ def parse_date(date_format, date_year):
     parsed_year = ee.Number.expression(expression, {'Y': date_year})
 
     return ee.Date(ee.String(date_format).replace(regex, parsed_year.format('%.0f')))
+
+
+# client-side counterpart of parse_date: templates like '(Y+1)-01-01' are
+# evaluated in python and returned as 'YYYY-MM-DD' strings, so the graph only
+# carries literal dates
+def compile_date(date_format, date_year):
+    match = DATE_TEMPLATE_REGEX.search(date_format)
+
+    if not match:
+        return date_format
+
+    parsed_year = _evaluate_year_expression(match.group(1), int(date_year))
+
+    return date_format[:match.start()] + str(parsed_year) + date_format[match.end():]
+
+
+def compile_period(period_start, period_end, year, offset=0):
+    years = range(int(year) - offset, int(year) + 1)
+
+    return [(compile_date(period_start, period_year), compile_date(period_end, period_year))
+            for period_year in years]
+
+
+def is_client_side(*values):
+    return all(isinstance(value, (str, int)) for value in values)
+
+
+def _evaluate_year_expression(expression, year):
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+
+        if isinstance(node, ast.Name) and node.id == 'Y':
+            return year
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return node.value
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](evaluate(node.operand))
+
+        raise ValueError(f'Unsupported date expression: {expression}')
+
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        raise ValueError(f'Unsupported date expression: {expression}')
+
+    return evaluate(tree)
@@ -0,0 +1,150 @@
+import math
+
+from rsgee.utils import geometry
+
+
+class ExportUnit:
+    # one or more regions exported together. Oversized regions are split in
+    # parts, each part being one export of the bounds it covers; undersized
+    # neighbors are packed in a single export.
+
+    def __init__(self, regions_ids, band_pixels, parts=None):
+        self.regions_ids = list(regions_ids)
+        self.band_pixels = band_pixels
+        self.parts = parts or []
+
+    def get_label(self):
+        if len(self.regions_ids) > 1:
+            return f'{self.regions_ids[0]}-pack{len(self.regions_ids)}'
+
+        return self.regions_ids[0]
+
+    # labels used in place of the region id in the filenames of the exports
+    def get_labels(self):
+        if self.parts:
+            return [label for label, _ in self.parts]
+
+        return [self.get_label()]
+
+    def is_split(self):
+        return bool(self.parts)
+
+    def is_packed(self):
+        return len(self.regions_ids) > 1
+
+    def to_manifest(self):
+        return {
+            'regions_ids': self.regions_ids,
+            'band_pixels': self.band_pixels,
+            'parts': {label: list(bounds) for label, bounds in self.parts},
+        }
+
+
+class ExportLayout:
+    # sizes the exports of a stage from the cached grid, so every task exports
+    # roughly the same number of pixels times bands
+
+    def __init__(self, grid_index, id_field, scale, bands_count,
+                 max_band_pixels=None, min_band_pixels=None):
+        self.__grid_index = grid_index
+        self.__id_field = id_field
+        self.__scale = scale
+        self.__bands_count = bands_count
+        self.__max_band_pixels = max_band_pixels
+        self.__min_band_pixels = min_band_pixels
+        self.units = self.__build_units()
+
+    def get_unit_by_region_id(self, region_id):
+        return self.__units_by_region_id[region_id]
+
+    def estimate_band_pixels(self, feature):
+        pixels = geometry.get_area(feature['geometry']) / self.__scale ** 2
+        return int(pixels * self.__bands_count)
+
+    def to_manifest(self):
+        return {unit.get_label(): unit.to_manifest() for unit in self.units}
+
+    def __build_units(self):
+        features = self.__grid_index.get_features()
+        sizes = {self.__get_id(feature): self.estimate_band_pixels(feature)
+                 for feature in features}
+
+        units = []
+        packed = set()
+
+        for feature in features:
+            region_id = self.__get_id(feature)
+
+            if region_id in packed:
+                continue
+
+            if self.__max_band_pixels and sizes[region_id] > self.__max_band_pixels:
+                units.append(self.__split(region_id, sizes[region_id]))
+            elif self.__min_band_pixels and sizes[region_id] < self.__min_band_pixels:
+                regions_ids = self.__pack(region_id, sizes, packed)
+                units.append(ExportUnit(
+                    regions_ids, sum(sizes[member] for member in regions_ids)))
+            else:
+                units.append(ExportUnit([region_id], sizes[region_id]))
+
+            packed.add(region_id)
+
+        self.__units_by_region_id = {region_id: unit
+                                     for unit in units
+                                     for region_id in unit.regions_ids}
+
+        return units
+
+    def __split(self, region_id, band_pixels):
+        parts_count = math.ceil(band_pixels / self.__max_band_pixels)
+        xmin, ymin, xmax, ymax = self.__grid_index.get_bounds_by_id(region_id)
+
+        # split in the most square grid of parts that has enough of them
+        columns = math.ceil(math.sqrt(parts_count))
+        rows = math.ceil(parts_count / columns)
+
+        width = (xmax - xmin) / columns
+        height = (ymax - ymin) / rows
+
+        parts = [
+            (f'{region_id}-part{row * columns + column}',
+             (xmin + column * width, ymin + row * height,
+              xmin + (column + 1) * width, ymin + (row + 1) * height))
+            for row in range(rows)
+            for column in range(columns)
+        ]
+
+        return ExportUnit([region_id], band_pixels, parts)
+
+    def __pack(self, region_id, sizes, packed):
+        # grows the pack through undersized neighbors, in grid order, until it
+        # is big enough or the next neighbor would make it too big
+        regions_ids = [region_id]
+        total = sizes[region_id]
+        position = 0
+
+        while position < len(regions_ids) and total < self.__min_band_pixels:
+            neighbors_ids = self.__grid_index.get_neighbors_ids(regions_ids[position])
+
+            for neighbor_id in neighbors_ids:
+                if (neighbor_id in packed or neighbor_id in regions_ids
+                        or sizes[neighbor_id] >= self.__min_band_pixels):
+                    continue
+
+                if self.__max_band_pixels and total + sizes[neighbor_id] > self.__max_band_pixels:
+                    continue
+
+                regions_ids.append(neighbor_id)
+                total += sizes[neighbor_id]
+
+                if total >= self.__min_band_pixels:
+                    break
+
+            position += 1
+
+        packed.update(regions_ids)
+
+        return regions_ids
+
+    def __get_id(self, feature):
+        return feature['properties'].get(self.__id_field)
@@ -0,0 +1,23 @@
+import hashlib
+import json
+from enum import Enum
+
+
+def get_name(value):
+    if isinstance(value, Enum):
+        return value.name
+
+    if hasattr(value, 'COLLECTION_NAME'):
+        return value.COLLECTION_NAME
+
+    if hasattr(value, '__qualname__'):
+        return f'{value.__module__}.{value.__qualname__}'
+
+    return str(value)
+
+
+# stable hash of a json-like description, enums, classes and functions (like
+# indexes, collections and processors in the settings) are hashed by name
+def hash_description(description):
+    encoded = json.dumps(description, sort_keys=True, default=get_name)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
@@ -0,0 +1,161 @@
+import math
+
+# pure python helpers over GeoJSON geometries, used to answer simple spatial
+# questions about cached grids without a round trip to Earth Engine
+
+# approximate length of one degree of latitude, in meters
+METERS_PER_DEGREE = 111320
+
+
+def get_polygons(geometry):
+    geometry_type = geometry['type']
+    coordinates = geometry['coordinates']
+
+    if geometry_type == 'Polygon':
+        return [coordinates]
+
+    if geometry_type == 'MultiPolygon':
+        return coordinates
+
+    if geometry_type == 'Point':
+        return [[[coordinates]]]
+
+    raise ValueError(f'Unsupported geometry type: {geometry_type}')
+
+
+def get_points(geometry):
+    return [point
+            for polygon in get_polygons(geometry)
+            for ring in polygon
+            for point in ring]
+
+
+def get_bounds(geometry):
+    points = get_points(geometry)
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def merge_bounds(bounds_list):
+    return (min(bounds[0] for bounds in bounds_list), min(bounds[1] for bounds in bounds_list),
+            max(bounds[2] for bounds in bounds_list), max(bounds[3] for bounds in bounds_list))
+
+
+def get_centroid(geometry):
+    area_sum = x_sum = y_sum = 0
+
+    for polygon in get_polygons(geometry):
+        ring = polygon[0]
+
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+            cross = x0 * y1 - x1 * y0
+            area_sum += cross
+            x_sum += (x0 + x1) * cross
+            y_sum += (y0 + y1) * cross
+
+    if area_sum == 0:
+        xmin, ymin, xmax, ymax = get_bounds(geometry)
+        return (xmin + xmax) / 2, (ymin + ymax) / 2
+
+    return x_sum / (3 * area_sum), y_sum / (3 * area_sum)
+
+
+# approximate area in square meters, projecting each polygon on a plane tangent
+# to its centroid latitude. Good enough to estimate the size of grid tiles.
+def get_area(geometry):
+    if geometry['type'] == 'Point':
+        return 0
+
+    area = 0
+
+    for polygon in get_polygons(geometry):
+        latitude = math.radians(get_centroid({'type': 'Polygon', 'coordinates': polygon})[1])
+        scale_x = METERS_PER_DEGREE * math.cos(latitude)
+
+        for position, ring in enumerate(polygon):
+            ring_area = abs(sum(
+                (x0 * y1 - x1 * y0)
+                for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1])
+            )) / 2 * scale_x * METERS_PER_DEGREE
+
+            area += ring_area if position == 0 else -ring_area
+
+    return area
+
+
+def bounds_intersect(bounds_a, bounds_b):
+    return not (bounds_a[2] < bounds_b[0] or bounds_b[2] < bounds_a[0]
+                or bounds_a[3] < bounds_b[1] or bounds_b[3] < bounds_a[1])
+
+
+def contains_point(geometry, point):
+    x, y = point
+
+    def in_ring(ring):
+        inside = False
+
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+            if (y0 > y) != (y1 > y) and x < (x1 - x0) * (y - y0) / (y1 - y0) + x0:
+                inside = not inside
+
+        return inside
+
+    for polygon in get_polygons(geometry):
+        if in_ring(polygon[0]) and not any(in_ring(hole) for hole in polygon[1:]):
+            return True
+
+    return False
+
+
+def intersects(geometry_a, geometry_b):
+    if not bounds_intersect(get_bounds(geometry_a), get_bounds(geometry_b)):
+        return False
+
+    if geometry_a['type'] == 'Point':
+        return contains_point(geometry_b, geometry_a['coordinates'])
+
+    if geometry_b['type'] == 'Point':
+        return contains_point(geometry_a, geometry_b['coordinates'])
+
+    edges_a = list(_get_edges(geometry_a))
+    edges_b = list(_get_edges(geometry_b))
+
+    if any(_segments_intersect(edge_a, edge_b) for edge_a in edges_a for edge_b in edges_b):
+        return True
+
+    # no crossing edges: either one polygon is inside the other or they are apart
+    return (contains_point(geometry_b, get_points(geometry_a)[0])
+            or contains_point(geometry_a, get_points(geometry_b)[0]))
+
+
+def _get_edges(geometry):
+    for polygon in get_polygons(geometry):
+        for ring in polygon:
+            yield from zip(ring, ring[1:] + ring[:1])
+
+
+def _segments_intersect(segment_a, segment_b):
+    (ax, ay), (bx, by) = segment_a
+    (cx, cy), (dx, dy) = segment_b
+
+    def orientation(px, py, qx, qy, rx, ry):
+        value = (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+        return (value > 0) - (value < 0)
+
+    def on_segment(px, py, qx, qy, rx, ry):
+        return min(px, rx) <= qx <= max(px, rx) and min(py, ry) <= qy <= max(py, ry)
+
+    o1 = orientation(ax, ay, bx, by, cx, cy)
+    o2 = orientation(ax, ay, bx, by, dx, dy)
+    o3 = orientation(cx, cy, dx, dy, ax, ay)
+    o4 = orientation(cx, cy, dx, dy, bx, by)
+
+    if o1 != o2 and o3 != o4:
+        return True
+
+    return ((o1 == 0 and on_segment(ax, ay, cx, cy, bx, by))
+            or (o2 == 0 and on_segment(ax, ay, dx, dy, bx, by))
+            or (o3 == 0 and on_segment(cx, cy, ax, ay, dx, dy))
+            or (o4 == 0 and on_segment(cx, cy, bx, by, dx, dy)))
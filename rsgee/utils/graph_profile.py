@@ -0,0 +1,110 @@
+import json
+from collections import Counter
+
+from ee import serializer
+
+# functions counted by name, the usual causes of slow or too large graphs
+COUNTED_FUNCTIONS = {
+    'iterate': lambda name: name.endswith('.iterate'),
+    'map': lambda name: name.endswith('.map'),
+    'join': lambda name: name.startswith('Join.'),
+}
+
+
+# size and complexity of the graph of an ee object. The compound encoding
+# shares identical subgraphs, so nodes counts the distinct invocations and
+# expanded_nodes the invocations of the tree they stand for. Subgraphs used
+# more than once are the duplicate_subgraphs, and bytes is the size of the
+# request sent to the Cloud API.
+def profile_graph(obj):
+    encoded = serializer.encode(obj, is_compound=True, for_cloud_api=False)
+    submitted = serializer.encode(obj, is_compound=True, for_cloud_api=True)
+
+    walker = _GraphWalker()
+    expanded_nodes, depth = walker.walk(encoded)
+
+    profile = {
+        'nodes': sum(walker.functions.values()),
+        'expanded_nodes': expanded_nodes,
+        'bytes': len(json.dumps(submitted, separators=(',', ':'))),
+        'depth': depth,
+        'duplicate_subgraphs': len([key for key, count in walker.references.items()
+                                    if count > 1 and walker.is_invocation(key)]),
+    }
+
+    for counted, matches in COUNTED_FUNCTIONS.items():
+        profile[counted] = sum(count for name, count in walker.functions.items() if matches(name))
+
+    profile['functions'] = walker.functions
+
+    return profile
+
+
+class _GraphWalker:
+    # walks the scope of a compound value once, in order, so every shared
+    # subgraph is measured once and its references reuse the measures
+
+    def __init__(self):
+        self.functions = Counter()
+        self.references = Counter()
+        self.__measures = {}
+        self.__invocations = set()
+
+    def walk(self, encoded):
+        if not (isinstance(encoded, dict) and encoded.get('type') == 'CompoundValue'):
+            return self.__measure(encoded)
+
+        for key, value in encoded['scope']:
+            self.__measures[key] = self.__measure(value)
+
+            if isinstance(value, dict) and value.get('type') == 'Invocation':
+                self.__invocations.add(key)
+
+        return self.__measure(encoded['value'])
+
+    def is_invocation(self, key):
+        return key in self.__invocations
+
+    # invocations of the expanded tree of a value and their depth
+    def __measure(self, value):
+        if isinstance(value, list):
+            return self.__measure_all(value)
+
+        if not isinstance(value, dict):
+            return 0, 0
+
+        value_type = value.get('type')
+
+        if value_type == 'ValueRef':
+            self.references[value['value']] += 1
+            return self.__measures[value['value']]
+
+        if value_type == 'Invocation':
+            if 'functionName' in value:
+                self.functions[value['functionName']] += 1
+                nodes, depth = self.__measure_all(value.get('arguments', {}).values())
+            else:
+                nodes, depth = self.__measure_all([value['function'], *value.get('arguments', {}).values()])
+
+            return nodes + 1, depth + 1
+
+        if value_type == 'Function':
+            return self.__measure(value['body'])
+
+        if value_type == 'Dictionary':
+            return self.__measure_all(value['value'].values())
+
+        if value_type in ('ArgumentRef', 'Date', 'Bytes'):
+            return 0, 0
+
+        return self.__measure_all(value.values())
+
+    def __measure_all(self, values):
+        nodes, depth = 0, 0
+
+        for value in values:
+            value_nodes, value_depth = self.__measure(value)
+            nodes += value_nodes
+            depth = max(depth, value_depth)
+
+        return nodes, depth
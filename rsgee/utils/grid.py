@@ -0,0 +1,71 @@
+import os
+
+import ee
+
+from rsgee.filter import evaluate_filter
+from rsgee.utils import cache, geometry
+from rsgee.utils.spatial_index import GridIndex
+
+__grids = {}
+__indexes = {}
+
+
+def load_grid(collection_id, refresh=False):
+    if collection_id in __grids and not refresh:
+        return __grids[collection_id]
+
+    path = os.path.join(cache.get_cache_directory('grids'),
+                        cache.get_cache_filename(collection_id))
+
+    features = None if refresh else cache.read_json(path)
+
+    if features is None:
+        features = ee.FeatureCollection(collection_id).getInfo()['features']
+        cache.write_json(path, features)
+
+    __grids[collection_id] = features
+
+    return features
+
+
+def load_grid_index(collection_id, id_field=None, api_filter=None):
+    key = (collection_id, id_field, repr(api_filter))
+
+    if key not in __indexes:
+        features = load_grid(collection_id)
+
+        if api_filter:
+            features = [feature for feature in features
+                        if evaluate_filter(api_filter, feature['properties'])]
+
+        __indexes[key] = GridIndex(features, id_field)
+
+    return __indexes[key]
+
+
+# local counterpart of FeatureCollection.init_grid_from_settings
+def load_grid_index_from_settings(settings, apply_api_filter=True):
+    api_filter = settings.GRID_FILTER if apply_api_filter else None
+
+    return load_grid_index(
+        settings.GRID_COLLECTION_ID, settings.GRID_FEATURE_ID_FIELD, api_filter)
+
+
+def get_feature_by_id(features, feature_id, id_field):
+    for feature in features:
+        if feature['properties'].get(id_field) == feature_id:
+            return feature
+
+    raise KeyError(f'Feature not found: {id_field} = {feature_id}')
+
+
+def get_intersecting_features(features, roi):
+    if isinstance(features, GridIndex):
+        return features.query_intersects(roi)
+
+    return [feature for feature in features
+            if geometry.intersects(feature['geometry'], roi)]
+
+
+def to_point(roi):
+    return {'type': 'Point', 'coordinates': list(geometry.get_centroid(roi))}
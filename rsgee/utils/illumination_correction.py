@@ -1,6 +1,7 @@
 import ee
 from math import pi
 from rsgee.utils.solar_position import get_solar_position
+from rsgee.utils.coefficients_index import get_coefficients_index
 
 #
 # def to apply the Sun-Canopy-Sensor + C (SCSc) correction method to Landsat images.
@@ -18,9 +19,16 @@ JOIN_FIELD = "LANDSAT_SCENE_ID"
 DEFAULT_BANDS = ["BLUE", "GREEN", "RED", "NIR", "SWIR1", "SWIR2"]
 
 
-def correctImage(originalImage, bandsToCorrect=DEFAULT_BANDS, useExportedCoeffs=True):
+# with a known scene id the coefficients come from the local copy of the table
+def correctImage(
+    originalImage, bandsToCorrect=DEFAULT_BANDS, useExportedCoeffs=True, sceneId=None
+):
 
-    if useExportedCoeffs and COEFFICIENTS:
+    if useExportedCoeffs and COEFFICIENTS and sceneId:
+        index = get_coefficients_index(COEFFICIENTS, JOIN_FIELD)
+        originalImage = originalImage.set(COEFFS_FIELD, index.get_feature(sceneId))
+
+    elif useExportedCoeffs and COEFFICIENTS:
         sceneId = originalImage.getString(JOIN_FIELD)
         coeffs = (
             ee.FeatureCollection(COEFFICIENTS)
@@ -33,9 +41,18 @@ def correctImage(originalImage, bandsToCorrect=DEFAULT_BANDS, useExportedCoeffs=
     return _correctImage(originalImage, bandsToCorrect, useExportedCoeffs)
 
 
-def correctCollection(collection, bandsToCorrect=DEFAULT_BANDS, useExportedCoeffs=True):
+def correctCollection(
+    collection,
+    bandsToCorrect=DEFAULT_BANDS,
+    useExportedCoeffs=True,
+    useCoefficientsIndex=False,
+):
+
+    if useExportedCoeffs and COEFFICIENTS and useCoefficientsIndex:
+        index = get_coefficients_index(COEFFICIENTS, JOIN_FIELD)
+        collection = index.join(collection, COEFFS_FIELD, fetch_scenes_ids=True)
 
-    if useExportedCoeffs and COEFFICIENTS:
+    elif useExportedCoeffs and COEFFICIENTS:
         collection = joinCoefficients(collection)
 
     correctedCollection = collection.map(
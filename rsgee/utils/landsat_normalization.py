@@ -2,6 +2,7 @@ import ee
 
 from rsgee.collections import Landsat5, Landsat7, Landsat8, Modis
 from rsgee.band import Band
+from rsgee.utils.coefficients_index import get_coefficients_index
 
 # import rsgee.utils.cloud as cloudLib
 
@@ -32,9 +33,9 @@ CFACTOR = 0.05
 
 MIN_PSINV_PIXELS_COUNT = 5000
 
-COEFFICIENTS = ee.FeatureCollection(
-    "users/agrosatelite_mapbiomas/BLARD/NORMALIZATION/COEFFICIENTS"
-)
+COEFFICIENTS_ID = "users/agrosatelite_mapbiomas/BLARD/NORMALIZATION/COEFFICIENTS"
+
+COEFFICIENTS = ee.FeatureCollection(COEFFICIENTS_ID)
 
 COEFFS_FIELD = "NORMALIZATION_COEFFICIENTS"
 JOIN_FIELD = "LANDSAT_SCENE_ID"
@@ -47,9 +48,12 @@ def get_normalized_collection(
     max_cloud_cover,
     bands=NORMALIZATION_BANDS,
     use_exported_coeffs=True,
+    use_coefficients_index=False,
 ):
     collection = get_landsat_collection(roi, start_date, end_date, max_cloud_cover)
-    return apply_normalization(collection, bands, use_exported_coeffs)
+    return apply_normalization(
+        collection, bands, use_exported_coeffs, use_coefficients_index
+    )
 
 
 def get_landsat_collection(
@@ -73,10 +77,12 @@ def get_landsat_collection(
     return collection
 
 
-def apply_normalization(collection, bands, use_exported_coeffs=True):
+def apply_normalization(
+    collection, bands, use_exported_coeffs=True, use_coefficients_index=False
+):
 
     if use_exported_coeffs and COEFFICIENTS:
-        collection = join_coefficients(collection)
+        collection = join_coefficients(collection, use_coefficients_index)
     else:
         collection = prepare_to_normalization(collection)
         use_exported_coeffs = False
@@ -89,9 +95,15 @@ def apply_normalization(collection, bands, use_exported_coeffs=True):
     return corrected_collection
 
 
-def join_coefficients(collection):
+# with the coefficients index the coefficients of the scenes of the collection
+# come from the local copy of the table, instead of a join in the graph
+def join_coefficients(collection, use_coefficients_index=False, scenes_ids=None):
     collection = ee.ImageCollection(collection)
 
+    if use_coefficients_index:
+        index = get_coefficients_index(COEFFICIENTS_ID, JOIN_FIELD)
+        return index.join(collection, COEFFS_FIELD, scenes_ids, fetch_scenes_ids=True)
+
     start_millis = collection.aggregate_min("system:time_start")
     start_millis = ee.List([start_millis, 0]).reduce(ee.Reducer.firstNonNull())
 
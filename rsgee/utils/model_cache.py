@@ -0,0 +1,69 @@
+import ee
+
+from rsgee.utils.fingerprint import hash_description
+
+
+class ModelCache:
+    # trained random forests stored as decision tree strings, so classification
+    # graphs can be rebuilt with decisionTreeEnsemble instead of training again.
+    # Trees are exported as a table to an assets directory, by a task of the
+    # run, so training never blocks the graph building.
+
+    TREE_PROPERTY = 'tree'
+
+    def __init__(self, settings, assets_directory):
+        if not assets_directory:
+            raise ValueError('An assets directory is required to cache models')
+
+        self.__settings = settings
+        self.__assets_directory = assets_directory.strip('/')
+        self.__samples_store_version = self.__get_samples_store_version()
+
+    # models trained on another feature space, with other parameters or
+    # with other samples are not compatible, so they are part of the name
+    def get_key(self, cluster):
+        settings = self.__settings
+
+        return hash_description({
+            'variables': settings.GENERATION_VARIABLES,
+            'trees': settings.CLASSIFICATION_TREES,
+            'seed': settings.SEED,
+            'sampling': {key: getattr(settings, key) for key in dir(settings)
+                         if key.startswith(('SAMPLING_', 'SAMPLES_', 'CLASSIFICATION_SHARE_'))},
+            'cluster': [str(member_id) for member_id in cluster],
+            'samples_store_version': self.__samples_store_version,
+        })
+
+    # the classifier of a cluster is named after its first region
+    def get_name(self, year, cluster):
+        return f'{self.__settings.NAME}_model_{year}_{cluster[0]}_{self.get_key(cluster)[:16]}'
+
+    def get_asset_id(self, name):
+        return f'{self.__assets_directory}/{name}'
+
+    def save(self, name, classifier):
+        trees = ee.List(ee.Classifier(classifier).explain().get('trees'))
+
+        features = trees.map(
+            lambda tree: ee.Feature(None, {self.TREE_PROPERTY: tree}))
+
+        return ee.batch.Export.table.toAsset(
+            collection=ee.FeatureCollection(features),
+            description=name,
+            assetId=self.get_asset_id(name),
+        )
+
+    def load(self, name):
+        trees = (ee.FeatureCollection(self.get_asset_id(name))
+                 .aggregate_array(self.TREE_PROPERTY))
+
+        return ee.Classifier.decisionTreeEnsemble(trees)
+
+    def __get_samples_store_version(self):
+        if not self.__settings.SAMPLES_STORE_DIRECTORY:
+            return None
+
+        # pyarrow is only needed by the sample store
+        from rsgee.local.samples import SampleStore
+
+        return SampleStore(self.__settings.SAMPLES_STORE_DIRECTORY).get_version()
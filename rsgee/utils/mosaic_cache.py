@@ -0,0 +1,83 @@
+import ee
+
+from rsgee.utils import date
+from rsgee.utils.fingerprint import get_name, hash_description
+
+
+class MosaicCache:
+    # content addressed cache of exported mosaics. The key only depends on what
+    # defines the mosaic pixels, so settings that generate the same mosaic
+    # (e.g. the sampling and classification settings of a crop) share entries.
+
+    def __init__(self, settings, assets_directory):
+        self.__settings = settings
+        self.__assets_directory = assets_directory.strip('/')
+        self.__cached_assets = None
+
+    def get_key(self, year, region_id):
+        settings = self.__settings
+        periods = settings.GENERATION_PERIODS
+
+        if isinstance(periods, dict):
+            periods = {
+                period_name: date.compile_period(
+                    *[date_format.strip() for date_format in interval.split(',')],
+                    year, settings.GENERATION_OFFSET)
+                for period_name, interval in periods.items()}
+
+        description = {
+            'collection': get_name(settings.IMAGE_COLLECTION),
+            'generator': get_name(settings.GENERATOR_CLASS),
+            'grid': settings.GRID_COLLECTION_ID,
+            'region_id': region_id,
+            'year': year,
+            'periods': periods,
+            'offset': settings.GENERATION_OFFSET,
+            'max_cloud_cover': settings.GENERATION_MAX_CLOUD_COVER,
+            'images_limit': settings.GENERATION_IMAGES_LIMIT,
+            'use_scene_inventory': settings.GENERATION_USE_SCENE_INVENTORY,
+            'bands': settings.GENERATION_BANDS,
+            'indexes': settings.GENERATION_INDEXES,
+            'extra_indexes': settings.GENERATION_EXTRA_INDEXES,
+            'indexes_params': settings.GENERATION_INDEXES_PARAMS,
+            'reducers': settings.GENERATION_REDUCERS,
+            'variables': settings.GENERATION_VARIABLES,
+            'scaling_factors': settings.GENERATION_SCALING_FACTORS,
+            'apply_brdf': settings.GENERATION_APPLY_BRDF,
+            'apply_illumination_correction': settings.GENERATION_APPLY_ILLUMINATION_CORRECTION,
+            'apply_cloud_and_shadow_mask': settings.GENERATION_APPLY_CLOUD_AND_SHADOW_MASK,
+            'buffer': settings.GENERATION_BUFFER,
+            'use_geometry_centroid': settings.GENERATION_USE_GEOMETRY_CENTROID,
+            'additional_data': settings.GENERATION_ADDITIONAL_DATA,
+            # mosaics are exported to the cache at the scale of the settings
+            'scale': settings.EXPORT_SCALE,
+        }
+
+        return hash_description(description)
+
+    def get_asset_id(self, year, region_id):
+        key = self.get_key(year, region_id)
+        return f'{self.__assets_directory}/{self.get_asset_name(year, region_id, key)}'
+
+    @staticmethod
+    def get_asset_name(year, region_id, key):
+        return f'mosaic_{year}_{region_id}_{key[:16]}'
+
+    def contains(self, asset_id):
+        if self.__cached_assets is None:
+            self.__cached_assets = self.__list_cached_assets()
+
+        return asset_id.split('/')[-1] in self.__cached_assets
+
+    def load(self, asset_id):
+        return ee.Image(asset_id)
+
+    def __list_cached_assets(self):
+        # one listing per run, instead of one asset lookup per cell
+        try:
+            assets = ee.data.getList({'id': self.__assets_directory})
+        except ee.EEException:
+            return set()
+
+        return {asset['id'].split('/')[-1] for asset in assets}
+
@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import ee
+
+from rsgee.utils import cache, geometry
+
+INVENTORY_FILENAME = 'inventory.sqlite'
+
+# images requested by getInfo, below its limit of elements
+PAGE_SIZE = 5000
+
+# scenes are ingested up to weeks after their acquisition and out of order
+# across path/rows, so each refresh fetches again the scenes acquired in the
+# days before the last fetch
+INGESTION_DELAY = timedelta(days=60)
+
+# metadata of Landsat collection 1 stored by column, missing properties are
+# stored as null
+PROPERTIES = {
+    'scene_id': 'LANDSAT_SCENE_ID',
+    'path': 'WRS_PATH',
+    'row': 'WRS_ROW',
+    'cloud_cover': 'CLOUD_COVER',
+    'cloud_cover_land': 'CLOUD_COVER_LAND',
+    'spacecraft': 'SPACECRAFT_ID',
+}
+
+CLOUD_COVER_COLUMNS = {
+    'CLOUD_COVER': 'cloud_cover',
+    'CLOUD_COVER_LAND': 'cloud_cover_land',
+}
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS scenes (
+        collection TEXT NOT NULL,
+        image_index TEXT NOT NULL,
+        scene_id TEXT,
+        path INTEGER,
+        row INTEGER,
+        time_start INTEGER,
+        cloud_cover REAL,
+        cloud_cover_land REAL,
+        spacecraft TEXT,
+        footprint TEXT,
+        xmin REAL, ymin REAL, xmax REAL, ymax REAL,
+        PRIMARY KEY (collection, image_index))''',
+    '''CREATE INDEX IF NOT EXISTS scenes_by_date
+        ON scenes (collection, time_start)''',
+    '''CREATE INDEX IF NOT EXISTS scenes_by_pathrow
+        ON scenes (collection, path, row, time_start)''',
+    '''CREATE TABLE IF NOT EXISTS fetched_years (
+        collection TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        PRIMARY KEY (collection, year))''',
+]
+
+
+class SceneInventory:
+    # local index of the metadata of the images of a collection (scene id,
+    # WRS path/row, date, cloud cover, spacecraft and footprint) in a sqlite
+    # file of the cache. Years are fetched once all of their scenes can be
+    # ingested, before that the images acquired since INGESTION_DELAY before
+    # the last fetch are fetched again, so the scenes of a cell are known
+    # without a size().getInfo() and graphs can filter explicit image lists.
+
+    def __init__(self, path=None):
+        self.__path = path or os.path.join(cache.get_cache_directory('scenes'), INVENTORY_FILENAME)
+        self.__connection = sqlite3.connect(self.__path)
+        self.__refreshed = set()
+
+        for statement in SCHEMA:
+            self.__connection.execute(statement)
+
+    def close(self):
+        self.__connection.close()
+
+    def refresh(self, collection_id, years, force=False):
+        fetched = self.get_fetched_years(collection_id)
+
+        for year in sorted(set(years)):
+            # each year is refreshed once by an inventory instance
+            if (collection_id, year) in self.__refreshed and not force:
+                continue
+
+            self.__refreshed.add((collection_id, year))
+
+            since = None
+
+            if year in fetched and not force:
+                since = fetched[year] - INGESTION_DELAY
+
+                # years fetched once all of their scenes were ingested are
+                # complete
+                if since >= datetime(year + 1, 1, 1, tzinfo=timezone.utc):
+                    continue
+
+            self.__fetch(collection_id, year, since)
+
+    # time of the last fetch of each year
+    def get_fetched_years(self, collection_id):
+        rows = self.__connection.execute(
+            'SELECT year, fetched_at FROM fetched_years WHERE collection = ?', (collection_id,))
+
+        return {year: datetime.fromtimestamp(fetched_at, tz=timezone.utc) for year, fetched_at in rows}
+
+    # scenes of the collection intersecting a GeoJSON geometry within any of
+    # the periods, [(start, end)] dates as 'YYYY-MM-DD' (end exclusive, as
+    # filterDate), ordered by date
+    def query(self, collection_id, roi=None, periods=None, max_cloud_cover=None,
+              cloud_cover_field='cloud_cover', path=None, row=None):
+        conditions = ['collection = ?']
+        params = [collection_id]
+
+        if periods:
+            conditions.append('(' + ' OR '.join(['(time_start >= ? AND time_start < ?)'] * len(periods)) + ')')
+
+            for start, end in periods:
+                params.extend([_to_millis(start), _to_millis(end)])
+
+        if max_cloud_cover is not None:
+            conditions.append(f'{_get_column(cloud_cover_field)} < ?')
+            params.append(max_cloud_cover)
+
+        if path is not None and row is not None:
+            conditions.append('path = ? AND row = ?')
+            params.extend([path, row])
+
+        if roi is not None:
+            xmin, ymin, xmax, ymax = geometry.get_bounds(roi)
+            conditions.append('xmax >= ? AND xmin <= ? AND ymax >= ? AND ymin <= ?')
+            params.extend([xmin, xmax, ymin, ymax])
+
+        cursor = self.__connection.execute(
+            'SELECT image_index, scene_id, path, row, time_start, cloud_cover, cloud_cover_land, '
+            'spacecraft, footprint FROM scenes WHERE {0} ORDER BY time_start, image_index'.format(
+                ' AND '.join(conditions)), params)
+
+        columns = [description[0] for description in cursor.description]
+        scenes = [dict(zip(columns, values)) for values in cursor]
+
+        if roi is not None:
+            scenes = [scene for scene in scenes
+                      if scene['footprint'] and geometry.intersects(_to_polygon(json.loads(scene['footprint'])), roi)]
+
+        return scenes
+
+    # system:index of the scenes, at most images_limit of them with the lowest
+    # cloud cover, as limit(images_limit, cloud_cover_field)
+    def get_images_indexes(self, collection_id, roi=None, periods=None, max_cloud_cover=None,
+                           images_limit=None, cloud_cover_field='cloud_cover'):
+        scenes = self.query(collection_id, roi, periods, max_cloud_cover, cloud_cover_field)
+
+        if images_limit:
+            field = _get_column(cloud_cover_field)
+            scenes = sorted(scenes, key=lambda scene: (scene[field] is None, scene[field]))[:images_limit]
+
+        return [scene['image_index'] for scene in scenes]
+
+    def count(self, collection_id, roi=None, periods=None, max_cloud_cover=None,
+              cloud_cover_field='cloud_cover'):
+        return len(self.query(collection_id, roi, periods, max_cloud_cover, cloud_cover_field))
+
+    def __fetch(self, collection_id, year, since=None):
+        collection = ee.ImageCollection(collection_id).filterDate(f'{year}-01-01', f'{year + 1}-01-01')
+
+        if since is not None:
+            collection = collection.filter(ee.Filter.gte('system:time_start', int(since.timestamp() * 1000)))
+
+        def to_feature(image):
+            return ee.Feature(None, image.toDictionary(list(PROPERTIES.values()))).set({
+                'image_index': image.get('system:index'),
+                'time_start': image.get('system:time_start'),
+                'footprint': image.get('system:footprint'),
+            })
+
+        features = ee.FeatureCollection(collection.map(to_feature))
+        size = features.size().getInfo()
+
+        for offset in range(0, size, PAGE_SIZE):
+            page = features.toList(PAGE_SIZE, offset).getInfo()
+            self.__insert(collection_id, [feature['properties'] for feature in page])
+
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO fetched_years (collection, year, fetched_at) VALUES (?, ?, ?)',
+            (collection_id, year, int(datetime.now(timezone.utc).timestamp())))
+
+        self.__connection.commit()
+
+    def __insert(self, collection_id, scenes):
+        rows = []
+
+        for scene in scenes:
+            footprint = scene.get('footprint')
+            bounds = geometry.get_bounds(_to_polygon(footprint)) if footprint else (None, None, None, None)
+
+            rows.append((
+                collection_id, scene['image_index'],
+                *[scene.get(PROPERTIES[column]) for column in ('scene_id', 'path', 'row')],
+                scene.get('time_start'),
+                *[scene.get(PROPERTIES[column]) for column in ('cloud_cover', 'cloud_cover_land', 'spacecraft')],
+                json.dumps(footprint) if footprint else None,
+                *bounds))
+
+        self.__connection.executemany(
+            'INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+# id of a collection loaded by id, None for merged or computed collections
+def get_collection_id(collection):
+    return (getattr(collection, 'args', None) or {}).get('id')
+
+
+# years of the images of some periods, [(start, end)] dates as 'YYYY-MM-DD'
+def get_periods_years(periods):
+    return sorted({year
+                   for start, end in periods
+                   for year in range(int(start[:4]), int(end[:4]) + 1)})
+
+
+def _get_column(cloud_cover_field):
+    column = CLOUD_COVER_COLUMNS.get(cloud_cover_field, cloud_cover_field)
+
+    if column not in CLOUD_COVER_COLUMNS.values():
+        raise ValueError(f'Unknown cloud cover field: {cloud_cover_field}')
+
+    return column
+
+
+def _to_polygon(footprint):
+    if footprint['type'] == 'LinearRing':
+        return {'type': 'Polygon', 'coordinates': [footprint['coordinates']]}
+
+    return footprint
+
+
+def _to_millis(date):
+    date = datetime.strptime(date[:10], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
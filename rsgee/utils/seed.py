@@ -0,0 +1,11 @@
+import hashlib
+
+MAX_SEED = 2 ** 31 - 1
+
+
+# derives a stable seed from any sequence of keys, e.g. (settings name, year,
+# region id, stage, run seed), so a regenerated graph is identical to the
+# previous one while different cells still get different random streams
+def derive_seed(*keys):
+    encoded = '/'.join(str(key) for key in keys).encode('utf-8')
+    return int(hashlib.sha256(encoded).hexdigest(), 16) % MAX_SEED
@@ -0,0 +1,134 @@
+import math
+from collections import defaultdict
+
+from rsgee.utils import geometry
+from rsgee.utils.geometry import METERS_PER_DEGREE
+
+
+class GridIndex:
+    # hash grid over the bounding boxes of a list of GeoJSON features. Grid
+    # tiles have similar sizes, so bucketing them by a cell close to the tile
+    # size answers bounds queries looking at a handful of candidates.
+
+    def __init__(self, features, id_field=None, cell_size=None):
+        self.__features = list(features)
+        self.__id_field = id_field
+        self.__bounds = [geometry.get_bounds(feature['geometry'])
+                         for feature in self.__features]
+        self.__cell_size = cell_size or self.__get_default_cell_size()
+        self.__cells = defaultdict(list)
+        self.__ids = {}
+        self.__pathrows = {}
+
+        for position, (feature, bounds) in enumerate(zip(self.__features, self.__bounds)):
+            for cell in self.__get_cells(bounds):
+                self.__cells[cell].append(position)
+
+            properties = feature['properties']
+
+            if id_field:
+                self.__ids[properties.get(id_field)] = position
+
+            if 'PATH' in properties and 'ROW' in properties:
+                self.__pathrows[(int(properties['PATH']), int(properties['ROW']))] = position
+
+    def __len__(self):
+        return len(self.__features)
+
+    def get_features(self):
+        return self.__features
+
+    def get_by_id(self, feature_id):
+        return self.__features[self.__ids[feature_id]]
+
+    def get_bounds_by_id(self, feature_id):
+        return self.__bounds[self.__ids[feature_id]]
+
+    def get_by_pathrow(self, path, row):
+        position = self.__pathrows.get((path, row))
+        return None if position is None else self.__features[position]
+
+    def query_bounds(self, bounds):
+        positions = {position
+                     for cell in self.__get_cells(bounds)
+                     for position in self.__cells.get(cell, [])}
+
+        return [self.__features[position] for position in sorted(positions)
+                if geometry.bounds_intersect(self.__bounds[position], bounds)]
+
+    def query_intersects(self, roi):
+        candidates = self.query_bounds(geometry.get_bounds(roi))
+        return [feature for feature in candidates
+                if geometry.intersects(feature['geometry'], roi)]
+
+    def get_neighbors(self, feature_id, distance=0):
+        feature = self.get_by_id(feature_id)
+
+        if distance:
+            bounds = buffer_bounds(self.get_bounds_by_id(feature_id), distance)
+            return self.query_bounds(bounds)
+
+        return self.query_intersects(feature['geometry'])
+
+    def get_neighbors_ids(self, feature_id, distance=0):
+        return [feature['properties'].get(self.__id_field)
+                for feature in self.get_neighbors(feature_id, distance)]
+
+    # groups features greedily, in grid order, with their unassigned neighbors
+    # up to max_size features per cluster
+    def get_clusters(self, distance=0, max_size=None):
+        assigned = set()
+        clusters = []
+
+        for feature in self.__features:
+            feature_id = feature['properties'].get(self.__id_field)
+
+            if feature_id in assigned:
+                continue
+
+            cluster = [feature_id]
+
+            for neighbor_id in self.get_neighbors_ids(feature_id, distance):
+                if max_size and len(cluster) >= max_size:
+                    break
+
+                if neighbor_id not in assigned and neighbor_id not in cluster:
+                    cluster.append(neighbor_id)
+
+            assigned.update(cluster)
+            clusters.append(cluster)
+
+        return clusters
+
+    def get_pathrow_neighbors(self, path, row):
+        neighbors = [self.get_by_pathrow(path + offset_path, row + offset_row)
+                     for offset_path in range(-1, 2)
+                     for offset_row in range(-1, 2)]
+
+        return [feature for feature in neighbors if feature]
+
+    def __get_default_cell_size(self):
+        if not self.__bounds:
+            return 1
+
+        sizes = sorted(max(bounds[2] - bounds[0], bounds[3] - bounds[1])
+                       for bounds in self.__bounds)
+
+        return sizes[len(sizes) // 2] or 1
+
+    def __get_cells(self, bounds):
+        xmin, ymin, xmax, ymax = [math.floor(value / self.__cell_size) for value in bounds]
+
+        return [(x, y) for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+
+
+# expands geographic bounds by a distance in meters, the longitude expansion is
+# corrected by the latitude farthest from the equator, so the result always
+# covers the buffered geometry
+def buffer_bounds(bounds, distance):
+    latitude = min(max(abs(bounds[1]), abs(bounds[3])), 89)
+
+    dy = distance / METERS_PER_DEGREE
+    dx = dy / math.cos(math.radians(latitude))
+
+    return bounds[0] - dx, bounds[1] - dy, bounds[2] + dx, bounds[3] + dy
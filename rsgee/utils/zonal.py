@@ -0,0 +1,41 @@
+import ee
+
+
+def get_area_band_name(year, class_value):
+    return f'area_{year}_{class_value}'
+
+
+# one band of pixel areas per (year, class), so the areas of every year and
+# class are summed by zone in a single reduceRegions
+def build_area_image(images_by_year, classes, area_unit=10000):
+    pixel_area = ee.Image.pixelArea().divide(area_unit)
+
+    bands = [
+        pixel_area
+        .updateMask(ee.Image(image).eq(class_value))
+        .rename(get_area_band_name(year, class_value))
+        for year, image in sorted(images_by_year.items())
+        for class_value in classes
+    ]
+
+    return ee.Image.cat(bands)
+
+
+def get_zonal_areas(images_by_year, zones, zone_field, classes, scale=30, tile_scale=4, area_unit=10000):
+    area_image = build_area_image(images_by_year, classes, area_unit)
+
+    columns = [get_area_band_name(year, class_value)
+               for year in sorted(images_by_year)
+               for class_value in classes]
+
+    areas = area_image.reduceRegions(
+        collection=ee.FeatureCollection(zones),
+        reducer=ee.Reducer.sum(),
+        scale=scale,
+        tileScale=tile_scale)
+
+    # one band reduced by reduceRegions keeps the 'sum' column name
+    if len(columns) == 1:
+        areas = areas.map(lambda feature: feature.set(columns[0], feature.get('sum')))
+
+    return areas.select([zone_field, *columns], None, False)
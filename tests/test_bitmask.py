@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from rsgee.collections import Landsat5, Landsat7, Landsat8
+from rsgee.local import bitmask
+
+COLLECTIONS = [Landsat5.TOA, Landsat7.TOA, Landsat8.TOA]
+
+
+# the Earth Engine expressions of rsgee.utils.bitmask evaluated for a single
+# quality value: bitwiseAnd(bitmasks).eq(bitmasks) reduced with anyNonZero or
+# allNonZero, and the max of the scored masks and of the valid pixel score
+def get_expected_mask(value, bitmasks, reducer='or', reverse=False):
+    reduce = {'and': all, 'or': any}[reducer]
+    mask = reduce([(value & bitmask) == bitmask for bitmask in bitmasks])
+    return not mask if reverse else mask
+
+
+def get_expected_score(value, bitmasks_scores):
+    return max([1, *[score * get_expected_mask(value, bitmasks)
+                     for score, bitmasks in bitmasks_scores.items()]])
+
+
+@pytest.mark.parametrize('collection', COLLECTIONS)
+@pytest.mark.parametrize('reducer', ['and', 'or'])
+def test_mask_parity(collection, reducer):
+    bitmasks = collection.get_bitmasks(collection.CLOUD_AND_SHADOW_BITMASKS)
+    values = np.arange(bitmask.QA_VALUES_COUNT)
+
+    for reverse in [False, True]:
+        lut = bitmask.get_mask_from_bitmask_list(values, bitmasks, reducer, reverse)
+        expected = [get_expected_mask(value, bitmasks, reducer, reverse) for value in range(len(values))]
+
+        assert lut.tolist() == expected
+
+
+@pytest.mark.parametrize('collection', COLLECTIONS)
+def test_score_parity(collection):
+    bitmasks_scores = {score: collection.get_bitmasks(names)
+                       for score, names in collection.DEFAULT_QA_SCORES.items()}
+    values = np.arange(bitmask.QA_VALUES_COUNT)
+
+    scores = bitmask.score_quality_band(values, collection)
+    expected = [get_expected_score(value, bitmasks_scores) for value in range(len(values))]
+
+    assert scores.tolist() == expected
+
+
+# Landsat 8 BQA values of the USGS documentation
+@pytest.mark.parametrize('value, kept, score', [
+    (1, True, 1),        # designated fill
+    (2720, True, 1),     # clear, low confidences
+    (2752, False, 1),    # medium cloud confidence
+    (2800, False, 6),    # cloud, high confidence
+    (2976, False, 5),    # high cloud shadow confidence
+    (3744, True, 2),     # high snow and ice confidence
+    (6816, False, 4),    # high cirrus confidence
+])
+def test_landsat_8_golden_values(value, kept, score):
+    quality_band = np.array([value], dtype=np.uint16)
+
+    assert bitmask.get_clouds_and_shadows_mask(quality_band, Landsat8.TOA).tolist() == [kept]
+    assert bitmask.score_quality_band(quality_band, Landsat8.TOA).tolist() == [score]
+
+
+def test_masked_pixels_stay_masked():
+    quality_band = np.ma.MaskedArray([2720, 2800], mask=[False, True])
+    mask = bitmask.get_clouds_and_shadows_mask(quality_band, Landsat8.TOA)
+
+    assert np.ma.getmaskarray(mask).tolist() == [False, True]
+    assert mask[0]
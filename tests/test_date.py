@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+# rsgee.utils.blard is imported by the collections
+import rsgee.collections  # noqa: F401
+from rsgee.utils import blard, date
+
+
+@pytest.mark.parametrize('date_format, year, expected', [
+    ('2020-01-01', 2018, '2020-01-01'),
+    ('(Y)-01-01', 2018, '2018-01-01'),
+    ('(Y+1)-03-31', 2018, '2019-03-31'),
+    ('(Y-1)-10-01', '2018', '2017-10-01'),
+    ('(Y - 2 * 1)-06-30', 2018, '2016-06-30'),
+])
+def test_compile_date(date_format, year, expected):
+    assert date.compile_date(date_format, year) == expected
+
+
+@pytest.mark.parametrize('expression', ['Y**2', 'Y/2', 'X+1', 'Y+1.5', '__import__("os")', 'Y+'])
+def test_unsupported_year_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        date.compile_date(f'({expression})-01-01', 2018)
+
+
+def test_period_offset_adds_the_previous_years():
+    assert date.compile_period('(Y)-01-01', '(Y)-12-31', 2018, offset=2) == [
+        ('2016-01-01', '2016-12-31'),
+        ('2017-01-01', '2017-12-31'),
+        ('2018-01-01', '2018-12-31'),
+    ]
+
+
+def test_period_crossing_into_the_next_year():
+    assert date.compile_period('(Y)-10-01', '(Y+1)-03-31', 2018) == [('2018-10-01', '2019-03-31')]
+    assert date.compile_period('(Y)-10-01', '(Y+1)-03-31', 2018, offset=1) == [
+        ('2017-10-01', '2018-03-31'),
+        ('2018-10-01', '2019-03-31'),
+    ]
+
+
+# the windows of getIntervals: starts at the days of year 1, 17, ..., 353 (a
+# day of year 0 being January 1st), ends at the next start and the last one at
+# the last day of the year
+def get_expected_intervals(year):
+    first_day = datetime.datetime(year, 1, 1)
+    last_doy = (datetime.datetime(year, 12, 31) - first_day).days
+
+    return [(index + 1,
+             first_day + datetime.timedelta(days=1 + 16 * index),
+             first_day + datetime.timedelta(days=17 + 16 * index if index < 22 else last_doy))
+            for index in range(23)]
+
+
+@pytest.mark.parametrize('year', [2019, 2020])
+def test_client_intervals_of_a_year(year):
+    intervals = blard.get_client_intervals(f'{year}-01-01', f'{year}-12-31')
+
+    assert len(intervals) == 23
+    assert intervals == get_expected_intervals(year)
+
+
+def test_client_intervals_are_within_the_dates():
+    intervals = blard.get_client_intervals('2019-03-01', '2020-02-15')
+    expected = [interval for year in [2019, 2020] for interval in get_expected_intervals(year)
+                if interval[1] >= datetime.datetime(2019, 3, 1)
+                and interval[2] <= datetime.datetime(2020, 2, 16)]
+
+    assert intervals == expected
+    assert [index for index, *_ in intervals][:2] == [5, 6]
+    assert intervals[-1][0] == 2
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from rsgee import export
+from rsgee.settings import DefaultSettings, SettingsManager as sm
+from rsgee.utils import geometry
+from rsgee.utils.export_layout import ExportLayout
+from rsgee.utils.spatial_index import GridIndex
+
+# 1000 m pixels of a single band, a 0.1 degree square at the equator has about
+# 123 of them and a 1 degree square about 12300
+SCALE = 1000
+
+
+def get_square(region_id, x, y=0, size=0.1):
+    xmax, ymax = round(x + size, 6), round(y + size, 6)
+
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Polygon', 'coordinates': [
+            [[x, y], [xmax, y], [xmax, ymax], [x, ymax], [x, y]]]},
+        'properties': {'PATHROW': region_id},
+    }
+
+
+# a row of 6 small neighbor regions, a small region far from them and a big one
+def get_features():
+    return [
+        *[get_square(region_id, round(region_id * 0.1, 1)) for region_id in range(1, 7)],
+        get_square(7, 10),
+        get_square(8, 20, size=1),
+    ]
+
+
+def get_layout(features, max_band_pixels=None, min_band_pixels=None):
+    return ExportLayout(GridIndex(features, 'PATHROW'), 'PATHROW', SCALE, 1,
+                        max_band_pixels, min_band_pixels)
+
+
+def get_rectangle_area(bounds):
+    xmin, ymin, xmax, ymax = bounds
+    return (xmax - xmin) * (ymax - ymin)
+
+
+def test_split_parts_cover_the_region_bounds():
+    layout = get_layout(get_features(), max_band_pixels=3000)
+    unit = layout.get_unit_by_region_id(8)
+    bounds = geometry.get_bounds(get_features()[-1]['geometry'])
+
+    parts = [part_bounds for _, part_bounds in unit.parts]
+
+    assert unit.is_split() and len(parts) >= unit.band_pixels / 3000
+    assert unit.get_labels() == [f'8-part{index}' for index in range(len(parts))]
+
+    assert min(part[0] for part in parts) == pytest.approx(bounds[0])
+    assert min(part[1] for part in parts) == pytest.approx(bounds[1])
+    assert max(part[2] for part in parts) == pytest.approx(bounds[2])
+    assert max(part[3] for part in parts) == pytest.approx(bounds[3])
+
+    # parts do not overlap, so covering the area of the bounds they tile it
+    assert sum(get_rectangle_area(part) for part in parts) == pytest.approx(get_rectangle_area(bounds))
+
+    for index, part in enumerate(parts):
+        for other in parts[index + 1:]:
+            assert (min(part[2], other[2]) - max(part[0], other[0]) <= 1e-9
+                    or min(part[3], other[3]) - max(part[1], other[1]) <= 1e-9)
+
+
+def test_packs_hold_neighbors_within_the_pixels_budget():
+    features = get_features()
+    grid_index = GridIndex(features, 'PATHROW')
+    layout = get_layout(features, max_band_pixels=400, min_band_pixels=300)
+
+    packs = [unit for unit in layout.units if unit.is_packed()]
+
+    assert [unit.regions_ids for unit in packs] == [[1, 2, 3], [4, 5, 6]]
+    assert layout.get_unit_by_region_id(7).regions_ids == [7]
+    assert layout.get_unit_by_region_id(8).is_split()
+
+    for unit in packs:
+        assert 300 <= unit.band_pixels <= 400
+        assert unit.band_pixels == sum(layout.estimate_band_pixels(grid_index.get_by_id(region_id))
+                                       for region_id in unit.regions_ids)
+
+        for position, region_id in enumerate(unit.regions_ids[1:], 1):
+            neighbors_ids = grid_index.get_neighbors_ids(region_id)
+            assert any(member_id in neighbors_ids for member_id in unit.regions_ids[:position])
+
+
+def test_labels_are_stable_across_runs():
+    layouts = [get_layout(get_features(), max_band_pixels=3000, min_band_pixels=300)
+               for _ in range(2)]
+
+    assert layouts[0].to_manifest() == layouts[1].to_manifest()
+    assert [unit.get_labels() for unit in layouts[0].units] == [
+        ['1-pack3'], ['4-pack3'], [7], [f'8-part{index}' for index in range(6)]]
+
+
+def test_packed_manifest_round_trips_band_names(monkeypatch):
+    class Settings(DefaultSettings):
+        NAME = 'test'
+
+    monkeypatch.setattr(sm, 'settings', Settings)
+
+    bands = ['blue_median', 'ndvi_median']
+    manifest = export.get_packed_manifest([2020, 2021], bands, 5, 'mosaic')
+
+    # manifests are stored as json, in the cache and in the image properties
+    loaded = json.loads(json.dumps(manifest))
+
+    assert loaded['bands'] == bands
+    assert loaded['filenames'] == {'2020': 'test_2020_5_mosaic', '2021': 'test_2021_5_mosaic'}
+    assert export.get_packed_band_names(loaded, 2020) == ['Y2020_blue_median', 'Y2020_ndvi_median']
+
+    packed_bands = [band for year in loaded['years'] for band in export.get_packed_band_names(loaded, year)]
+
+    assert len(set(packed_bands)) == len(packed_bands)
+    assert all(export.get_packed_band_names(manifest, year) == export.get_packed_band_names(loaded, year)
+               for year in manifest['years'])
@@ -0,0 +1,192 @@
+import sqlite3
+
+import ee
+import pytest
+
+from rsgee.db import DatabaseManager
+from rsgee.db.models import Task
+from rsgee.planner import IncrementalPlanner
+from rsgee.preflight import Preflight
+from rsgee.settings import DefaultSettings, SettingsManager as sm
+from rsgee.taskmanager import SKIPPED, TaskManager
+from rsgee.utils import grid
+
+State = ee.batch.Task.State
+
+GRID_ID = 'users/test/planner_grid'
+ASSET_ID = 'projects/earthengine-legacy/assets/users/test/mosaic'
+
+
+def get_square(region_id, x):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Polygon', 'coordinates': [[[x, 0], [x + 1, 0], [x + 1, 1], [x, 1], [x, 0]]]},
+        'properties': {'PATHROW': region_id},
+    }
+
+
+class Generator:
+    pass
+
+
+class Settings(DefaultSettings):
+    NAME = 'test'
+    YEARS = [2020]
+    GRID_COLLECTION_ID = GRID_ID
+    GENERATOR_CLASS = Generator
+
+
+class FakeTask:
+
+    def __init__(self, code, asset_id=None):
+        self.config = {'description': code}
+
+        if asset_id:
+            self.config['assetExportOptions'] = {'earthEngineDestination': {'name': asset_id}}
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(grid, 'load_grid', lambda collection_id: [get_square(1, 0), get_square(2, 1)])
+    monkeypatch.setattr(ee.data, 'getInfo', lambda asset_id: {'updateTime': '2021-01-01'})
+    monkeypatch.setattr(sm, 'settings', Settings)
+
+    return Settings
+
+
+@pytest.fixture
+def session(tmp_path):
+    database = DatabaseManager({'ENGINE': 'sqlite', 'USER': '', 'PASSWORD': '', 'HOST': '',
+                                'PORT': 0, 'NAME': tmp_path / 'tasks.db'})
+    database.upgrade()
+
+    session = database.get_session()
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def deleted_assets(monkeypatch):
+    deleted = []
+    monkeypatch.setattr(ee.data, 'deleteAsset', deleted.append)
+
+    return deleted
+
+
+def add_task(session, code, state, fingerprint):
+    session.add(Task(code=code, state=state, fingerprint=fingerprint))
+    session.commit()
+
+
+def test_changed_cell_is_rebuilt(settings, session, deleted_assets):
+    planner = IncrementalPlanner(session, settings)
+    fingerprint = planner.plan().fingerprints['test_2020_1_mosaic']
+
+    add_task(session, 'test_2020_1_mosaic', State.COMPLETED, 'old')
+    plan = planner.plan()
+
+    assert (2020, 1) in plan.changed
+    assert 'test_2020_1_mosaic' not in plan.skipped_codes
+
+    TaskManager(session, settings).add_task(FakeTask('test_2020_1_mosaic', ASSET_ID), fingerprint)
+    task = session.query(Task).filter_by(code='test_2020_1_mosaic').one()
+
+    assert task.state == State.UNSUBMITTED
+    assert task.fingerprint == fingerprint
+    assert deleted_assets == [ASSET_ID]
+
+
+def test_unchanged_completed_cell_is_skipped(settings, session):
+    planner = IncrementalPlanner(session, settings)
+    add_task(session, 'test_2020_1_mosaic', State.COMPLETED, planner.plan().fingerprints['test_2020_1_mosaic'])
+
+    plan = planner.plan()
+
+    assert plan.skipped == [(2020, 1)]
+    assert plan.changed == [(2020, 2)]
+
+    tasks = plan.filter_tasks([FakeTask('test_2020_1_mosaic'), FakeTask('test_2020_2_mosaic')])
+
+    assert [task.config['description'] for task in tasks] == ['test_2020_2_mosaic']
+
+
+def test_task_without_fingerprint_is_skipped_and_gets_it(settings, session, deleted_assets):
+    planner = IncrementalPlanner(session, settings)
+    add_task(session, 'test_2020_1_mosaic', State.COMPLETED, None)
+
+    plan = planner.plan()
+    fingerprint = plan.fingerprints['test_2020_1_mosaic']
+
+    assert (2020, 1) in plan.skipped
+
+    TaskManager(session, settings).add_task(FakeTask('test_2020_1_mosaic', ASSET_ID), fingerprint)
+    task = session.query(Task).filter_by(code='test_2020_1_mosaic').one()
+
+    assert task.state == State.COMPLETED
+    assert task.fingerprint == fingerprint
+    assert deleted_assets == []
+
+
+@pytest.mark.parametrize('state', [State.READY, State.RUNNING])
+def test_submitted_task_is_not_rebuilt(settings, session, deleted_assets, state):
+    add_task(session, 'test_2020_1_mosaic', state, 'old')
+
+    task_manager = TaskManager(session, settings)
+    task_manager.add_task(FakeTask('test_2020_1_mosaic', ASSET_ID), 'new')
+    task_manager.skip_task('test_2020_1_mosaic', 'No scenes', 'new')
+    task = session.query(Task).filter_by(code='test_2020_1_mosaic').one()
+
+    assert (task.state, task.fingerprint) == (state, 'old')
+    assert deleted_assets == []
+
+
+def test_skipped_task_is_submitted_when_its_checks_pass(settings, session):
+    task_manager = TaskManager(session, settings)
+    task_manager.skip_task('test_2020_1_mosaic', 'No scenes', 'old')
+
+    assert session.query(Task).filter_by(code='test_2020_1_mosaic').one().state == SKIPPED
+
+    task_manager.add_task(FakeTask('test_2020_1_mosaic'), 'new')
+
+    assert session.query(Task).filter_by(code='test_2020_1_mosaic').one().state == State.UNSUBMITTED
+
+
+def test_pack_is_skipped_only_when_every_cell_is_empty(settings, session, monkeypatch):
+    monkeypatch.setattr(Settings, 'YEARS', [2020, 2021])
+    monkeypatch.setattr(Settings, 'EXPORT_YEARS_PER_TASK', 2)
+    monkeypatch.setattr(Settings, 'PREFLIGHT_CHECKS', ['scenes'])
+
+    plan = IncrementalPlanner(session, settings).plan()
+
+    assert plan.cells['test_2020-2021_1_mosaic'] == [(2020, 1), (2021, 1)]
+
+    # region 1 has no scenes in both years, region 2 only in 2020
+    preflight = Preflight(settings)
+    monkeypatch.setattr(preflight, 'get_reason', lambda year, region_id, checks: (
+        'No scenes' if region_id == 1 or year == 2020 else None))
+
+    plan = preflight.check(plan)
+
+    assert plan.skipped_codes == {'test_2020-2021_1_mosaic'}
+    assert plan.reasons == {'test_2020-2021_1_mosaic': 'No scenes'}
+    assert plan.changed == [(2020, 2), (2021, 2)]
+    assert plan.empty == [(2020, 1), (2021, 1)]
+
+
+def test_upgrade_adds_fingerprint_to_existing_tasks(tmp_path):
+    path = tmp_path / 'tasks.db'
+
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, code VARCHAR, state VARCHAR)')
+        connection.execute("INSERT INTO tasks (code, state) VALUES ('test_2020_1_mosaic', 'COMPLETED')")
+
+    database = DatabaseManager({'ENGINE': 'sqlite', 'USER': '', 'PASSWORD': '', 'HOST': '',
+                                'PORT': 0, 'NAME': path})
+    database.upgrade()
+
+    session = database.get_session()
+    task = session.query(Task).one()
+
+    assert (task.code, task.state, task.fingerprint) == ('test_2020_1_mosaic', 'COMPLETED', None)
+    assert session.query(Task).count() == 1
+    session.remove()
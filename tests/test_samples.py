@@ -0,0 +1,101 @@
+import json
+
+import pyarrow as pa
+import pytest
+
+from rsgee.local import samples as sample_store
+
+SOURCE = 'users/test/samples_2016'
+EXTRA_SOURCE = 'users/test/samples_2016_extra'
+
+# the sampling buffer of the temporary crops classification
+BUFFER = 100000
+BOUNDS = (0, 0, 1, 1)
+
+
+def get_table(points, classes, prefix):
+    return pa.table({
+        'system:index': [f'{prefix}{position}' for position in range(len(points))],
+        'class': classes,
+        '.geo': [json.dumps({'type': 'Point', 'coordinates': list(point)}) for point in points],
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return sample_store.SampleStore(str(tmp_path / 'samples'))
+
+
+def test_load_near_keeps_the_samples_within_the_buffer(store):
+    # inside the bounds, 55 km away, 165 km away and 55 km away in another year
+    points = [(0.5, 0.5), (1.5, 0.5), (2.5, 0.5), (-0.5, 0.5)]
+
+    store.ingest_table(get_table(points[:3], [1, 0, 0], 'a'), 2016, 'r1', 'samples', SOURCE)
+    store.ingest_table(get_table(points[3:], [1], 'b'), 2017, 'r2', 'samples', SOURCE)
+
+    samples = store.load_near(BOUNDS, BUFFER, [2016])
+
+    assert sorted(samples.column('system:index').to_pylist()) == ['a0', 'a1']
+    assert samples.column('source').to_pylist() == [SOURCE, SOURCE]
+
+    samples = store.load_near(BOUNDS, BUFFER)
+
+    assert sorted(samples.column('system:index').to_pylist()) == ['a0', 'a1', 'b0']
+    assert store.load_near(BOUNDS, 0, [2016]).column('system:index').to_pylist() == ['a0']
+
+
+def get_samples(store, coi_count, others_count, extra_count):
+    points = [(0.5, 0.5)] * (coi_count + others_count)
+    store.ingest_table(get_table(points, [1] * coi_count + [0] * others_count, 's'),
+                       2016, 'r1', 'samples', SOURCE)
+    store.ingest_table(get_table([(0.5, 0.5)] * extra_count, [1] * extra_count, 'e'),
+                       2016, 'r1', 'extra', EXTRA_SOURCE)
+
+    all_samples = store.load_near(BOUNDS, BUFFER, [2016])
+
+    return sample_store.split_by_source(all_samples, SOURCE)
+
+
+def count_class(table, class_value):
+    return table.column('class').to_pylist().count(class_value)
+
+
+def test_class_of_interest_is_topped_up_with_extra_samples(store):
+    samples, extra = get_samples(store, 3, 40, 20)
+
+    assert (samples.num_rows, extra.num_rows) == (43, 20)
+
+    balanced = sample_store.draw_balanced(samples, 20, min_coi=10, extra=extra, seed=1)
+    drawn, drawn_extra = sample_store.split_by_source(balanced, SOURCE)
+
+    # the others fill the set up to the total, after the top-up
+    assert balanced.num_rows == 20
+    assert count_class(balanced, 1) == 10
+    assert count_class(drawn_extra, 1) == drawn_extra.num_rows == 10 - count_class(drawn, 1)
+    assert count_class(balanced, 0) == 10
+
+
+def test_enough_samples_of_the_class_of_interest_are_not_topped_up(store):
+    samples, extra = get_samples(store, 30, 30, 20)
+
+    balanced = sample_store.draw_balanced(samples, 20, min_coi=5, extra=extra, seed=1)
+
+    assert balanced.num_rows == 20
+    assert count_class(balanced, 1) >= 5
+    assert set(balanced.column('source').to_pylist()) == {SOURCE}
+
+
+def test_draws_are_reproducible_and_limited(store):
+    samples, extra = get_samples(store, 5, 40, 20)
+
+    draws = [sample_store.draw_balanced(samples, 20, min_coi=10, extra=extra, seed=seed)
+             for seed in [1, 1, 2]]
+
+    assert draws[0].equals(draws[1])
+    assert not draws[0].equals(draws[2])
+
+    # the set is never bigger than the samples available
+    balanced = sample_store.draw_balanced(samples, 100, min_coi=10, extra=extra, seed=1)
+
+    assert balanced.num_rows == samples.num_rows + 5
+    assert count_class(balanced, 1) == 10